@@ -0,0 +1,116 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2018 Alexander Grechin
+#
+# Licensed under the BSD 3-Clause license.
+# See LICENSE file in the project root for full license information.
+#
+
+"""Benchmark of phout parsing throughput
+
+Parses the same file with every combination of buffer size and
+read-ahead buffers count and prints throughput in MB/s and requests/s.
+A synthetic file is generated if input file is not specified.
+"""
+
+import argparse
+import os
+import tempfile
+import time
+import numpy as np
+from tanktools import kernels
+from tanktools import phout
+
+
+def generate_phout(output_file, rows):
+    """Write synthetic phout file
+
+    Args:
+        output_file (str): output file path
+        rows (int): requests count
+    """
+
+    random = np.random.RandomState(0)
+    template = "%.3f\t#%d\t%d\t281\t94\t%d\t41\t5991\t26697\t391\t0\t%d\n"
+    chunk = 100000
+    with open(output_file, 'w') as file_handler:
+        for start in range(0, rows, chunk):
+            count = min(chunk, rows - start)
+            times = 1516295382 + (start + np.arange(count)) / 1000.0
+            timings = random.lognormal(8, 0.5, count).astype(int)
+            codes = np.where(random.rand(count) < 0.01, 500, 200)
+            file_handler.write("".join(
+                template % (times[index], index % 10, timings[index] + 400,
+                            timings[index], codes[index])
+                for index in range(count)))
+
+
+def benchmark(input_file, buffer_size, read_ahead, repeat):
+    """Measure the best parsing time
+
+    Args:
+        input_file (str): phout file path
+        buffer_size (int): block size (bytes)
+        read_ahead (int): count of blocks read in advance
+        repeat (int): count of measurements
+
+    Returns:
+        tuple: the best time (seconds) and requests count
+    """
+
+    best = None
+    for _ in range(repeat):
+        start = time.time()
+        data_frame = phout.parse_phout(
+            input_file, buffer_size=buffer_size, read_ahead=read_ahead)
+        elapsed = time.time() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return best, phout.size(data_frame)
+
+
+def main():
+    """Main function"""
+
+    parser = argparse.ArgumentParser(
+        description="Measure phout parsing throughput")
+    parser.add_argument("-i", "--input", help="phout file path")
+    parser.add_argument(
+        "--rows", type=int, default=1000000,
+        help="requests count of synthetic file, 1000000 by default")
+    parser.add_argument(
+        "--buffer-size", type=int, action='append', default=[],
+        help="block size in MiB, 1, 4 and 16 by default")
+    parser.add_argument(
+        "--read-ahead", type=int, action='append', default=[],
+        help="count of blocks read in advance, 0 and 2 by default")
+    parser.add_argument(
+        "--repeat", type=int, default=3, help="measurements count")
+    args = parser.parse_args()
+
+    input_file = args.input
+    if not input_file:
+        input_file = tempfile.NamedTemporaryFile(delete=False).name
+        generate_phout(input_file, args.rows)
+    try:
+        megabytes = os.path.getsize(input_file) / 1048576.0
+        kernels.warm_up()
+        print("JIT: %s, file: %.1f MB" % (
+            'numba' if kernels.JIT_ENABLED else 'disabled', megabytes))
+        for buffer_size in args.buffer_size or [1, 4, 16]:
+            for read_ahead in args.read_ahead or [0, 2]:
+                elapsed, rows = benchmark(
+                    input_file, buffer_size * 1048576, read_ahead,
+                    args.repeat)
+                print("buffer %3d MiB, read-ahead %d: %8.1f MB/s, "
+                      "%10.0f requests/s" % (
+                          buffer_size, read_ahead, megabytes / elapsed,
+                          rows / elapsed))
+    finally:
+        if not args.input:
+            os.remove(input_file)
+
+
+if __name__ == '__main__':
+    main()
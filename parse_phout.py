@@ -10,7 +10,107 @@
 """Parser of Yandex-tank output file"""
 
 import argparse
+import contextlib
+import datetime
+import os
 from tanktools import phout
+from tanktools import store
+
+
+def print_report(run, quantile_list, expected_interval=None, window=None,
+                 segments=None):
+    """Print report for parsed data
+
+    Args:
+        run (PhoutRun): parsed phout data
+        quantile_list (list): list of quantile values
+        expected_interval (int): expected interval between requests (mks)
+                                 to correct coordinated omission
+        window (float): print the worst percentiles over sliding window
+                        of specified duration in seconds
+        segments (DataFrame): steady segments data is selected from
+    """
+
+    if segments is not None:
+        print("\nSteady segments:")
+        for segment in segments.itertuples():
+            print("\t%s - %s: %d requests, %.2f RPS" % (
+                datetime.datetime.fromtimestamp(segment.from_date).
+                strftime('%Y-%m-%d %H:%M:%S'),
+                datetime.datetime.fromtimestamp(segment.to_date).
+                strftime('%Y-%m-%d %H:%M:%S'),
+                segment.count, segment.rps
+            ))
+
+    data = run.data_frame
+    run.print_quantiles('interval_real', quantile_list, expected_interval)
+
+    print("\n\n")
+    run.print_http_reponses()
+
+    print("\n\nTotal Latency median: %d" % int(run.median('latency')))
+
+    print("\n\nLatency median for:")
+    http_responses = run.count_uniq_by_field('proto_code')
+    medians = run.get_medians_by_field('latency', 'proto_code')
+    for http_code in http_responses['proto_code']:
+        print("\t%s: %d" % (http_code, medians[http_code]))
+
+    print("\n\nAvg. Request / Response: %d / %d bytes" % (
+        run.mean('size_in'),
+        run.mean('size_out')
+    ))
+
+    if window:
+        rolling = phout.get_rolling_quantiles(
+            data, 'interval_real', window, 1, quantile_list)
+        print("\n\nMax percentiles over %g second windows:" % window)
+        for quantile in quantile_list:
+            print("\t%6.2f: %d" % (quantile * 100, rolling[quantile].max()))
+
+    if segments is not None:
+        rps = segments['count'].sum() / \
+            (segments['to_date'] - segments['from_date']).sum()
+    else:
+        rps = run.get_rps()
+    print("\n\nTotal RPS: %.2f" % rps)
+
+    print("\n\nRPS at request:")
+    chunk_size = int(run.size / 2)
+    for start in range(0, run.size, chunk_size):
+        data_subset = phout.subset(data, start, chunk_size)
+        if segments is not None:
+            rps = phout.get_segments_rps(data_subset, segments)
+        else:
+            rps = phout.get_rps(data_subset)
+        print("\t%s: %.2f" % (start + chunk_size, rps))
+
+
+def print_rollup_report(rollup, quantile_list, expected_interval=None):
+    """Print report for rollup, values are precise up to histogram buckets
+
+    Args:
+        rollup (dict): phout rollup
+        quantile_list (list): list of quantile values
+        expected_interval (int): expected interval between requests (mks)
+                                 to correct coordinated omission
+    """
+
+    phout.print_rollup_quantiles(
+        rollup, 'interval_real', quantile_list, expected_interval)
+
+    print("\n\n")
+    phout.print_rollup_http_reponses(rollup)
+
+    latency = phout.get_rollup_quantiles(rollup, 'latency', [0.5])
+    print("\n\nTotal Latency median: %d" % int(latency['latency'][0]))
+
+    print("\n\nAvg. Request / Response: %d / %d bytes" % (
+        phout.get_rollup_mean(rollup, 'size_in'),
+        phout.get_rollup_mean(rollup, 'size_out')
+    ))
+
+    print("\n\nTotal RPS: %.2f" % phout.get_rollup_rps(rollup))
 
 
 def main():
@@ -26,6 +126,50 @@ def main():
         "--to-date", help="Parse requests only after specific date and time")
     parser.add_argument(
         "-l", "--limit", help="Set a limit of parserd requests")
+    parser.add_argument(
+        "--rollup", help="Print report from rollup file instead of input")
+    parser.add_argument(
+        "--save-rollup", help="Save rollup of parsed requests to file")
+    parser.add_argument(
+        "--buffer-size", type=int, default=16,
+        help="Size of file block parsed at once in MiB, 16 by default")
+    parser.add_argument(
+        "--read-ahead", type=int, default=0,
+        help="Count of blocks read in background thread " +
+             "while the previous one is parsed")
+    parser.add_argument(
+        "--save-store",
+        help="Save rollups of parsed requests to SQLite store of runs")
+    parser.add_argument(
+        "--backend", choices=phout.BACKENDS, default='pandas',
+        help="DataFrame implementation, pandas by default")
+    parser.add_argument(
+        "--save-arrow",
+        help="Save parsed requests to file in Arrow IPC streaming format")
+    parser.add_argument(
+        "--save-timeline",
+        help="Save downsampled interval_real timeline to JSON or CSV file")
+    parser.add_argument(
+        "--timeline-points", type=int, default=1000,
+        help="Points count of saved timeline, 1000 by default")
+    parser.add_argument(
+        "--timeline-method", choices=phout.DOWNSAMPLE_METHODS,
+        default='lttb', help="Timeline downsampling algorithm")
+    parser.add_argument(
+        "--rollup-period", type=float, default=1,
+        help="Rollup bucket duration in seconds, 1 by default")
+    parser.add_argument(
+        "--expected-interval", type=int,
+        help="Expected interval between requests (mks) " +
+             "to correct percentiles for coordinated omission")
+    parser.add_argument(
+        "--window", type=float,
+        help="Print the worst percentiles over sliding window " +
+             "of specified duration in seconds")
+    parser.add_argument(
+        "--steady", action='store_true',
+        help="Report only segments of steady load, " +
+             "skip ramp-up, cool-down and steps")
 
     args = parser.parse_args()
 
@@ -42,37 +186,43 @@ def main():
         0.6, 0.7, 0.8, 0.9, 0.95,
         0.98, 0.99, 0.995, 1.0
     ]
-    data = phout.parse_phout(args.input, flags)
-    phout.print_quantiles(data, 'interval_real', quantile_list)
 
-    print("\n\n")
-    phout.print_http_reponses(data)
-
-    print("\n\nTotal Latency median: %d" % int(data.latency.median()))
-
-    print("\n\nLatency median for:")
-    http_responses = phout.count_uniq_by_field(data, 'proto_code')
-    for http_code in http_responses['proto_code']:
-        selected_http_responses = data[data.proto_code == http_code]
-        print("\t%s: %d" % (
-            http_code,
-            selected_http_responses.latency.median()
-        ))
-
-    print("\n\nAvg. Request / Response: %d / %d bytes" % (
-        data.size_in.astype(float).mean(),
-        data.size_out.astype(float).mean()
-    ))
-
-    rps = phout.get_rps(data)
-    print("\n\nTotal RPS: %.2f" % rps)
-
-    print("\n\nRPS at request:")
-    chunk_size = int(phout.size(data) / 2)
-    for start in range(0, phout.size(data), chunk_size):
-        data_subset = phout.subset(data, start, chunk_size)
-        print("\t%s: %.2f" %
-              (start + chunk_size, phout.get_rps(data_subset)))
+    if args.rollup:
+        print_rollup_report(
+            phout.read_rollup(args.rollup), quantile_list,
+            args.expected_interval)
+        return
+
+    data = phout.parse_phout(
+        args.input, flags, args.backend, args.buffer_size * 1024 * 1024,
+        args.read_ahead)
+    if args.save_arrow:
+        phout.write_arrow(data, args.save_arrow)
+    if args.save_rollup:
+        phout.write_rollup(
+            phout.make_rollup(data, args.rollup_period), args.save_rollup)
+    if args.save_timeline:
+        phout.write_timeline(
+            phout.downsample_timeline(
+                data, 'interval_real', args.timeline_points,
+                args.timeline_method),
+            args.save_timeline)
+    if args.save_store:
+        with contextlib.closing(store.open_store(args.save_store)) as \
+                connection:
+            store.ingest_data_frame(
+                connection, data, os.path.basename(args.input), args.input,
+                args.rollup_period)
+    segments = None
+    if args.steady:
+        segments = phout.get_steady_segments(data)
+        if segments.shape[0] == 0:
+            print("Steady segments are not found")
+            return
+        data = phout.select_segments(data, segments)
+    print_report(
+        phout.PhoutRun(data), quantile_list,
+        args.expected_interval, args.window, segments)
 
 
 if __name__ == '__main__':
@@ -19,10 +19,18 @@ with open('README.rst') as f:
 setuptools_kwargs = {
     'install_requires': [
         'python-dateutil>=2.8.0',
+        'numpy>=1.20',
         'pandas>=0.23.4',
         'flake8>=3.5.0',
-        'pcaper>=1.0.2'
+        'pcaper>=1.0.2',
+        'dpkt>=1.9.2'
     ],
+    'extras_require': {
+        'arrow': ['pyarrow>=0.17.0'],
+        'polars': ['polars>=0.20.5'],
+        'numba': ['numba>=0.50.0'],
+        'scrub': ['pyahocorasick>=1.4.1'],
+    },
     'setup_requires': 'pytest-runner',
     'tests_require': [
         'pytest>=2.7',
@@ -32,7 +40,9 @@ setuptools_kwargs = {
     'entry_points': {
         'console_scripts': [
             'pcap2ammo=tanktools.pcap2ammo:main',
-            'har2ammo=tanktools.har2ammo:main'
+            'har2ammo=tanktools.har2ammo:main',
+            'phout-compare=tanktools.compare:main',
+            'phout-report=tanktools.report:main'
         ],
     },
 }
@@ -0,0 +1,355 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2018 Alexander Grechin
+#
+# Licensed under the BSD 3-Clause license.
+# See LICENSE file in the project root for full license information.
+#
+
+"""Phantom ammo entries of bytes and their offset index
+
+Requests are handled as bytes: headers are rewritten in the request head,
+the body is passed as memoryview and copied once, when ammo entry
+is joined.
+
+Index file layout:
+    magic (8 bytes), requests count and cases table offset (uint64 LE),
+    a record per request: ammo entry offset, entry header length,
+    request length and case number,
+    cases table, JSON list of case names.
+
+Index and ammo are memory mapped by AmmoReader,
+so any request is read without parsing the preceding ones.
+"""
+
+import json
+import mmap
+import re
+import struct
+import numpy as np
+
+INDEX_MAGIC = b'TANKIDX1'
+
+INDEX_HEADER = struct.Struct('<8sQQ')
+
+INDEX_DTYPE = np.dtype([
+    ('offset', '<u8'),
+    ('header', '<u2'),
+    ('length', '<u4'),
+    ('case', '<u4'),
+])
+
+# records buffered by AmmoIndexWriter before writing
+INDEX_BATCH = 65536
+
+
+def split_request(data):
+    """Split HTTP request to head and body
+
+    Args:
+        data (bytes): HTTP request
+
+    Returns:
+        tuple: head (bytes) ending with CRLF of the last header,
+               body (memoryview) starting with CRLF of the empty line
+    """
+
+    end = data.find(b'\r\n\r\n')
+    if end < 0:
+        return data, memoryview(b'')
+    return data[:end + 2], memoryview(data)[end + 2:]
+
+
+def delete_head_headers(head, headers):
+    """Delete header lines from request head
+
+    Args:
+        head (bytes): request head, see split_request
+        headers (list): header names
+
+    Returns:
+        bytes: request head
+    """
+
+    for header in headers:
+        head = re.sub(
+            b'^' + re.escape(header.encode('utf-8')) + b'.+?\r\n', b'',
+            head, flags=re.IGNORECASE | re.MULTILINE)
+    return head
+
+
+def add_head_headers(head, headers, present=()):
+    """Append header lines to request head
+
+    Args:
+        head (bytes): request head, see split_request
+        headers (list): "<header_name>: <header_value>" strings
+        present (dict): lower case names of headers not to be added
+
+    Returns:
+        bytes: request head
+    """
+
+    lines = []
+    added = set()
+    for header in headers:
+        name = re.split(r": *", header, 1)
+        if len(name) != 2:
+            raise ValueError("Wrong header format, " +
+                             "expected \"<header_name>: <header_value>\"")
+        name = name[0].lower()
+        if name not in present and name not in added:
+            lines.append(header.encode('utf-8') + b'\r\n')
+            added.add(name)
+    return b''.join([head] + lines) if lines else head
+
+
+def join_ammo(parts, case=''):
+    """Make phantom ammo entry of request parts
+
+    Args:
+        parts (list): bytes or memoryview parts of HTTP request
+        case (str): ammo mark
+
+    Returns:
+        bytes: ammo entry, length is counted in bytes
+    """
+
+    length = sum(len(part) for part in parts)
+    return b''.join(
+        [('%d %s\n' % (length, case)).encode('utf-8')] + list(parts))
+
+
+class AmmoIndexWriter(object):
+    """Write ammo and its index at once"""
+
+    def __init__(self, index_file, output, encoding=None):
+        """Constructor
+
+        Args:
+            index_file (str): index file path
+            output (file): ammo file opened for writing
+            encoding (str): encoding of text ammo file,
+                            output encoding or utf-8 by default
+        """
+
+        self.output = output
+        self.encoding = encoding or getattr(output, 'encoding', None) \
+            or 'utf-8'
+        self.offset = 0
+        self.count = 0
+        self.cases = {}
+        self.records = []
+        self.index = open(index_file, 'wb')
+        self.index.write(INDEX_HEADER.pack(INDEX_MAGIC, 0, 0))
+
+    def write(self, ammo):
+        """Write ammo entry and index it
+
+        Args:
+            ammo (str): ammo entry, see make_ammo
+        """
+
+        self.output.write(ammo)
+        data = ammo.encode(self.encoding, 'replace') \
+            if not isinstance(ammo, bytes) else ammo
+        header = data.find(b'\n') + 1
+        case = data[:header].rstrip(b'\n').partition(b' ')[2]
+        case_id = self.cases.setdefault(case, len(self.cases))
+        self.records.append(
+            (self.offset, header, len(data) - header, case_id))
+        self.offset += len(data)
+        if len(self.records) >= INDEX_BATCH:
+            self.flush()
+
+    def flush(self):
+        """Write buffered records"""
+
+        if self.records:
+            self.index.write(
+                np.array(self.records, dtype=INDEX_DTYPE).tobytes())
+            self.count += len(self.records)
+            self.records = []
+
+    def close(self):
+        """Write cases table and close index file"""
+
+        self.flush()
+        cases_offset = self.index.tell()
+        cases = sorted(self.cases, key=self.cases.get)
+        self.index.write(json.dumps(
+            [case.decode('utf-8', 'replace') for case in cases]
+        ).encode('utf-8'))
+        self.index.seek(0)
+        self.index.write(
+            INDEX_HEADER.pack(INDEX_MAGIC, self.count, cases_offset))
+        self.index.close()
+
+
+class _NullOutput(object):
+    """Output which discards written data"""
+
+    def write(self, data):
+        pass
+
+
+def build_index(ammo_file, index_file):
+    """Index existing ammo file by reading length headers one by one
+
+    Args:
+        ammo_file (str): ammo file path
+        index_file (str): index file path
+
+    Returns:
+        int: indexed requests count
+    """
+
+    writer = AmmoIndexWriter(index_file, _NullOutput())
+    with open(ammo_file, 'rb') as file_handler:
+        try:
+            data = mmap.mmap(
+                file_handler.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            # empty file can't be mapped
+            data = b''
+        try:
+            _index_entries(data, writer)
+        finally:
+            writer.close()
+            if data:
+                data.close()
+    return writer.count
+
+
+def _index_entries(data, writer):
+    """Index ammo entries one by one
+
+    Args:
+        data (mmap): ammo data
+        writer (AmmoIndexWriter): index writer
+    """
+
+    position = 0
+    while position < len(data):
+        newline = data.find(b'\n', position)
+        if newline < 0:
+            break
+        header = data[position:newline]
+        if not header.strip():
+            position = newline + 1
+            continue
+        try:
+            length = int(header.split(None, 1)[0])
+        except ValueError:
+            raise ValueError(
+                "Wrong ammo header at offset %d: %r" % (position, header))
+        end = newline + 1 + length
+        writer.offset = position
+        writer.write(data[position:end])
+        position = end
+
+
+class AmmoReader(object):
+    """Random access reader of indexed ammo file"""
+
+    def __init__(self, ammo_file, index_file):
+        """Constructor
+
+        Args:
+            ammo_file (str): ammo file path
+            index_file (str): index file path
+        """
+
+        self._files = []
+        self._maps = []
+        index = self._map(index_file)
+        magic, count, cases_offset = INDEX_HEADER.unpack_from(index, 0)
+        if magic != INDEX_MAGIC:
+            self.close()
+            raise ValueError("Wrong ammo index file %s" % index_file)
+        self.records = np.frombuffer(
+            index, dtype=INDEX_DTYPE, count=count, offset=INDEX_HEADER.size)
+        self.cases = json.loads(index[cases_offset:].decode('utf-8'))
+        self.ammo = self._map(ammo_file) if count else b''
+
+    def _map(self, filename):
+        """Memory map file for reading
+
+        Args:
+            filename (str): file path
+
+        Returns:
+            mmap: mapped file
+        """
+
+        file_handler = open(filename, 'rb')
+        self._files.append(file_handler)
+        data = mmap.mmap(file_handler.fileno(), 0, access=mmap.ACCESS_READ)
+        self._maps.append(data)
+        return data
+
+    def __len__(self):
+        """Get requests count"""
+
+        return len(self.records)
+
+    def __getitem__(self, number):
+        """Get request by number
+
+        Args:
+            number (int or slice): request number or slice of numbers
+
+        Returns:
+            bytes: HTTP request, list of requests for slice
+        """
+
+        if isinstance(number, slice):
+            return [self[item] for item in range(*number.indices(len(self)))]
+        record = self.records[number]
+        start = int(record['offset']) + int(record['header'])
+        return self.ammo[start:start + int(record['length'])]
+
+    def get_case(self, number):
+        """Get case of request
+
+        Args:
+            number (int): request number
+
+        Returns:
+            str: case name
+        """
+
+        return self.cases[int(self.records[number]['case'])]
+
+    def get_entry(self, number):
+        """Get ammo entry with its length header
+
+        Args:
+            number (int): request number
+
+        Returns:
+            bytes: ammo entry
+        """
+
+        record = self.records[number]
+        start = int(record['offset'])
+        return self.ammo[
+            start:start + int(record['header']) + int(record['length'])]
+
+    def close(self):
+        """Unmap and close files"""
+
+        self.records = None
+        for data in self._maps:
+            data.close()
+        for file_handler in self._files:
+            file_handler.close()
+        self._maps = []
+        self._files = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
@@ -0,0 +1,397 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2018 Alexander Grechin
+#
+# Licensed under the BSD 3-Clause license.
+# See LICENSE file in the project root for full license information.
+#
+
+"""Compare yandex-tank runs with bootstrap confidence intervals
+
+The first run is a baseline, every next run is compared with it.
+Runs are reduced to counts of distinct values, so resampling a run
+with replacement is a single multinomial draw over its distinct values.
+"""
+
+import argparse
+import multiprocessing
+import sys
+import numpy as np
+import pandas as pd
+from . import _version
+from tanktools import phout
+
+COMPARE_FIELDS = ['interval_real', 'latency']
+
+COMPARE_QUANTILES = [0.5, 0.95, 0.99]
+
+MAX_DISTINCT_VALUES = 16384
+
+RESAMPLES_CHUNK = 50
+
+
+def _value_counts(values, max_values=MAX_DISTINCT_VALUES):
+    """Count distinct values
+
+    When there are too many distinct values, values are rounded up
+    to the highest value of log-linear bucket with 1/1024 relative width.
+
+    Args:
+        values (ndarray): values
+        max_values (int): the largest count of distinct values kept as is
+
+    Returns:
+        tuple: sorted distinct values and their counts
+    """
+
+    distinct, counts = np.unique(values, return_counts=True)
+    if len(distinct) > max_values:
+        edges = phout.log_bucket_edges(
+            max(int(distinct[-1]) + 1, 2), sub_buckets=1024)
+        rounded = edges[phout.get_bucket_index(distinct, edges) + 1] - 1
+        rounded = np.minimum(np.maximum(rounded, distinct[0]), distinct[-1])
+        distinct, inverse = np.unique(rounded, return_inverse=True)
+        counts = np.bincount(inverse.ravel(), weights=counts).astype(np.int64)
+    return distinct, counts
+
+
+def summarize_run(data_frame, fields=None, max_values=MAX_DISTINCT_VALUES):
+    """Reduce parsed run to what comparison needs
+
+    Args:
+        data_frame (DataFrame): parsed phout data
+        fields (list): compared fields, COMPARE_FIELDS by default
+        max_values (int): the largest count of distinct values kept as is
+
+    Returns:
+        dict: count, rps and distinct values with counts per field
+    """
+
+    if not fields:
+        fields = COMPARE_FIELDS
+    summary = {'count': phout.size(data_frame), 'rps': 0.0, 'fields': {}}
+    if summary['count']:
+        summary['rps'] = phout.get_rps(data_frame)
+    for field in fields:
+        values = phout.get_column(data_frame, field)
+        summary['fields'][field] = _value_counts(
+            np.nan_to_num(values).astype(np.int64), max_values)
+    return summary
+
+
+def _load_run(task):
+    """Parse and summarize phout file, pool worker function
+
+    Args:
+        task (tuple): input file, flags, fields and max_values
+
+    Returns:
+        dict: run summary
+    """
+
+    input_file, flags, fields, max_values = task
+    return summarize_run(
+        phout.parse_phout(input_file, flags), fields, max_values)
+
+
+def _parallel_map(function, tasks, workers=None):
+    """Apply function to every task in worker processes
+
+    Args:
+        function (function): module level function
+        tasks (list): function arguments
+        workers (int): processes count, CPU count by default,
+                       1 means the current process
+
+    Returns:
+        list: results in tasks order
+    """
+
+    if workers is None:
+        workers = multiprocessing.cpu_count()
+    workers = min(workers, len(tasks))
+    if workers <= 1:
+        return [function(task) for task in tasks]
+    pool = multiprocessing.Pool(workers)
+    try:
+        return pool.map(function, tasks)
+    finally:
+        pool.close()
+        pool.join()
+
+
+def load_runs(input_files, flags=None, fields=None, workers=None,
+              max_values=MAX_DISTINCT_VALUES):
+    """Parse and summarize phout files in parallel
+
+    Args:
+        input_files (list): input file paths
+        flags (dict): List of flags, see parse_phout
+        fields (list): compared fields, COMPARE_FIELDS by default
+        workers (int): processes count, CPU count by default
+        max_values (int): the largest count of distinct values kept as is
+
+    Returns:
+        list: run summaries
+    """
+
+    return _parallel_map(
+        _load_run,
+        [(input_file, flags, fields, max_values)
+         for input_file in input_files],
+        workers)
+
+
+def _rank_quantiles(values, cumulative, quantile_list):
+    """Get nearest-rank quantiles of one or several histograms
+
+    Args:
+        values (ndarray): sorted distinct values
+        cumulative (ndarray): cumulative counts, a row per histogram
+        quantile_list (list): list of quantile values
+
+    Returns:
+        ndarray: quantiles, a row per histogram
+    """
+
+    cumulative = np.atleast_2d(cumulative)
+    total = cumulative[:, -1:]
+    result = np.empty((cumulative.shape[0], len(quantile_list)))
+    for index, quantile in enumerate(quantile_list):
+        ranks = np.maximum(np.ceil(quantile * total - 1e-9), 1)
+        positions = np.minimum(
+            (cumulative < ranks).sum(axis=1), len(values) - 1)
+        result[:, index] = values[positions]
+    return result
+
+
+def _bootstrap_chunk(task):
+    """Bootstrap quantiles of a histogram, pool worker function
+
+    Args:
+        task (tuple): distinct values, counts, quantile list,
+                      resamples count and random seed
+
+    Returns:
+        ndarray: quantiles, a row per resample
+    """
+
+    values, counts, quantile_list, resamples, seed = task
+    total = int(counts.sum())
+    random = np.random.RandomState(seed)
+    samples = random.multinomial(total, counts / float(total), resamples)
+    return _rank_quantiles(
+        values, np.cumsum(samples, axis=1), quantile_list)
+
+
+def _bootstrap_tasks(values, counts, quantile_list, resamples, seed):
+    """Split resamples of a histogram into chunks
+
+    Chunks don't depend on workers count, so results are reproducible.
+
+    Args:
+        values (ndarray): sorted distinct values
+        counts (ndarray): counts of values
+        quantile_list (list): list of quantile values
+        resamples (int): resamples count
+        seed (list): random seed prefix
+
+    Returns:
+        list: _bootstrap_chunk tasks
+    """
+
+    return [
+        (values, counts, quantile_list,
+         min(RESAMPLES_CHUNK, resamples - start),
+         list(seed) + [start])
+        for start in range(0, resamples, RESAMPLES_CHUNK)
+    ]
+
+
+def compare_runs(summaries, names=None, quantile_list=None, resamples=1000,
+                 confidence=0.95, threshold=0.05, workers=None, seed=0):
+    """Compare runs with the first one
+
+    Deltas of quantiles get bootstrap confidence intervals.
+    A metric fails when the whole interval is above
+    the baseline value increased by threshold.
+
+    Args:
+        summaries (list): run summaries, see summarize_run
+        names (list): run names, indexes by default
+        quantile_list (list): list of quantile values
+        resamples (int): bootstrap resamples count
+        confidence (float): confidence level of intervals
+        threshold (float): allowed relative growth of metric
+        workers (int): processes count, CPU count by default
+        seed (int): random seed
+
+    Returns:
+        DataFrame: run, field, quantile, baseline, value, delta,
+                   delta_low, delta_high, relative_delta, verdict
+    """
+
+    if len(summaries) < 2:
+        raise ValueError("At least two runs should be compared")
+    if not quantile_list:
+        quantile_list = COMPARE_QUANTILES
+    if names is None:
+        names = [str(index) for index in range(len(summaries))]
+    fields = list(summaries[0]['fields'])
+
+    tasks = []
+    for run_index, summary in enumerate(summaries):
+        for field_index, field in enumerate(fields):
+            values, counts = summary['fields'][field]
+            if not counts.sum():
+                raise ValueError("Run %s has no requests" % names[run_index])
+            tasks.extend(_bootstrap_tasks(
+                values, counts, quantile_list, resamples,
+                [seed, run_index, field_index]))
+    chunks = _parallel_map(_bootstrap_chunk, tasks, workers)
+    chunks_count = len(tasks) // (len(summaries) * len(fields))
+
+    def bootstrap(run_index, field_index):
+        start = (run_index * len(fields) + field_index) * chunks_count
+        return np.vstack(chunks[start:start + chunks_count])
+
+    def point(summary, field):
+        values, counts = summary['fields'][field]
+        return _rank_quantiles(values, np.cumsum(counts), quantile_list)[0]
+
+    alpha = (1 - confidence) / 2.0
+    rows = []
+    for run_index in range(1, len(summaries)):
+        for field_index, field in enumerate(fields):
+            baseline = point(summaries[0], field)
+            value = point(summaries[run_index], field)
+            deltas = bootstrap(run_index, field_index) - \
+                bootstrap(0, field_index)
+            low, high = np.percentile(deltas, [alpha * 100,
+                                               (1 - alpha) * 100], axis=0)
+            for index, quantile in enumerate(quantile_list):
+                rows.append((
+                    names[run_index], field, quantile, baseline[index],
+                    value[index], value[index] - baseline[index],
+                    low[index], high[index],
+                    (value[index] - baseline[index]) / baseline[index]
+                    if baseline[index] else np.nan,
+                    'fail' if low[index] > threshold * baseline[index]
+                    else 'pass'
+                ))
+    return pd.DataFrame(rows, columns=[
+        'run', 'field', 'quantile', 'baseline', 'value', 'delta',
+        'delta_low', 'delta_high', 'relative_delta', 'verdict'])
+
+
+def compare_phouts(input_files, flags=None, fields=None, quantile_list=None,
+                   resamples=1000, confidence=0.95, threshold=0.05,
+                   workers=None, seed=0):
+    """Parse phout files in parallel and compare them with the first one
+
+    Args:
+        input_files (list): input file paths, the first one is baseline
+        flags (dict): List of flags, see parse_phout
+        fields (list): compared fields, COMPARE_FIELDS by default
+        quantile_list (list): list of quantile values
+        resamples (int): bootstrap resamples count
+        confidence (float): confidence level of intervals
+        threshold (float): allowed relative growth of metric
+        workers (int): processes count, CPU count by default
+        seed (int): random seed
+
+    Returns:
+        DataFrame: comparison, see compare_runs
+    """
+
+    return compare_runs(
+        load_runs(input_files, flags, fields, workers), input_files,
+        quantile_list, resamples, confidence, threshold, workers, seed)
+
+
+def print_comparison(comparison):
+    """Print comparison of runs
+
+    Args:
+        comparison (DataFrame): comparison, see compare_runs
+    """
+
+    for run, rows in comparison.groupby('run', sort=False):
+        print("%s:" % run)
+        for row in rows.itertuples():
+            print("\t%s %6.2f: %d -> %d, delta %+d [%+d, %+d] %+.2f%% %s" % (
+                row.field, row.quantile * 100, row.baseline, row.value,
+                row.delta, row.delta_low, row.delta_high,
+                row.relative_delta * 100, row.verdict.upper()
+            ))
+
+
+def parse_args():
+    """Parse console arguments
+
+    Returns:
+        dict: console arguments
+    """
+
+    parser = argparse.ArgumentParser(
+        description="Compare yandex-tank phout files with the first one " +
+                    "using bootstrap confidence intervals",
+        add_help=True
+    )
+
+    parser.add_argument(
+        'input', nargs='+', help='phout files, the first one is baseline')
+    parser.add_argument(
+        '--field', action='append', type=str, default=[],
+        help='compared field, interval_real and latency by default')
+    parser.add_argument(
+        '-q', '--quantile', action='append', type=float, default=[],
+        help='compared quantile, 0.5, 0.95 and 0.99 by default')
+    parser.add_argument(
+        '--resamples', type=int, default=1000,
+        help='bootstrap resamples count')
+    parser.add_argument(
+        '--confidence', type=float, default=0.95,
+        help='confidence level of intervals')
+    parser.add_argument(
+        '--threshold', type=float, default=0.05,
+        help='allowed relative growth of metric')
+    parser.add_argument(
+        '-w', '--workers', type=int, help='processes count')
+    parser.add_argument(
+        '--seed', type=int, default=0, help='random seed')
+
+    parser.add_argument(
+        '-v', '--version', help='print version', action='version',
+        version='{version}'.format(version=_version.__version__)
+    )
+
+    return vars(parser.parse_args())
+
+
+def main():
+    """The main function
+
+    Returns:
+        int: 0 if all metrics pass, 1 otherwise
+    """
+
+    args = parse_args()
+    comparison = compare_phouts(
+        args['input'], fields=args['field'],
+        quantile_list=args['quantile'], resamples=args['resamples'],
+        confidence=args['confidence'], threshold=args['threshold'],
+        workers=args['workers'], seed=args['seed'])
+    print_comparison(comparison)
+    return int((comparison['verdict'] == 'fail').any())
+
+
+def init():
+    """Testable init function"""
+
+    if __name__ == '__main__':
+        sys.exit(main())
+
+
+init()
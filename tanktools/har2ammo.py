@@ -8,9 +8,21 @@
 #
 
 import argparse
+import json
 import re
 import sys
+from array import array
+from functools import partial
+from collections import OrderedDict
 from . import _version
+from tanktools import ammo
+from tanktools import pipeline
+from tanktools import routes
+from tanktools import sampling
+from tanktools import schedule
+from tanktools import scrub
+from tanktools import sharding
+from tanktools import sketches
 from pcaper import HarParser
 
 
@@ -29,11 +41,115 @@ def parse_args():
 
     parser.add_argument('input', help='har file to parse')
     parser.add_argument('-o', '--output', help='output ammo file')
+    parser.add_argument(
+        '--index', help='write offset index of output ammo to file')
+    parser.add_argument(
+        '--shards', type=int,
+        help='split output ammo into SHARDS files, out.N.ammo for out.ammo'
+    )
+    parser.add_argument(
+        '--shard-balance', choices=sharding.SHARD_BALANCE, default='count',
+        help='balance shards by requests count or bytes'
+    )
+    parser.add_argument(
+        '--shard-key', type=str,
+        help='keep requests with the same key in one shard: ' +
+             'client, cookie, cookie:<name> or header:<name>'
+    )
     parser.add_argument('-f', '--filter', help='TCP/IP filter')
     parser.add_argument('-F', '--http-filter', help='HTTP filter')
     parser.add_argument(
         '-S', '--stats-only', help='print stats only', action='store_true'
     )
+    parser.add_argument(
+        '-C', '--count-only', action='store_true',
+        help='count entries and HTTP requests only, ' +
+             'requests are not built'
+    )
+    parser.add_argument(
+        '-P', '--profile-traffic', action='store_true',
+        help='print top URIs, hosts, methods, user agents ' +
+             'and distinct clients and URIs counts'
+    )
+    parser.add_argument(
+        '--top', type=int, default=10,
+        help='keys count per field of traffic profile'
+    )
+    parser.add_argument(
+        '--save-profile', type=str,
+        help='save traffic profile to JSON file'
+    )
+    parser.add_argument(
+        '--merge-profile', action='append', type=str, default=[],
+        help='merge traffic profile saved from another file'
+    )
+    parser.add_argument(
+        '--sample-rate', type=float,
+        help='convert a fraction of requests selected by stable hash'
+    )
+    parser.add_argument(
+        '--sample-size', type=int,
+        help='convert a fixed count of uniformly selected requests'
+    )
+    parser.add_argument(
+        '--stratify', choices=sampling.STRATIFY_KEYS,
+        help='select --sample-size requests per method, host or URI prefix'
+    )
+    parser.add_argument(
+        '--prefix-depth', type=int, default=1,
+        help='count of URI path segments of prefix stratum'
+    )
+    parser.add_argument(
+        '--seed', type=int, default=0, help='sampling random seed'
+    )
+    parser.add_argument(
+        '--schedule', type=str,
+        help='write yandex-tank load schedule of captured requests to file'
+    )
+    parser.add_argument(
+        '--schedule-mode', choices=schedule.SCHEDULE_MODES, default='fit',
+        help='fit line, const and step segments or keep RPS of every period'
+    )
+    parser.add_argument(
+        '--schedule-period', type=float, default=1,
+        help='schedule period in seconds'
+    )
+    parser.add_argument(
+        '--schedule-tolerance', type=float,
+        help='the largest RPS deviation of fitted schedule, ' +
+             '10%% of the highest RPS by default'
+    )
+    parser.add_argument(
+        '--schedule-window', type=int, default=schedule.DEFAULT_WINDOW,
+        help='moving average window of fitted schedule in periods'
+    )
+    parser.add_argument(
+        '--routes', type=str,
+        help='file of method, URI pattern and tag rules, ' +
+             'tag of the first matching rule is ammo case'
+    )
+    parser.add_argument(
+        '--scrub-literal', action='append', type=str, default=[],
+        help='mask literal string in requests'
+    )
+    parser.add_argument(
+        '--scrub-file', action='append', type=str, default=[],
+        help='mask literal strings of file, one per line'
+    )
+    parser.add_argument(
+        '--scrub-regex', action='append', type=str, default=[],
+        help='mask regular expression matches in requests'
+    )
+    parser.add_argument(
+        '--scrub-builtin', action='append', default=[],
+        choices=list(scrub.BUILTIN_PATTERNS),
+        help='mask emails, card numbers with issuer prefix and checksum, '
+        'bearer tokens or JWT'
+    )
+    parser.add_argument(
+        '--scrub-mode', choices=scrub.SCRUB_MODES, default='mask',
+        help='mask keeps length, redact replaces matches by REDACTED'
+    )
     parser.add_argument(
         '--add-header',
         action='append',
@@ -47,6 +163,20 @@ def parse_args():
         help='delete header from the each request'
     )
 
+    parser.add_argument(
+        '-w', '--workers', type=int, default=0,
+        help='transform requests in parallel threads, ' +
+             'reading and writing run in their own threads'
+    )
+    parser.add_argument(
+        '--queue-size', type=int, default=pipeline.QUEUE_SIZE,
+        help='the largest count of requests waiting between threads'
+    )
+    parser.add_argument(
+        '--unordered', action='store_true',
+        help='write requests as soon as they are ready with --workers'
+    )
+
     parser.add_argument(
         '-v', '--version', help='print version', action='version',
         version='{version}'.format(version=_version.__version__)
@@ -65,15 +195,31 @@ def har2ammo(args):
         int: 0 if Success, 1 otherwise
     """
 
-    if args['output']:
-        file_handler = open(args['output'], "w")
+    if args['output'] and not args.get('shards'):
+        file_handler = open(args['output'], "wb")
     else:
-        file_handler = sys.stdout
+        file_handler = getattr(sys.stdout, 'buffer', sys.stdout)
 
     reader = HarParser()
 
     try:
-        if args['stats_only']:
+        if args.get('count_only'):
+            if args.get('filter') or args.get('http_filter'):
+                raise ValueError("Filters can't be used with --count-only")
+            print("Counts:")
+            counts = count_har(args['input'])
+            for key in counts.keys():
+                print("\t%s: %d" % (key, counts[key]))
+        elif args.get('profile_traffic'):
+            profile = sketches.TrafficProfile()
+            for request in reader.read_har(args):
+                profile.add(request)
+            for input_file in args.get('merge_profile') or []:
+                profile.merge(sketches.read_profile(input_file))
+            if args.get('save_profile'):
+                sketches.write_profile(profile, args['save_profile'])
+            sketches.print_profile(profile, args.get('top') or 10)
+        elif args['stats_only']:
             for request in reader.read_har(args):
                 pass
             print("Stats:")
@@ -81,40 +227,177 @@ def har2ammo(args):
             for key in stats.keys():
                 print("\t%s: %d" % (key, stats[key]))
         else:
-            for request in reader.read_har(args):
-                if 'delete_header' in args and args['delete_header']:
-                    delete_headers(request, args['delete_header'])
-                if 'add_header' in args and args['add_header']:
-                    add_headers(request, args['add_header'])
-                file_handler.write(make_ammo(request.origin))
+            write = file_handler.write
+            classifier = None
+            if args.get('routes'):
+                classifier = routes.RouteClassifier(
+                    routes.read_routes(args['routes']))
+            scrubber = None
+            literals = list(args.get('scrub_literal') or [])
+            for input_file in args.get('scrub_file') or []:
+                literals.extend(scrub.read_literals(input_file))
+            if literals or args.get('scrub_regex') or \
+                    args.get('scrub_builtin'):
+                scrubber = scrub.Scrubber(
+                    literals, args.get('scrub_regex') or [],
+                    args.get('scrub_builtin') or [],
+                    args.get('scrub_mode') or 'mask')
+            transform = partial(
+                request_to_ammo, args=args, classifier=classifier,
+                scrubber=scrubber)
+            writer = None
+            if args.get('shards'):
+                if not args['output']:
+                    raise ValueError("Shards require output file")
+                transform = sharding.keyed_transform(
+                    transform, args.get('shard_key'))
+                writer = sharding.ShardWriter(
+                    args['output'], args['shards'],
+                    args.get('shard_balance') or 'count', args.get('index'))
+            elif args.get('index'):
+                writer = ammo.AmmoIndexWriter(args['index'], file_handler)
+            if writer:
+                write = writer.write
+            requests = reader.read_har(args)
+            timestamps = array('d')
+            if args.get('schedule'):
+                requests = schedule.collect_timestamps(requests, timestamps)
+            try:
+                pipeline.run_pipeline(
+                    sampling.sample_requests(
+                        requests, args.get('sample_rate'),
+                        args.get('sample_size'), args.get('stratify'),
+                        args.get('prefix_depth') or 1,
+                        args.get('seed') or 0),
+                    transform,
+                    write,
+                    args.get('workers') or 0,
+                    args.get('queue_size') or pipeline.QUEUE_SIZE,
+                    not args.get('unordered'))
+            finally:
+                if writer:
+                    writer.close()
+            if args.get('schedule'):
+                schedule.write_schedule(
+                    schedule.make_schedule(
+                        timestamps, args.get('schedule_mode') or 'fit',
+                        args.get('schedule_period') or 1,
+                        args.get('schedule_tolerance'),
+                        args.get('schedule_window') or
+                        schedule.DEFAULT_WINDOW),
+                    args['schedule'])
     except ValueError as e:
         sys.stderr.write('Error: ' + str(e) + "\n")
         return 1
 
-    if args['output']:
+    if args['output'] and not args.get('shards'):
         file_handler.close()
 
     return 0
 
 
+def count_har(input_file):
+    """Count entries and HTTP requests of har file
+
+    A request is an entry with request method and URL,
+    headers and bodies are not read.
+
+    Args:
+        input_file (str): har file path
+
+    Returns:
+        dict: 'entries' and 'requests' counts
+    """
+
+    if not input_file:
+        raise ValueError('input filename is not specified or empty')
+    with open(input_file, 'r') as file_handler:
+        data = json.load(file_handler)
+    if not ('log' in data and 'entries' in data['log']):
+        raise ValueError('incorrect har-file format')
+    entries = data['log']['entries']
+    requests = 0
+    for entry in entries:
+        request = entry.get('request')
+        if request and 'method' in request and 'url' in request:
+            requests += 1
+    return OrderedDict([('entries', len(entries)), ('requests', requests)])
+
+
+def request_to_ammo(request, args, classifier=None, scrubber=None):
+    """Modify headers, scrub and make ammo of HTTP request
+
+    Request is encoded to bytes once, headers are rewritten in its head
+    and the body is copied only when ammo entry is joined.
+
+    Args:
+        request (HTTPRequest): HTTP request
+        args (dict): console arguments
+        classifier (RouteClassifier): classifier of ammo case tags
+        scrubber (Scrubber): scrubber of sensitive data
+
+    Returns:
+        bytes: ammo entry in phantom format
+    """
+
+    head, body = ammo.split_request(_origin_bytes(request))
+    deleted = [header.lower() for header in args.get('delete_header') or []]
+    if deleted:
+        head = ammo.delete_head_headers(head, args['delete_header'])
+    if args.get('add_header'):
+        present = set(request.headers).difference(deleted)
+        head = ammo.add_head_headers(head, args['add_header'], present)
+    if scrubber:
+        head, body = scrubber.scrub_parts(head, body)
+    case = classifier.classify_request(request) if classifier else ''
+    return ammo.join_ammo([head, body], case)
+
+
+def _origin_bytes(request):
+    """Get HTTP request origin as bytes
+
+    Args:
+        request (HTTPRequest): HTTP request
+
+    Returns:
+        bytes: origin
+    """
+
+    if isinstance(request.origin, bytes):
+        return request.origin
+    return request.origin.encode('utf-8')
+
+
+def _set_origin(request, origin):
+    """Set HTTP request origin keeping its type
+
+    Args:
+        request (HTTPRequest): HTTP request
+        origin (bytes): new origin, decoded if the current one is str
+    """
+
+    if isinstance(request.origin, bytes):
+        request.origin = origin
+    else:
+        request.origin = origin.decode('utf-8')
+
+
 def delete_headers(request, headers):
     """Delete headers from http packet
 
     Args:
         request (HTTPRequest): HTTP request
-        headers (list): headers to be added
+        headers (list): headers to be deleted
 
     Returns:
         HTTPRequest: modified HTTP request
     """
 
+    head, body = ammo.split_request(_origin_bytes(request))
+    _set_origin(request,
+                b''.join([ammo.delete_head_headers(head, headers), body]))
     for header in headers:
-        if header.lower() in request.headers:
-            request.origin = re.sub(
-                '^' + header + ".+?\r\n",
-                '', request.origin,
-                flags=re.IGNORECASE | re.MULTILINE)
-            del request.headers[header.lower()]
+        request.headers.pop(header.lower(), None)
     return request
 
 
@@ -130,18 +413,12 @@ def add_headers(request, headers):
         HTTPRequest: modified HTTP request
     """
 
+    head, body = ammo.split_request(_origin_bytes(request))
+    _set_origin(request, b''.join(
+        [ammo.add_head_headers(head, headers, request.headers), body]))
     for header in headers:
-        arr = re.split(r": *", header, 1)
-        if len(arr) == 2:
-            if arr[0].lower() not in request.headers:
-                request.origin = re.sub(
-                    "\r\n\r\n",
-                    "\r\n" + header + "\r\n\r\n", request.origin,
-                    re.MULTILINE)
-                request.headers[header.lower()] = header
-        else:
-            raise ValueError("Wrong header format, " +
-                             "expected \"<header_name>: <header_value>\"")
+        name = re.split(r": *", header, 1)[0].lower()
+        request.headers.setdefault(name, header)
     return request
 
 
@@ -149,13 +426,15 @@ def make_ammo(request, case=''):
     """Make phantom ammo file
 
     Args:
-        request (str): HTTP request
+        request (str or bytes): HTTP request
         case (str):    ammo mark
 
     Returns:
-        str: string in phantom ammo format
+        str: string in phantom ammo format, bytes for bytes request
     """
 
+    if isinstance(request, bytes):
+        return ammo.join_ammo([request], case)
     ammo_template = (
         "%d %s\n"
         "%s"
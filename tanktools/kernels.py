@@ -0,0 +1,556 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2018 Alexander Grechin
+#
+# Licensed under the BSD 3-Clause license.
+# See LICENSE file in the project root for full license information.
+#
+
+"""Numeric kernels of phout hot paths
+
+Every kernel is written twice: as a plain loop, compiled by numba
+if it is installed, and as vectorized NumPy code used otherwise.
+Both versions return identical results. numba is imported and a kernel
+is compiled on its first call, so tools which don't call kernels
+don't pay for it. Compiled kernels are cached on disk, next to the module
+or in NUMBA_CACHE_DIR, so compilation happens once per installation.
+Set TANKTOOLS_DISABLE_JIT=1 to use NumPy versions even if numba
+is installed.
+"""
+
+import os
+import numpy as np
+
+try:
+    from importlib.util import find_spec
+except ImportError:
+    from pkgutil import find_loader as find_spec
+
+JIT_ENABLED = find_spec('numba') is not None and \
+    os.environ.get('TANKTOOLS_DISABLE_JIT', '0') in ('', '0')
+
+# count of integer fields at the end of phout line
+INT_FIELDS = 10
+
+# tab count in phout line
+TABS_COUNT = INT_FIELDS + 1
+
+# longer numbers are parsed by Python, so the result is exact
+MAX_TIME_DIGITS = 15
+MAX_INT_DIGITS = 18
+
+POW10 = np.array([10.0 ** power for power in range(MAX_TIME_DIGITS + 1)])
+
+# line statuses
+LINE_OK = 0
+LINE_IRREGULAR = 1
+LINE_WRONG_FIELDS = 2
+
+
+class _LazyKernel(object):
+    """Kernel compiled by numba on the first call"""
+
+    def __init__(self, function):
+        """Constructor
+
+        Args:
+            function (function): plain loop implementation
+        """
+
+        self.function = function
+        self.compiled = None
+
+    def __call__(self, *args):
+        if self.compiled is None:
+            import numba
+            self.compiled = numba.njit(cache=True, nogil=True)(self.function)
+        return self.compiled(*args)
+
+
+def _jit(function):
+    """Compile function with numba on the first call if it's enabled
+
+    Args:
+        function (function): plain loop implementation
+
+    Returns:
+        function: lazily compiled function or None
+    """
+
+    if not JIT_ENABLED:
+        return None
+    return _LazyKernel(function)
+
+
+def _tokenize_loop(buffer):
+    """Tokenize phout lines, loop implementation
+
+    Args:
+        buffer (ndarray): uint8 array of whole lines
+
+    Returns:
+        tuple: see tokenize
+    """
+
+    size = buffer.shape[0]
+    lines = 1
+    for position in range(size):
+        if buffer[position] == 10:
+            lines += 1
+    line_bounds = np.zeros((lines, 2), dtype=np.int64)
+    tag_bounds = np.zeros((lines, 2), dtype=np.int64)
+    status = np.zeros(lines, dtype=np.int8)
+    times = np.zeros(lines, dtype=np.float64)
+    values = np.zeros((lines, INT_FIELDS), dtype=np.int64)
+
+    count = 0
+    empty = False
+    start = 0
+    while start < size:
+        end = start
+        while end < size and buffer[end] != 10:
+            end += 1
+        next_start = end + 1
+        while start < end and (buffer[start] == 32 or buffer[start] == 9 or
+                               buffer[start] == 13):
+            start += 1
+        while end > start and (buffer[end - 1] == 32 or
+                               buffer[end - 1] == 9 or
+                               buffer[end - 1] == 13):
+            end -= 1
+        if start == end:
+            empty = True
+            break
+        line_bounds[count, 0] = start
+        line_bounds[count, 1] = end
+
+        tabs = 0
+        for position in range(start, end):
+            if buffer[position] == 9:
+                tabs += 1
+        if tabs != TABS_COUNT:
+            status[count] = LINE_WRONG_FIELDS
+            count += 1
+            start = next_start
+            continue
+
+        regular = True
+        field_start = start
+        for field in range(TABS_COUNT + 1):
+            field_end = field_start
+            while field_end < end and buffer[field_end] != 9:
+                field_end += 1
+            if field == 0:
+                digits = 0
+                dots = 0
+                scale = 0
+                mantissa = 0
+                for position in range(field_start, field_end):
+                    char = int(buffer[position])
+                    if char == 46:
+                        dots += 1
+                    elif 48 <= char <= 57:
+                        mantissa = mantissa * 10 + (char - 48)
+                        digits += 1
+                        if dots > 0:
+                            scale += 1
+                    else:
+                        regular = False
+                if digits < 1 or digits > MAX_TIME_DIGITS or dots > 1:
+                    regular = False
+                if regular:
+                    times[count] = mantissa / POW10[scale]
+            elif field == 1:
+                tag_bounds[count, 0] = field_start
+                tag_bounds[count, 1] = field_end
+            else:
+                negative = field_end > field_start and \
+                    buffer[field_start] == 45
+                digits_start = field_start + 1 if negative else field_start
+                digits = field_end - digits_start
+                if digits < 1 or digits > MAX_INT_DIGITS:
+                    regular = False
+                value = 0
+                for position in range(digits_start, field_end):
+                    char = int(buffer[position])
+                    if 48 <= char <= 57:
+                        value = value * 10 + (char - 48)
+                    else:
+                        regular = False
+                values[count, field - 2] = -value if negative else value
+            field_start = field_end + 1
+
+        if not regular:
+            status[count] = LINE_IRREGULAR
+            times[count] = 0
+            for field in range(INT_FIELDS):
+                values[count, field] = 0
+        count += 1
+        start = next_start
+
+    return (count, empty, line_bounds[:count], status[:count],
+            times[:count], values[:count], tag_bounds[:count])
+
+
+def _parse_digits(buffer, starts, ends, max_digits, dots_allowed):
+    """Parse unsigned decimal numbers, vectorized
+
+    Args:
+        buffer (ndarray): uint8 array padded with a zero byte
+        starts (ndarray): number start positions
+        ends (ndarray): number end positions
+        max_digits (int): the largest digits count
+        dots_allowed (bool): allow decimal dot
+
+    Returns:
+        tuple: mantissas, digits after dot, regularity mask
+    """
+
+    lengths = ends - starts
+    mantissa = np.zeros(starts.shape, dtype=np.int64)
+    digits = np.zeros(starts.shape, dtype=np.int64)
+    dots = np.zeros(starts.shape, dtype=np.int64)
+    scale = np.zeros(starts.shape, dtype=np.int64)
+    irregular = lengths > max_digits + 1
+    longest = min(int(lengths.max()) if lengths.size else 0, max_digits + 1)
+    for offset in range(longest):
+        inside = offset < lengths
+        chars = buffer[np.minimum(starts + offset, len(buffer) - 1)]
+        digit = chars.astype(np.int64) - 48
+        is_digit = inside & (digit >= 0) & (digit <= 9)
+        is_dot = inside & (chars == 46)
+        if not dots_allowed:
+            is_dot[...] = False
+        irregular |= inside & ~is_digit & ~is_dot
+        mantissa = np.where(is_digit, mantissa * 10 + digit, mantissa)
+        scale += is_digit & (dots > 0)
+        digits += is_digit
+        dots += is_dot
+    regular = ~irregular & (digits >= 1) & (digits <= max_digits) & \
+        (dots <= 1)
+    return mantissa, scale, regular
+
+
+def _tokenize_numpy(buffer):
+    """Tokenize phout lines, NumPy implementation
+
+    Args:
+        buffer (ndarray): uint8 array of whole lines
+
+    Returns:
+        tuple: see tokenize
+    """
+
+    size = len(buffer)
+    newlines = np.flatnonzero(buffer == 10)
+    starts = np.concatenate(([0], newlines + 1))
+    ends = np.concatenate((newlines, [size]))
+    if starts[-1] >= size:
+        starts, ends = starts[:-1], ends[:-1]
+
+    solid = np.flatnonzero(
+        (buffer != 32) & (buffer != 9) & (buffer != 13) & (buffer != 10))
+    first = np.append(solid, size)[np.searchsorted(solid, starts)]
+    nonempty = first < ends
+    count = len(starts)
+    empty = not nonempty.all()
+    if empty:
+        count = int(np.argmin(nonempty))
+    line_bounds = np.zeros((count, 2), dtype=np.int64)
+    line_bounds[:, 0] = first[:count]
+    if count:
+        line_bounds[:, 1] = solid[np.searchsorted(solid, ends[:count]) - 1] + 1
+
+    tabs = np.flatnonzero(buffer == 9)
+    tab_first = np.searchsorted(tabs, line_bounds[:, 0])
+    tab_count = np.searchsorted(tabs, line_bounds[:, 1]) - tab_first
+    status = np.where(tab_count == TABS_COUNT, LINE_OK,
+                      LINE_WRONG_FIELDS).astype(np.int8)
+    times = np.zeros(count, dtype=np.float64)
+    values = np.zeros((count, INT_FIELDS), dtype=np.int64)
+    tag_bounds = np.zeros((count, 2), dtype=np.int64)
+
+    good = np.flatnonzero(status == LINE_OK)
+    positions = tabs[tab_first[good, None] + np.arange(TABS_COUNT)]
+    field_starts = np.hstack((line_bounds[good, :1], positions + 1))
+    field_ends = np.hstack((positions, line_bounds[good, 1:]))
+    tag_bounds[good, 0] = field_starts[:, 1]
+    tag_bounds[good, 1] = field_ends[:, 1]
+    padded = np.append(buffer, np.uint8(0))
+
+    mantissa, scale, regular = _parse_digits(
+        padded, field_starts[:, 0], field_ends[:, 0], MAX_TIME_DIGITS, True)
+    good_times = mantissa / POW10[np.minimum(scale, MAX_TIME_DIGITS)]
+
+    int_starts = field_starts[:, 2:]
+    int_ends = field_ends[:, 2:]
+    negative = (int_ends > int_starts) & (padded[int_starts] == 45)
+    int_values, _, int_regular = _parse_digits(
+        padded, int_starts + negative, int_ends, MAX_INT_DIGITS, False)
+    regular &= int_regular.all(axis=1)
+
+    irregular = good[~regular]
+    status[irregular] = LINE_IRREGULAR
+    good = good[regular]
+    times[good] = good_times[regular]
+    values[good] = np.where(negative, -int_values, int_values)[regular]
+    return count, empty, line_bounds, status, times, values, tag_bounds
+
+
+_tokenize_jit = _jit(_tokenize_loop)
+
+
+def tokenize(buffer):
+    """Tokenize phout lines
+
+    Lines are stripped of spaces, tokenizing stops at the first empty line.
+    Numbers which may be parsed differently by Python are not parsed,
+    such lines are marked as irregular.
+
+    Args:
+        buffer (ndarray): uint8 array of whole lines
+
+    Returns:
+        tuple: lines count, empty line flag, stripped line bounds,
+               line statuses, timestamps, integer fields
+               and tag bounds of every line
+    """
+
+    if _tokenize_jit is not None:
+        return _tokenize_jit(buffer)
+    return _tokenize_numpy(buffer)
+
+
+def _reduce_by_bucket_loop(values, inverse, buckets_count, initial, maximum):
+    """Reduce values by bucket, loop implementation
+
+    Args:
+        values (ndarray): values
+        inverse (ndarray): bucket index of each value
+        buckets_count (int): buckets count
+        initial (number): initial value of each bucket
+        maximum (bool): get maximum instead of minimum
+
+    Returns:
+        ndarray: reduced values per bucket
+    """
+
+    result = np.full(buckets_count, initial, dtype=values.dtype)
+    for index in range(values.shape[0]):
+        bucket = inverse[index]
+        if maximum:
+            if values[index] > result[bucket]:
+                result[bucket] = values[index]
+        elif values[index] < result[bucket]:
+            result[bucket] = values[index]
+    return result
+
+
+def _reduce_by_bucket_numpy(values, inverse, buckets_count, initial,
+                            maximum):
+    """Reduce values by bucket, NumPy implementation
+
+    Args:
+        values (ndarray): values
+        inverse (ndarray): bucket index of each value
+        buckets_count (int): buckets count
+        initial (number): initial value of each bucket
+        maximum (bool): get maximum instead of minimum
+
+    Returns:
+        ndarray: reduced values per bucket
+    """
+
+    result = np.full(buckets_count, initial, dtype=values.dtype)
+    (np.maximum if maximum else np.minimum).at(result, inverse, values)
+    return result
+
+
+_reduce_by_bucket_jit = _jit(_reduce_by_bucket_loop)
+
+
+def reduce_by_bucket(values, inverse, buckets_count, initial, maximum):
+    """Get minimum or maximum of values by bucket
+
+    Args:
+        values (ndarray): values
+        inverse (ndarray): bucket index of each value
+        buckets_count (int): buckets count
+        initial (number): initial value of each bucket
+        maximum (bool): get maximum instead of minimum
+
+    Returns:
+        ndarray: reduced values per bucket
+    """
+
+    if _reduce_by_bucket_jit is not None:
+        return _reduce_by_bucket_jit(
+            values, inverse, buckets_count, initial, maximum)
+    return _reduce_by_bucket_numpy(
+        values, inverse, buckets_count, initial, maximum)
+
+
+def _sparse_counts_loop(buckets, keys, keys_count):
+    """Count (bucket, key) pairs of sorted buckets, loop implementation
+
+    Args:
+        buckets (ndarray): non-decreasing bucket indexes
+        keys (ndarray): key indexes below keys_count
+        keys_count (int): keys count
+
+    Returns:
+        tuple: see sparse_counts
+    """
+
+    size = buckets.shape[0]
+    result_buckets = np.empty(size, dtype=np.int64)
+    result_keys = np.empty(size, dtype=np.int64)
+    result_counts = np.empty(size, dtype=np.int64)
+    counts = np.zeros(keys_count, dtype=np.int64)
+    touched = np.empty(size, dtype=np.int64)
+    result_size = 0
+    start = 0
+    while start < size:
+        bucket = buckets[start]
+        touched_count = 0
+        end = start
+        while end < size and buckets[end] == bucket:
+            key = keys[end]
+            if counts[key] == 0:
+                touched[touched_count] = key
+                touched_count += 1
+            counts[key] += 1
+            end += 1
+        for key in np.sort(touched[:touched_count]):
+            result_buckets[result_size] = bucket
+            result_keys[result_size] = key
+            result_counts[result_size] = counts[key]
+            counts[key] = 0
+            result_size += 1
+        start = end
+    return (result_buckets[:result_size], result_keys[:result_size],
+            result_counts[:result_size])
+
+
+def _sparse_counts_numpy(buckets, keys, keys_count):
+    """Count (bucket, key) pairs, NumPy implementation
+
+    Args:
+        buckets (ndarray): bucket indexes
+        keys (ndarray): key indexes below keys_count
+        keys_count (int): keys count
+
+    Returns:
+        tuple: see sparse_counts
+    """
+
+    flat = buckets * keys_count + keys
+    unique, counts = np.unique(flat, return_counts=True)
+    return (unique // keys_count, unique % keys_count,
+            counts.astype(np.int64))
+
+
+_sparse_counts_jit = _jit(_sparse_counts_loop)
+
+
+def sparse_counts(buckets, keys, keys_count):
+    """Count (bucket, key) pairs
+
+    Args:
+        buckets (ndarray): bucket indexes
+        keys (ndarray): key indexes below keys_count
+        keys_count (int): keys count
+
+    Returns:
+        tuple: buckets, keys and counts of unique pairs
+               ordered by bucket and key
+    """
+
+    buckets = buckets.astype(np.int64)
+    keys = keys.astype(np.int64)
+    if _sparse_counts_jit is not None and \
+            np.all(buckets[1:] >= buckets[:-1]):
+        return _sparse_counts_jit(buckets, keys, keys_count)
+    return _sparse_counts_numpy(buckets, keys, keys_count)
+
+
+def _histogram_loop(values, edges):
+    """Count values per bucket, loop implementation
+
+    Args:
+        values (ndarray): values
+        edges (ndarray): bucket edges
+
+    Returns:
+        ndarray: bucket counts
+    """
+
+    buckets_count = edges.shape[0] - 1
+    counts = np.zeros(buckets_count, dtype=np.int64)
+    for index in range(values.shape[0]):
+        low = 0
+        high = buckets_count - 1
+        while low < high:
+            middle = (low + high + 1) // 2
+            if edges[middle] <= values[index]:
+                low = middle
+            else:
+                high = middle - 1
+        counts[low] += 1
+    return counts
+
+
+def _histogram_numpy(values, edges):
+    """Count values per bucket, NumPy implementation
+
+    Args:
+        values (ndarray): values
+        edges (ndarray): bucket edges
+
+    Returns:
+        ndarray: bucket counts
+    """
+
+    index = np.searchsorted(edges, values, side='right') - 1
+    return np.bincount(
+        np.clip(index, 0, len(edges) - 2), minlength=len(edges) - 1
+    ).astype(np.int64)
+
+
+_histogram_jit = _jit(_histogram_loop)
+
+
+def histogram(values, edges):
+    """Count values per bucket, values out of range fall
+       into the first or the last bucket
+
+    Args:
+        values (ndarray): values
+        edges (ndarray): bucket edges, bucket i covers [edges[i], edges[i + 1])
+
+    Returns:
+        ndarray: bucket counts
+    """
+
+    if _histogram_jit is not None:
+        return _histogram_jit(values, edges)
+    return _histogram_numpy(values, edges)
+
+
+def warm_up():
+    """Compile and cache all kernels on tiny inputs
+
+    Returns:
+        bool: True if kernels are compiled by numba
+    """
+
+    line = b"1516295382.983\t#0\t6201\t281\t94\t5785\t41\t5991\t" \
+        b"26697\t391\t0\t200"
+    tokenize(np.frombuffer(line, dtype=np.uint8))
+    values = np.array([3, 1, 2], dtype=np.int64)
+    buckets = np.array([0, 0, 1], dtype=np.int64)
+    reduce_by_bucket(values, buckets, 2, 0, True)
+    sparse_counts(buckets, values, 4)
+    histogram(values, np.array([0, 2, 4], dtype=np.int64))
+    return JIT_ENABLED
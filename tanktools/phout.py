@@ -27,7 +27,17 @@ phout file format:
 
 import datetime
 import dateutil
+import json
+import threading
+from collections import OrderedDict
+import numpy as np
 import pandas as pd
+from tanktools import kernels
+
+try:
+    import queue
+except ImportError:
+    import Queue as queue
 
 PHOUT_FIELDS = ['time',
                 'tag',
@@ -42,6 +52,34 @@ PHOUT_FIELDS = ['time',
                 'net_code',
                 'proto_code']
 
+DEFAULT_QUANTILES = [0.1, 0.2, 0.3, 0.4, 0.5,
+                     0.6, 0.7, 0.8, 0.9, 0.95,
+                     0.98, 0.99, 1.0]
+
+# numeric fields summed per rollup bucket
+ROLLUP_SUM_FIELDS = PHOUT_FIELDS[2:10]
+
+# fields kept as latency histograms per rollup bucket
+ROLLUP_HISTOGRAM_FIELDS = ['interval_real', 'latency']
+
+# supported DataFrame implementations
+BACKENDS = ['pandas', 'polars']
+
+# the largest timing covered by histograms, ~71 minutes (mks)
+HISTOGRAM_MAX_VALUE = 2 ** 32
+
+# interval_real and its parts
+TIMING_FIELDS = PHOUT_FIELDS[2:7]
+
+# the largest heatmap counted with dense bincount
+HEATMAP_MAX_CELLS = 2 ** 24
+
+# timeline downsampling algorithms
+DOWNSAMPLE_METHODS = ['lttb', 'minmax']
+
+# size of phout file block tokenized at once
+READ_BUFFER_SIZE = 16 * 1024 * 1024
+
 
 def stop_criteria(index, date, flags):
     """Check stop criteria
@@ -83,19 +121,105 @@ def start_criteria(date, flags):
     return result
 
 
-def parse_phout(input_file, flags=None):
+def _import_polars():
+    """Import optional polars module
+
+    Returns:
+        module: polars
+    """
+
+    try:
+        import polars
+    except ImportError:
+        raise ImportError(
+            "polars is required for polars backend, " +
+            "install it with \"pip install tanktools[polars]\"")
+    return polars
+
+
+def _is_polars(data_frame):
+    """Check that data is polars DataFrame
+
+    Args:
+        data_frame (DataFrame): data
+
+    Returns:
+        bool: True for polars DataFrame
+    """
+
+    return type(data_frame).__module__.split('.')[0] == 'polars'
+
+
+def get_column(data_frame, field_name):
+    """Get column values of pandas or polars DataFrame
+
+    Args:
+        data_frame (DataFrame): data
+        field_name (str): column name
+
+    Returns:
+        ndarray: column values
+    """
+
+    if _is_polars(data_frame):
+        return data_frame.get_column(field_name).to_numpy()
+    return data_frame[field_name].values
+
+
+def get_time_bounds(data_frame):
+    """Get the first and the last request timestamps
+
+    Args:
+        data_frame (DataFrame): data
+
+    Returns:
+        tuple: the first and the last timestamps
+    """
+
+    if _is_polars(data_frame):
+        times = data_frame.get_column('time')
+        return times[0], times[-1]
+    return data_frame.iloc[0].time, data_frame.iloc[-1].time
+
+
+def filter_rows(data_frame, mask):
+    """Get rows of pandas or polars DataFrame by boolean mask
+
+    Args:
+        data_frame (DataFrame): data
+        mask (ndarray): boolean mask
+
+    Returns:
+        DataFrame: selected rows
+    """
+
+    if _is_polars(data_frame):
+        return data_frame.filter(mask)
+    return data_frame[mask]
+
+
+def parse_phout(input_file, flags=None, backend='pandas', buffer_size=None,
+                read_ahead=0):
     """Parse yandex-tank phout file and convert to DataFrame
 
     Args:
         input_file (str): input file path
         flags (dict): List of flags
+        backend (str): DataFrame implementation, one of BACKENDS
+        buffer_size (int): size of file block parsed at once (bytes),
+                           READ_BUFFER_SIZE by default
+        read_ahead (int): count of blocks read in advance by background
+                          thread while the previous block is parsed,
+                          0 to read in the current thread
 
     Returns:
         DataFrame: parsed records
     """
 
+    if backend not in BACKENDS:
+        raise ValueError("Unknown backend %s" % backend)
+
     flags = flags or []
-    data = []
     if 'to_date' in flags:
         flags['to_date'] = float(dateutil.parser.parse(
             flags['to_date']).strftime("%s.%f"))
@@ -104,29 +228,240 @@ def parse_phout(input_file, flags=None):
             flags['from_date']).strftime("%s.%f"))
     if 'limit' in flags:
         flags['limit'] = int(flags['limit'])
-    index = 0
 
-    file_handler = open(input_file, 'r')
-    for line in file_handler:
-        line = line.strip(" \r\n\t")
-        if not line:
-            break
-        elems = line.split("\t")
-        if len(elems) != len(PHOUT_FIELDS):
-            raise ValueError(
-                "Incorrect fields count in line " +
-                str(index + 1) + ": \"" + line + "\""
-            )
-        elems[0] = float(elems[0])
-        if not start_criteria(elems[0], flags):
-            continue
-        data.append(elems)
-        index = index + 1
-        if stop_criteria(index, elems[0], flags):
+    times, tags, values = _read_phout(
+        input_file, flags, buffer_size or READ_BUFFER_SIZE, read_ahead)
+    if backend == 'polars':
+        pl = _import_polars()
+        return pl.DataFrame(
+            [pl.Series('time', times, dtype=pl.Float64),
+             pl.Series('tag', tags, dtype=pl.Utf8)] +
+            [pl.Series(field, values[:, index], dtype=pl.Int64)
+             for index, field in enumerate(PHOUT_FIELDS[2:])])
+    if not len(times):
+        data_frame = pd.DataFrame([], columns=PHOUT_FIELDS)
+        data_frame[PHOUT_FIELDS[-10:]] = \
+            data_frame[PHOUT_FIELDS[-10:]].astype(int)
+        return data_frame
+    columns = OrderedDict([('time', times), ('tag', tags)])
+    for index, field in enumerate(PHOUT_FIELDS[2:]):
+        columns[field] = values[:, index]
+    return pd.DataFrame(columns)
+
+
+def _read_blocks(file_handler, buffer_size):
+    """Read file by blocks
+
+    Args:
+        file_handler (file): binary file
+        buffer_size (int): block size (bytes)
+
+    Yields:
+        bytes: blocks, empty one at the end of file
+    """
+
+    while True:
+        block = file_handler.read(buffer_size)
+        yield block
+        if not block:
+            return
+
+
+def _read_blocks_ahead(file_handler, buffer_size, buffers):
+    """Read file by blocks in background thread
+
+    The thread keeps up to buffers blocks ready, so reading overlaps
+    with parsing. It's stopped when the generator is closed.
+
+    Args:
+        file_handler (file): binary file
+        buffer_size (int): block size (bytes)
+        buffers (int): count of blocks read in advance
+
+    Yields:
+        bytes: blocks, empty one at the end of file
+    """
+
+    blocks = queue.Queue(buffers)
+    stop = threading.Event()
+
+    def put(item):
+        while not stop.is_set():
+            try:
+                blocks.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                pass
+
+    def read():
+        try:
+            for block in _read_blocks(file_handler, buffer_size):
+                put((block, None))
+                if stop.is_set():
+                    return
+        except BaseException as exception:
+            # the consumer waits for a block, so any error is passed to it
+            put((b'', exception))
+
+    thread = threading.Thread(target=read)
+    thread.daemon = True
+    thread.start()
+    try:
+        while True:
+            block, error = blocks.get()
+            if error is not None:
+                raise error
+            yield block
+            if not block:
+                return
+    finally:
+        stop.set()
+        thread.join()
+
+
+def _read_phout(input_file, flags, buffer_size, read_ahead=0):
+    """Read phout file by blocks of whole lines and parse them
+
+    Args:
+        input_file (str): input file path
+        flags (dict): List of parsed flags
+        buffer_size (int): block size (bytes)
+        read_ahead (int): count of blocks read in advance by background
+                          thread, 0 to read in the current thread
+
+    Returns:
+        tuple: timestamps, tags and integer fields of selected requests
+    """
+
+    parts = []
+    accepted = 0
+    remainder = b''
+    with open(input_file, 'rb') as file_handler:
+        if read_ahead:
+            blocks = _read_blocks_ahead(file_handler, buffer_size, read_ahead)
+        else:
+            blocks = _read_blocks(file_handler, buffer_size)
+        try:
+            for block in blocks:
+                if block:
+                    cut = block.rfind(b'\n') + 1
+                    if not cut:
+                        remainder += block
+                        continue
+                    buffer = remainder + block[:cut]
+                    remainder = block[cut:]
+                else:
+                    buffer = remainder
+                accepted, stop = _parse_buffer(
+                    buffer, flags, accepted, parts)
+                if stop:
+                    break
+        finally:
+            blocks.close()
+
+    if not parts:
+        return (np.array([], dtype=np.float64), np.array([], dtype=object),
+                np.zeros((0, len(PHOUT_FIELDS) - 2), dtype=np.int64))
+    return tuple(np.concatenate(columns) for columns in zip(*parts))
+
+
+def _decode_tags(buffer, tag_bounds):
+    """Decode tags of lines
+
+    Args:
+        buffer (ndarray): uint8 array
+        tag_bounds (ndarray): start and end position of each tag
+
+    Returns:
+        ndarray: tags as str objects
+    """
+
+    lengths = tag_bounds[:, 1] - tag_bounds[:, 0]
+    width = max(int(lengths.max()) if len(lengths) else 0, 1)
+    offsets = np.arange(width)
+    positions = np.minimum(tag_bounds[:, :1] + offsets, len(buffer) - 1)
+    chars = np.where(offsets < lengths[:, None], buffer[positions], 0)
+    fixed = np.ascontiguousarray(chars, dtype=np.uint8).view('S%d' % width)
+    unique, inverse = np.unique(fixed.ravel(), return_inverse=True)
+    decoded = np.array([tag.decode('utf-8') for tag in unique], dtype=object)
+    return decoded[inverse.ravel()]
+
+
+def _parse_buffer(buffer, flags, accepted, parts):
+    """Parse block of whole phout lines
+
+    Lines are selected as parse_phout did it line by line:
+    parsing stops at the first empty line or when stop criteria
+    is achieved, errors of lines after that are ignored.
+
+    Args:
+        buffer (bytes): whole lines
+        flags (dict): List of parsed flags
+        accepted (int): count of requests selected before the block
+        parts (list): selected timestamps, tags and integer fields
+                      are appended to it
+
+    Returns:
+        tuple: count of selected requests, stop flag
+    """
+
+    data = np.frombuffer(buffer, dtype=np.uint8)
+    (count, empty, line_bounds, status, times, values,
+     tag_bounds) = kernels.tokenize(data)
+
+    wrong = np.flatnonzero(status == kernels.LINE_WRONG_FIELDS)
+    limit = int(wrong[0]) if len(wrong) else count
+    error = None
+    irregular = {}
+    for line in np.flatnonzero(status[:limit] == kernels.LINE_IRREGULAR):
+        start, end = line_bounds[line]
+        elems = buffer[start:end].decode('utf-8').split("\t")
+        try:
+            times[line] = float(elems[0])
+        except ValueError as exception:
+            limit = line
+            error = exception
             break
-    data_frame = pd.DataFrame(data, columns=PHOUT_FIELDS)
-    data_frame[PHOUT_FIELDS[-10:]] = data_frame[PHOUT_FIELDS[-10:]].astype(int)
-    return data_frame
+        irregular[line] = elems
+
+    times = times[:limit]
+    selected = np.ones(limit, dtype=bool)
+    if 'from_date' in flags:
+        selected = times >= flags['from_date']
+    stops = np.zeros(limit, dtype=bool)
+    if 'limit' in flags:
+        stops = accepted + np.cumsum(selected) >= flags['limit']
+    elif 'to_date' in flags:
+        stops = times >= flags['to_date']
+    stops = np.flatnonzero(selected & stops)
+
+    stop = empty
+    if len(stops):
+        stop = True
+        selected[stops[0] + 1:] = False
+    elif len(wrong) and limit == wrong[0]:
+        start, end = line_bounds[limit]
+        raise ValueError(
+            "Incorrect fields count in line " +
+            str(accepted + int(selected.sum()) + 1) + ": \"" +
+            buffer[start:end].decode('utf-8') + "\""
+        )
+    elif error is not None:
+        raise error
+
+    rows = np.flatnonzero(selected)
+    tags = _decode_tags(data, tag_bounds[rows])
+    values = values[rows]
+    if irregular:
+        lines = np.array(sorted(irregular), dtype=np.int64)
+        indexes = np.searchsorted(rows, lines)
+        for index, line in zip(indexes, lines):
+            if index < len(rows) and rows[index] == line:
+                elems = irregular[line]
+                tags[index] = elems[1]
+                values[index] = [int(elem) for elem in elems[2:]]
+    parts.append((times[rows], tags, values))
+    return accepted + len(rows), stop
 
 
 def size(data_frame):
@@ -154,49 +489,102 @@ def subset(data_frame, start, offset):
         DataFrame: data_frame subset
     """
 
+    if _is_polars(data_frame):
+        return data_frame.slice(start, offset)
     return data_frame.iloc[start:start + offset]
 
 
-def get_quantiles(data_frame, field_name, quantile_list=None):
+def get_quantiles(data_frame, field_name, quantile_list=None,
+                  expected_interval=None):
     """Get quantiles for specific field
 
     Args:
         data_frame (DataFrame): data
         field_name (str): data_frame column name
         quantile_list (list): list of quantile values
+        expected_interval (int): expected interval between requests (mks),
+            if set quantiles are corrected for coordinated omission,
+            precision is limited by log_bucket_edges buckets
 
     Returns:
         list: list of counted quantiles
     """
 
     if not quantile_list:
-        quantile_list = [0.1, 0.2, 0.3, 0.4, 0.5,
-                         0.6, 0.7, 0.8, 0.9, 0.95,
-                         0.98, 0.99, 1.0]
-    data_frame[field_name] = data_frame[field_name].fillna(0).astype(int)
-    quantiles = data_frame[field_name].quantile(quantile_list)
+        quantile_list = DEFAULT_QUANTILES
+    if _is_polars(data_frame):
+        pl = _import_polars()
+        column = pl.col(field_name).fill_null(0).fill_nan(0).cast(pl.Int64)
+        query = data_frame.lazy()
+        if not expected_interval:
+            row = query.select([
+                column.quantile(quantile, interpolation='linear')
+                .alias(str(index))
+                for index, quantile in enumerate(quantile_list)
+            ]).collect().row(0)
+            return pd.DataFrame({
+                'quantile': quantile_list,
+                field_name: np.array(row, dtype=np.float64)
+            })
+        values = query.select(column).collect() \
+            .get_column(field_name).to_numpy()
+    else:
+        column = data_frame[field_name].fillna(0).astype(int)
+        values = column.values
+    if expected_interval:
+        edges = log_bucket_edges()
+        counts = kernels.histogram(values, edges)
+        counts = _correct_coordinated_omission(
+            counts, edges, expected_interval)
+        min_value = max_value = None
+        if len(values):
+            min_value = values.min()
+            max_value = values.max()
+        return pd.DataFrame({
+            'quantile': quantile_list,
+            field_name: get_histogram_quantiles(
+                counts, edges, quantile_list, min_value, max_value)
+        })
+    quantiles = column.quantile(quantile_list)
     quantiles = quantiles.to_frame().reset_index()
     quantiles.rename(columns={'index': 'quantile'}, inplace=True)
     return quantiles
 
 
-def print_quantiles(data_frame, field_name, quantile_list=None):
+def print_quantiles(data_frame, field_name, quantile_list=None,
+                    expected_interval=None):
     """Print quantiles for specific field
 
     Args:
         data_frame (DataFrame): data
         field_name (str): data_frame column name
         quantiles (list): list of quantile values
+        expected_interval (int): expected interval between requests (mks)
+                                 to correct coordinated omission
     """
 
-    quantiles = get_quantiles(data_frame, field_name, quantile_list)
+    quantiles = get_quantiles(
+        data_frame, field_name, quantile_list, expected_interval)
+    from_date, to_date = get_time_bounds(data_frame)
+    _print_quantiles(
+        quantiles, field_name, data_frame.shape[0], from_date, to_date)
+
+
+def _print_quantiles(quantiles, field_name, count, from_date, to_date):
+    """Print quantiles table with the header
+
+    Args:
+        quantiles (DataFrame): quantiles from get_quantiles
+        field_name (str): data_frame column name
+        count (int): requests count
+        from_date (float): the first request timestamp
+        to_date (float): the last request timestamp
+    """
 
-    from_date = data_frame.iloc[0].time
-    to_date = data_frame.iloc[-1].time
     print("\nPercentiles for %d requests\n \
     from %s\n \
     to   %s:" % (
-        data_frame.shape[0],
+        count,
         datetime.datetime.fromtimestamp(float(from_date)).
         strftime('%Y-%m-%d %H:%M:%S.%f')[:-3],
         datetime.datetime.fromtimestamp(float(to_date)).
@@ -228,8 +616,22 @@ def get_rps(data_frame):
         int: Requests per second
     """
 
-    from_date = data_frame.iloc[0].time
-    to_date = data_frame.iloc[-1].time
+    from_date, to_date = get_time_bounds(data_frame)
+    return count_rps(data_frame.shape[0], from_date, to_date)
+
+
+def count_rps(requests_count, from_date, to_date):
+    """Calculate RPS for requests count between two timestamps
+
+    Args:
+        requests_count (int): requests count
+        from_date (float): the first request timestamp
+        to_date (float): the last request timestamp
+
+    Returns:
+        float: Requests per second
+    """
+
     duration = to_date - from_date
     if duration < 0:
         raise ValueError(
@@ -238,7 +640,6 @@ def get_rps(data_frame):
         )
     if duration == 0:
         duration = 1
-    requests_count = data_frame.shape[0]
     return requests_count/duration
 
 
@@ -253,9 +654,22 @@ def count_uniq_by_field(data_frame, field):
         list: Statistics for HTTP responses
     """
 
-    http_stats = data_frame.proto_code.value_counts().\
+    if _is_polars(data_frame):
+        pl = _import_polars()
+        counts = data_frame.lazy() \
+            .group_by(field, maintain_order=True) \
+            .agg(pl.len().cast(pl.Int64).alias('count')) \
+            .sort('count', descending=True, maintain_order=True) \
+            .with_columns(
+                (pl.col('count') / pl.col('count').sum() * 100)
+                .alias('percent')) \
+            .collect()
+        return pd.DataFrame(OrderedDict(
+            (name, counts.get_column(name).to_numpy())
+            for name in counts.columns))
+    http_stats = data_frame[field].value_counts().\
         rename_axis(field).reset_index(name='count')
-    percent = data_frame.proto_code.value_counts(normalize=True)\
+    percent = data_frame[field].value_counts(normalize=True)\
         * 100
     http_stats['percent'] = percent.values
     return http_stats
@@ -268,7 +682,16 @@ def print_http_reponses(data_frame):
         data_frame (DataFrame): data
     """
 
-    http_stats = count_uniq_by_field(data_frame, 'proto_code')
+    _print_http_stats(count_uniq_by_field(data_frame, 'proto_code'))
+
+
+def _print_http_stats(http_stats):
+    """Print HTTP responses table
+
+    Args:
+        http_stats (DataFrame): statistics from count_uniq_by_field
+    """
+
     http_stats.rename(columns={'proto_code': 'HTTP code'}, inplace=True)
     http_stats.rename(columns={'percent': 'percent (%)'}, inplace=True)
     print(
@@ -280,3 +703,1529 @@ def print_http_reponses(data_frame):
             }
         )
     )
+
+
+def log_bucket_edges(max_value=HISTOGRAM_MAX_VALUE, sub_buckets=16):
+    """Get log-linear histogram bucket edges
+
+    Values below sub_buckets get a bucket per value, every next power of two
+    range is split into sub_buckets equal buckets, so the relative error
+    of a bucket doesn't exceed 1 / sub_buckets.
+
+    Args:
+        max_value (int): the largest value covered by buckets
+        sub_buckets (int): buckets count per power of two range,
+                           should be a power of two
+
+    Returns:
+        ndarray: bucket edges, bucket i covers [edges[i], edges[i + 1])
+    """
+
+    if sub_buckets < 1 or sub_buckets & (sub_buckets - 1):
+        raise ValueError("sub_buckets should be a power of two")
+    edges = list(range(sub_buckets))
+    lower = sub_buckets
+    while lower < max_value:
+        edges.extend(range(lower, lower * 2, lower // sub_buckets))
+        lower = lower * 2
+    edges.append(lower)
+    return np.array(edges, dtype=np.int64)
+
+
+def get_bucket_index(values, edges):
+    """Get histogram bucket index for each value,
+       values out of range fall into the first or the last bucket
+
+    Args:
+        values (ndarray): values
+        edges (ndarray): bucket edges
+
+    Returns:
+        ndarray: bucket indexes
+    """
+
+    index = np.searchsorted(edges, values, side='right') - 1
+    return np.clip(index, 0, len(edges) - 2)
+
+
+def get_histogram_quantiles(counts, edges, quantile_list,
+                            min_value=None, max_value=None):
+    """Get quantiles from histogram
+
+    Each quantile is the highest value of the bucket it falls into,
+    limited by the known minimum and maximum values.
+
+    Args:
+        counts (ndarray): bucket counts
+        edges (ndarray): bucket edges
+        quantile_list (list): list of quantile values
+        min_value (int): the smallest recorded value
+        max_value (int): the largest recorded value
+
+    Returns:
+        ndarray: quantiles, NaN for empty histogram
+    """
+
+    quantile_list = np.asarray(quantile_list, dtype=np.float64)
+    cumulative = np.cumsum(counts)
+    total = cumulative[-1] if len(cumulative) else 0
+    if total <= 0:
+        return np.full(len(quantile_list), np.nan)
+    ranks = np.maximum(np.ceil(quantile_list * total - 1e-9), 1)
+    index = np.searchsorted(cumulative, ranks, side='left')
+    index = np.minimum(index, len(counts) - 1)
+    values = (edges[index + 1] - 1).astype(np.float64)
+    if min_value is not None:
+        values = np.maximum(values, min_value)
+    if max_value is not None:
+        values = np.minimum(values, max_value)
+    return values
+
+
+def _correct_coordinated_omission(counts, edges, expected_interval):
+    """Back-fill requests which were not sent while server stalled
+
+    As HdrHistogram recordValueWithExpectedInterval does, every value v
+    adds values v - expected_interval, v - 2 * expected_interval, ...
+    while they are not less than expected_interval. Values of a bucket
+    are represented by the highest value of the bucket, cumulative counts
+    of back-filled values are computed at every bucket edge at once.
+
+    Args:
+        counts (ndarray): bucket counts
+        edges (ndarray): bucket edges
+        expected_interval (int): expected interval between requests (mks)
+
+    Returns:
+        ndarray: corrected bucket counts
+    """
+
+    if expected_interval <= 0:
+        raise ValueError("expected_interval should be positive")
+    counts = np.asarray(counts, dtype=np.int64)
+    present = np.flatnonzero(counts)
+    values = edges[present + 1] - 1
+    missed = np.maximum(values // expected_interval - 1, 0)
+    # back-filled values of each bucket below each edge
+    steps = np.maximum(
+        (values[:, None] - edges[None, :]) // expected_interval, 0)
+    below = np.clip(missed[:, None] - steps, 0, None)
+    cumulative = (below * counts[present][:, None]).sum(axis=0)
+    return counts + np.diff(cumulative)
+
+
+def _time_buckets(times, period):
+    """Split timestamps into time buckets
+
+    Args:
+        times (ndarray): timestamps
+        period (float): bucket duration in seconds
+
+    Returns:
+        tuple: bucket start times, bucket index of each timestamp,
+               requests count per bucket
+    """
+
+    key = np.floor(times / period).astype(np.int64)
+    first = key.min()
+    key = key - first
+    if key.max() > 4 * len(key) + 65536:
+        present, inverse, counts = np.unique(
+            key, return_inverse=True, return_counts=True)
+    else:
+        counts = np.bincount(key)
+        present = np.flatnonzero(counts)
+        counts = counts[present]
+        remap = np.zeros(key.max() + 1, dtype=np.int64)
+        remap[present] = np.arange(len(present))
+        inverse = remap[key]
+    return (present + first) * period, inverse, counts
+
+
+def _reduce_by_bucket(ufunc, values, inverse, buckets_count, initial):
+    """Reduce values by bucket with ufunc like numpy.minimum
+
+    Args:
+        ufunc (ufunc): reducing function
+        values (ndarray): values
+        inverse (ndarray): bucket index of each value
+        buckets_count (int): buckets count
+        initial (number): initial value of each bucket
+
+    Returns:
+        ndarray: reduced values per bucket
+    """
+
+    if len(inverse) and np.all(inverse[1:] >= inverse[:-1]):
+        starts = np.flatnonzero(np.diff(inverse, prepend=-1))
+        result = np.full(buckets_count, initial, dtype=values.dtype)
+        result[inverse[starts]] = ufunc.reduceat(values, starts)
+        return result
+    return kernels.reduce_by_bucket(
+        values, inverse, buckets_count, initial, ufunc is np.maximum)
+
+
+def _sparse_counts(buckets, keys, keys_count, weights=None):
+    """Count (bucket, key) pairs
+
+    Args:
+        buckets (ndarray): bucket indexes
+        keys (ndarray): key indexes below keys_count
+        keys_count (int): keys count
+        weights (ndarray): weight of each pair, 1 by default
+
+    Returns:
+        tuple: buckets, keys and counts of unique pairs
+    """
+
+    if weights is None:
+        return kernels.sparse_counts(buckets, keys, keys_count)
+    flat = buckets.astype(np.int64) * keys_count + keys
+    unique, inverse = np.unique(flat, return_inverse=True)
+    counts = np.bincount(inverse.ravel(), weights=weights)
+    return (unique // keys_count, unique % keys_count,
+            np.rint(counts).astype(np.int64))
+
+
+def _empty_rollup(period, edges):
+    """Make rollup without buckets
+
+    Args:
+        period (float): bucket duration in seconds
+        edges (ndarray): histogram bucket edges
+
+    Returns:
+        dict: empty rollup
+    """
+
+    empty = np.array([], dtype=np.int64)
+    rollup = {
+        'period': float(period),
+        'from_date': np.nan,
+        'to_date': np.nan,
+        'edges': edges,
+        'time': np.array([], dtype=np.float64),
+        'count': empty,
+        'code': empty,
+        'code_bucket': empty,
+        'code_count': empty,
+    }
+    for field in ROLLUP_SUM_FIELDS:
+        rollup['sum_' + field] = empty
+    for field in ROLLUP_HISTOGRAM_FIELDS:
+        rollup['min_' + field] = empty
+        rollup['max_' + field] = empty
+        rollup['hist_%s_bucket' % field] = empty
+        rollup['hist_%s_bin' % field] = empty
+        rollup['hist_%s_count' % field] = empty
+    return rollup
+
+
+def make_rollup(data_frame, period=1, edges=None):
+    """Aggregate requests into time buckets
+
+    Each bucket keeps requests count, sums of timings and sizes,
+    min/max and sparse log-bucketed histograms of
+    ROLLUP_HISTOGRAM_FIELDS and counts of proto_code values.
+    Rollups are mergeable and much smaller than raw data,
+    so reports of long runs may be built from them.
+
+    Args:
+        data_frame (DataFrame): data
+        period (float): bucket duration in seconds
+        edges (ndarray): histogram bucket edges, log_bucket_edges by default
+
+    Returns:
+        dict: rollup, a dict of numpy arrays
+    """
+
+    if edges is None:
+        edges = log_bucket_edges()
+    rollup = _empty_rollup(period, edges)
+    if data_frame.shape[0] == 0:
+        return rollup
+
+    times = get_column(data_frame, 'time').astype(np.float64)
+    bucket_times, inverse, counts = _time_buckets(times, period)
+    buckets_count = len(bucket_times)
+    rollup['from_date'] = float(times[0])
+    rollup['to_date'] = float(times[-1])
+    rollup['time'] = bucket_times
+    rollup['count'] = counts.astype(np.int64)
+
+    for field in ROLLUP_SUM_FIELDS:
+        values = get_column(data_frame, field).astype(np.float64)
+        rollup['sum_' + field] = np.rint(np.bincount(
+            inverse, weights=values, minlength=buckets_count
+        )).astype(np.int64)
+
+    bins_count = len(edges) - 1
+    for field in ROLLUP_HISTOGRAM_FIELDS:
+        values = get_column(data_frame, field).astype(np.int64)
+        rollup['min_' + field] = _reduce_by_bucket(
+            np.minimum, values, inverse, buckets_count,
+            np.iinfo(np.int64).max)
+        rollup['max_' + field] = _reduce_by_bucket(
+            np.maximum, values, inverse, buckets_count,
+            np.iinfo(np.int64).min)
+        (rollup['hist_%s_bucket' % field],
+         rollup['hist_%s_bin' % field],
+         rollup['hist_%s_count' % field]) = _sparse_counts(
+            inverse, get_bucket_index(values, edges), bins_count)
+
+    codes, code_index = np.unique(
+        get_column(data_frame, 'proto_code').astype(np.int64),
+        return_inverse=True)
+    code_bucket, code_key, code_count = _sparse_counts(
+        inverse, code_index.ravel(), len(codes))
+    rollup['code'] = codes[code_key]
+    rollup['code_bucket'] = code_bucket
+    rollup['code_count'] = code_count
+    return rollup
+
+
+def merge_rollups(rollups):
+    """Merge rollups of several parts of a run or several runs
+
+    Args:
+        rollups (list): rollups with equal period and histogram edges
+
+    Returns:
+        dict: merged rollup
+    """
+
+    if not rollups:
+        raise ValueError("Nothing to merge")
+    period = rollups[0]['period']
+    edges = rollups[0]['edges']
+    for rollup in rollups[1:]:
+        if rollup['period'] != period or \
+                not np.array_equal(rollup['edges'], edges):
+            raise ValueError(
+                "Rollups with different period or edges can't be merged")
+    rollups = [rollup for rollup in rollups if len(rollup['time'])]
+    if not rollups:
+        return _empty_rollup(period, edges)
+
+    times, inverse = np.unique(
+        np.concatenate([rollup['time'] for rollup in rollups]),
+        return_inverse=True)
+    inverse = inverse.ravel()
+    buckets_count = len(times)
+    parts = []
+    offset = 0
+    for rollup in rollups:
+        parts.append(inverse[offset:offset + len(rollup['time'])])
+        offset = offset + len(rollup['time'])
+
+    def concat(key):
+        return np.concatenate([rollup[key] for rollup in rollups])
+
+    def remap(key):
+        return np.concatenate([
+            part[rollup[key]] for part, rollup in zip(parts, rollups)
+        ])
+
+    merged = _empty_rollup(period, edges)
+    merged['from_date'] = float(min(r['from_date'] for r in rollups))
+    merged['to_date'] = float(max(r['to_date'] for r in rollups))
+    merged['time'] = times
+    for key in ['count'] + ['sum_' + field for field in ROLLUP_SUM_FIELDS]:
+        merged[key] = np.rint(np.bincount(
+            inverse, weights=concat(key), minlength=buckets_count
+        )).astype(np.int64)
+
+    bins_count = len(edges) - 1
+    for field in ROLLUP_HISTOGRAM_FIELDS:
+        merged['min_' + field] = _reduce_by_bucket(
+            np.minimum, concat('min_' + field), inverse, buckets_count,
+            np.iinfo(np.int64).max)
+        merged['max_' + field] = _reduce_by_bucket(
+            np.maximum, concat('max_' + field), inverse, buckets_count,
+            np.iinfo(np.int64).min)
+        (merged['hist_%s_bucket' % field],
+         merged['hist_%s_bin' % field],
+         merged['hist_%s_count' % field]) = _sparse_counts(
+            remap('hist_%s_bucket' % field),
+            concat('hist_%s_bin' % field),
+            bins_count,
+            concat('hist_%s_count' % field).astype(np.float64))
+
+    codes, code_index = np.unique(concat('code'), return_inverse=True)
+    code_bucket, code_key, code_count = _sparse_counts(
+        remap('code_bucket'), code_index.ravel(), len(codes),
+        concat('code_count').astype(np.float64))
+    merged['code'] = codes[code_key]
+    merged['code_bucket'] = code_bucket
+    merged['code_count'] = code_count
+    return merged
+
+
+def write_rollup(rollup, output_file):
+    """Write rollup to compressed numpy archive
+
+    Args:
+        rollup (dict): rollup
+        output_file (str): output file path
+    """
+
+    with open(output_file, 'wb') as file_handler:
+        np.savez_compressed(file_handler, **rollup)
+
+
+def read_rollup(input_file):
+    """Read rollup from file written by write_rollup
+
+    Args:
+        input_file (str): input file path
+
+    Returns:
+        dict: rollup
+    """
+
+    rollup = {}
+    with np.load(input_file, allow_pickle=False) as archive:
+        for key in archive.files:
+            value = archive[key]
+            rollup[key] = value.item() if value.ndim == 0 else value
+    return rollup
+
+
+def get_rollup_histogram(rollup, field_name):
+    """Get total histogram of field from rollup
+
+    Args:
+        rollup (dict): rollup
+        field_name (str): one of ROLLUP_HISTOGRAM_FIELDS
+
+    Returns:
+        ndarray: bucket counts
+    """
+
+    key = 'hist_%s_bin' % field_name
+    if key not in rollup:
+        raise ValueError("Field %s is not kept in rollup" % field_name)
+    return np.bincount(
+        rollup[key],
+        weights=rollup['hist_%s_count' % field_name],
+        minlength=len(rollup['edges']) - 1
+    )
+
+
+def get_rollup_quantiles(rollup, field_name, quantile_list=None,
+                         expected_interval=None):
+    """Get quantiles for specific field from rollup,
+       precision is limited by histogram buckets
+
+    Args:
+        rollup (dict): rollup
+        field_name (str): one of ROLLUP_HISTOGRAM_FIELDS
+        quantile_list (list): list of quantile values
+        expected_interval (int): expected interval between requests (mks)
+                                 to correct coordinated omission
+
+    Returns:
+        DataFrame: counted quantiles in get_quantiles format
+    """
+
+    if not quantile_list:
+        quantile_list = DEFAULT_QUANTILES
+    counts = get_rollup_histogram(rollup, field_name)
+    if expected_interval:
+        counts = _correct_coordinated_omission(
+            counts, rollup['edges'], expected_interval)
+    min_value = max_value = None
+    if len(rollup['time']):
+        min_value = rollup['min_' + field_name].min()
+        max_value = rollup['max_' + field_name].max()
+    values = get_histogram_quantiles(
+        counts, rollup['edges'], quantile_list, min_value, max_value)
+    return pd.DataFrame({'quantile': quantile_list, field_name: values})
+
+
+def print_rollup_quantiles(rollup, field_name, quantile_list=None,
+                           expected_interval=None):
+    """Print quantiles for specific field from rollup
+
+    Args:
+        rollup (dict): rollup
+        field_name (str): one of ROLLUP_HISTOGRAM_FIELDS
+        quantile_list (list): list of quantile values
+        expected_interval (int): expected interval between requests (mks)
+                                 to correct coordinated omission
+    """
+
+    _print_quantiles(
+        get_rollup_quantiles(
+            rollup, field_name, quantile_list, expected_interval),
+        field_name, rollup['count'].sum(),
+        rollup['from_date'], rollup['to_date']
+    )
+
+
+def get_rollup_rps(rollup):
+    """Calculate RPS for all requests from rollup
+
+    Args:
+        rollup (dict): rollup
+
+    Returns:
+        float: Requests per second
+    """
+
+    return count_rps(
+        rollup['count'].sum(), rollup['from_date'], rollup['to_date'])
+
+
+def get_rollup_mean(rollup, field_name):
+    """Calculate mean value of field from rollup
+
+    Args:
+        rollup (dict): rollup
+        field_name (str): one of ROLLUP_SUM_FIELDS
+
+    Returns:
+        float: mean value, NaN for empty rollup
+    """
+
+    count = rollup['count'].sum()
+    if not count:
+        return np.nan
+    return float(rollup['sum_' + field_name].sum()) / count
+
+
+def count_rollup_codes(rollup):
+    """Count proto_code values from rollup
+
+    Args:
+        rollup (dict): rollup
+
+    Returns:
+        DataFrame: Statistics for HTTP responses
+                   in count_uniq_by_field format
+    """
+
+    counts = pd.Series(rollup['code_count']).groupby(
+        rollup['code']).sum().sort_values(ascending=False, kind='stable')
+    http_stats = counts.rename_axis('proto_code').reset_index(name='count')
+    http_stats['percent'] = \
+        http_stats['count'] * 100.0 / http_stats['count'].sum()
+    return http_stats
+
+
+def print_rollup_http_reponses(rollup):
+    """Print stats for HTTP responses from rollup
+
+    Args:
+        rollup (dict): rollup
+    """
+
+    _print_http_stats(count_rollup_codes(rollup))
+
+
+def get_inflight(data_frame):
+    """Get instantaneous count of in-flight requests
+
+    Every request starts at 'time' and finishes
+    'interval_real' microseconds later. Sorted start and finish events
+    are merged and summed up cumulatively, finishes go before starts
+    at the same moment.
+
+    Args:
+        data_frame (DataFrame): data
+
+    Returns:
+        DataFrame: 'time' of each event and 'concurrency' after it
+    """
+
+    times, concurrency = _inflight_events(data_frame)
+    return pd.DataFrame({'time': times, 'concurrency': concurrency})
+
+
+def _inflight_events(data_frame):
+    """Get sorted events and in-flight requests count after each event
+
+    Args:
+        data_frame (DataFrame): data
+
+    Returns:
+        tuple: event timestamps, in-flight requests count
+    """
+
+    starts = get_column(data_frame, 'time').astype(np.float64)
+    if np.any(starts[1:] < starts[:-1]):
+        starts = np.sort(starts)
+    finishes = np.sort(
+        starts +
+        get_column(data_frame, 'interval_real').astype(np.float64) / 1e6)
+    # merge sorted starts and finishes, finishes go first at the same moment
+    start_position = np.arange(len(starts)) + \
+        np.searchsorted(finishes, starts, side='right')
+    finish_position = np.arange(len(finishes)) + \
+        np.searchsorted(starts, finishes, side='left')
+    times = np.empty(len(starts) + len(finishes), dtype=np.float64)
+    deltas = np.empty(len(times), dtype=np.int64)
+    times[start_position] = starts
+    times[finish_position] = finishes
+    deltas[start_position] = 1
+    deltas[finish_position] = -1
+    return times, np.cumsum(deltas)
+
+
+def _inflight_area(times, concurrency, points):
+    """Get integral of in-flight requests count from the first event
+
+    Args:
+        times (ndarray): sorted event timestamps
+        concurrency (ndarray): in-flight requests count after each event
+        points (ndarray): timestamps to get integral at
+
+    Returns:
+        ndarray: integral at each point (requests * seconds)
+    """
+
+    area = np.concatenate(([0.0], np.cumsum(
+        concurrency[:-1] * np.diff(times))))
+    return np.interp(points, times, area)
+
+
+def get_concurrency(data_frame, period=1):
+    """Get in-flight requests count per time bucket
+
+    Args:
+        data_frame (DataFrame): data
+        period (float): bucket duration in seconds
+
+    Returns:
+        DataFrame: bucket start 'time', average 'concurrency'
+                   and 'max_concurrency' within bucket
+    """
+
+    if data_frame.shape[0] == 0:
+        return pd.DataFrame({
+            'time': [], 'concurrency': [], 'max_concurrency': []})
+    times, concurrency = _inflight_events(data_frame)
+    first = np.floor(times[0] / period)
+    last = np.floor(times[-1] / period) + 1
+    edges = np.arange(first, last + 1) * period
+    average = np.diff(_inflight_area(times, concurrency, edges)) / period
+
+    index = np.searchsorted(times, edges[:-1], side='left')
+    carried = np.where(
+        index > 0, concurrency[np.maximum(index - 1, 0)], 0)
+    ends = np.searchsorted(times, edges[1:], side='left')
+    within = np.maximum.reduceat(
+        concurrency, np.minimum(index, len(concurrency) - 1))
+    within = np.where(ends > index, within, carried)
+    return pd.DataFrame({
+        'time': edges[:-1],
+        'concurrency': average,
+        'max_concurrency': np.maximum(carried, within)
+    })
+
+
+def get_littles_law(data_frame):
+    """Check Little's law: concurrency = RPS * average response time
+
+    Args:
+        data_frame (DataFrame): data
+
+    Returns:
+        dict: 'rps', average 'interval_real' (mks),
+              'expected' concurrency by Little's law,
+              'observed' average concurrency between the first
+              and the last request
+              and relative 'deviation' of observed from expected
+    """
+
+    rps = get_rps(data_frame)
+    interval = float(
+        get_column(data_frame, 'interval_real').astype(float).mean())
+    from_date, to_date = [
+        float(date) for date in get_time_bounds(data_frame)]
+    if to_date == from_date:
+        to_date = from_date + 1
+    times, concurrency = _inflight_events(data_frame)
+    area = _inflight_area(times, concurrency, np.array([from_date, to_date]))
+    observed = (area[1] - area[0]) / (to_date - from_date)
+    expected = rps * interval / 1e6
+    return {
+        'rps': rps,
+        'interval_real': interval,
+        'expected': expected,
+        'observed': observed,
+        'deviation': (observed - expected) / expected if expected else np.nan
+    }
+
+
+def get_histogram(data_frame, fields=None, edges=None):
+    """Get log-bucketed histograms of fields
+
+    Histograms are counted without sorting and may be merged
+    with merge_histograms if they are built with the same edges.
+
+    Args:
+        data_frame (DataFrame): data
+        fields (list): column names, TIMING_FIELDS by default
+        edges (ndarray): histogram bucket edges, log_bucket_edges by default
+
+    Returns:
+        DataFrame: non-empty buckets with bounds 'from' (inclusive),
+                   'to' (exclusive) and a count column per field
+    """
+
+    if not fields:
+        fields = TIMING_FIELDS
+    if edges is None:
+        edges = log_bucket_edges()
+    counts = np.vstack([
+        kernels.histogram(
+            np.nan_to_num(get_column(data_frame, field)).astype(np.int64),
+            edges)
+        for field in fields
+    ])
+    buckets = np.flatnonzero(counts.any(axis=0))
+    histogram = OrderedDict([
+        ('from', edges[buckets]), ('to', edges[buckets + 1])])
+    for index, field in enumerate(fields):
+        histogram[field] = counts[index, buckets]
+    return pd.DataFrame(histogram)
+
+
+def get_heatmap(data_frame, field_name='interval_real', period=1,
+                edges=None):
+    """Get time x value heatmap of field
+
+    Args:
+        data_frame (DataFrame): data
+        field_name (str): column name
+        period (float): time bucket duration in seconds
+        edges (ndarray): histogram bucket edges, log_bucket_edges by default
+
+    Returns:
+        DataFrame: non-empty cells with time bucket start 'time',
+                   value bucket bounds 'from', 'to' and 'count'
+    """
+
+    if edges is None:
+        edges = log_bucket_edges()
+    if data_frame.shape[0] == 0:
+        return pd.DataFrame({
+            'time': np.array([], dtype=np.float64),
+            'from': np.array([], dtype=np.int64),
+            'to': np.array([], dtype=np.int64),
+            'count': np.array([], dtype=np.int64)})
+
+    bucket_times, inverse, _ = _time_buckets(
+        get_column(data_frame, 'time').astype(np.float64), period)
+    bins = get_bucket_index(
+        np.nan_to_num(get_column(data_frame, field_name)).astype(np.int64),
+        edges)
+    lowest = bins.min()
+    bins = bins - lowest
+    width = bins.max() + 1
+    if len(bucket_times) * width <= HEATMAP_MAX_CELLS:
+        counts = np.bincount(
+            inverse * width + bins, minlength=len(bucket_times) * width)
+        cells = np.flatnonzero(counts)
+        buckets, keys, counts = cells // width, cells % width, counts[cells]
+    else:
+        buckets, keys, counts = _sparse_counts(inverse, bins, width)
+    keys = keys + lowest
+    return pd.DataFrame(OrderedDict([
+        ('time', bucket_times[buckets].astype(np.float64)),
+        ('from', edges[keys]),
+        ('to', edges[keys + 1]),
+        ('count', counts.astype(np.int64)),
+    ]))
+
+
+def merge_histograms(histograms):
+    """Merge histograms or heatmaps of several chunks or runs
+
+    Args:
+        histograms (list): results of get_histogram or get_heatmap
+                           built with the same edges
+
+    Returns:
+        DataFrame: merged histogram or heatmap
+    """
+
+    if not histograms:
+        raise ValueError("Nothing to merge")
+    merged = pd.concat(histograms, ignore_index=True)
+    keys = [key for key in ['time', 'from', 'to'] if key in merged.columns]
+    merged = merged.groupby(keys, sort=True).sum().reset_index()
+    bounds_from = merged['from'].values
+    bounds_to = merged['to'].values
+    overlapped = bounds_from[1:] < bounds_to[:-1]
+    if 'time' in merged.columns:
+        times = merged['time'].values
+        overlapped &= times[1:] == times[:-1]
+    if overlapped.any():
+        raise ValueError(
+            "Histograms with different edges can't be merged")
+    counts = [column for column in merged.columns if column not in keys]
+    merged[counts] = merged[counts].fillna(0).astype(np.int64)
+    return merged
+
+
+def lttb_indices(times, values, points):
+    """Select points with Largest-Triangle-Three-Buckets algorithm
+
+    Points are split into buckets by index, every bucket gives a point
+    forming the largest triangle with the point selected in the previous
+    bucket and the average of the next bucket.
+
+    Args:
+        times (ndarray): x values
+        values (ndarray): y values
+        points (int): count of selected points, at least 3
+
+    Returns:
+        ndarray: indexes of selected points
+    """
+
+    size = len(times)
+    if points >= size or points < 3:
+        return np.arange(size)
+    times = times - times[0]
+    bounds = (np.floor(np.arange(points - 1) * (size - 2.0) / (points - 2))
+              + 1).astype(np.int64)
+    bounds[-1] = size - 1
+    counts = np.diff(bounds)
+    mean_times = np.add.reduceat(times[:-1], bounds[:-1]) / counts
+    mean_values = np.add.reduceat(values[:-1], bounds[:-1]) / counts
+    mean_times = np.append(mean_times, times[-1])
+    mean_values = np.append(mean_values, values[-1])
+
+    selected = np.empty(points, dtype=np.int64)
+    selected[0] = 0
+    selected[-1] = size - 1
+    previous = 0
+    for bucket in range(points - 2):
+        start, end = bounds[bucket], bounds[bucket + 1]
+        area = np.abs(
+            (times[previous] - mean_times[bucket + 1]) *
+            (values[start:end] - values[previous]) -
+            (times[previous] - times[start:end]) *
+            (mean_values[bucket + 1] - values[previous]))
+        previous = start + int(np.argmax(area))
+        selected[bucket + 1] = previous
+    return selected
+
+
+def _minmax_indices(values, points):
+    """Select minimum and maximum points of every bucket
+
+    Args:
+        values (ndarray): y values
+        points (int): count of selected points, two per bucket
+
+    Returns:
+        ndarray: sorted indexes of selected points
+    """
+
+    size = len(values)
+    buckets_count = points // 2
+    if points >= size or buckets_count < 1:
+        return np.arange(size)
+    starts = (np.arange(buckets_count) * size) // buckets_count
+    bucket = np.repeat(np.arange(buckets_count), np.diff(np.append(
+        starts, size)))
+    selected = []
+    for ufunc in [np.minimum, np.maximum]:
+        extremes = ufunc.reduceat(values, starts)
+        matched = np.flatnonzero(values == extremes[bucket])
+        first = np.ones(len(matched), dtype=bool)
+        first[1:] = bucket[matched[1:]] != bucket[matched[:-1]]
+        selected.append(matched[first])
+    return np.unique(np.concatenate(selected))
+
+
+def downsample_timeline(data_frame, field_name='interval_real', points=1000,
+                        method='lttb'):
+    """Reduce per-request values of field to plot them
+
+    Requests are split into buckets in file order, so the work
+    is linear in requests count and data is never sorted.
+
+    Args:
+        data_frame (DataFrame): data
+        field_name (str): column name
+        points (int): target points count
+        method (str): one of DOWNSAMPLE_METHODS, 'lttb' keeps visual shape,
+                      'minmax' keeps minimum and maximum of every bucket
+
+    Returns:
+        DataFrame: selected 'time' and field values
+    """
+
+    if method not in DOWNSAMPLE_METHODS:
+        raise ValueError("Unknown method %s" % method)
+    times = get_column(data_frame, 'time').astype(np.float64)
+    values = np.nan_to_num(get_column(data_frame, field_name))
+    if method == 'lttb':
+        selected = lttb_indices(times, values.astype(np.float64), points)
+    else:
+        selected = _minmax_indices(values, points)
+    return pd.DataFrame(OrderedDict([
+        ('time', times[selected]),
+        (field_name, values[selected]),
+    ]))
+
+
+def write_timeline(timeline, output_file, output_format=None):
+    """Write timeline to compact JSON or CSV file
+
+    JSON keeps an array per column: {"time": [...], "latency": [...]}
+
+    Args:
+        timeline (DataFrame): timeline, see downsample_timeline
+        output_file (str): output file path
+        output_format (str): 'json' or 'csv', by file extension by default
+    """
+
+    if output_format is None:
+        output_format = 'json' if output_file.endswith('.json') else 'csv'
+    if output_format == 'json':
+        with open(output_file, 'w') as file_handler:
+            json.dump(
+                OrderedDict(
+                    (column, timeline[column].tolist())
+                    for column in timeline.columns),
+                file_handler, separators=(',', ':'))
+    elif output_format == 'csv':
+        timeline.to_csv(output_file, index=False)
+    else:
+        raise ValueError("Unknown format %s" % output_format)
+
+
+def get_rolling_quantiles(data_frame, field_name, window=10, step=1,
+                          quantile_list=None):
+    """Get quantiles for specific field over sliding time window
+
+    Requests are counted into log-bucketed histograms per step,
+    histogram of each window is a difference of cumulative step
+    histograms, so each step is added and evicted once.
+    Steps are processed by blocks to keep memory bounded.
+    Precision is limited by log_bucket_edges buckets.
+
+    Args:
+        data_frame (DataFrame): data
+        field_name (str): data_frame column name
+        window (float): window duration in seconds, a multiple of step
+        step (float): window step in seconds
+        quantile_list (list): list of quantile values
+
+    Returns:
+        DataFrame: window start 'time', requests 'count'
+                   and a column per quantile value
+    """
+
+    if not quantile_list:
+        quantile_list = DEFAULT_QUANTILES
+    window_steps = int(round(float(window) / step))
+    if window_steps < 1 or abs(window_steps * step - window) > 1e-9:
+        raise ValueError("window should be a multiple of step")
+    if data_frame.shape[0] == 0:
+        return pd.DataFrame(columns=['time', 'count'] + list(quantile_list))
+
+    times = get_column(data_frame, 'time').astype(np.float64)
+    values = np.nan_to_num(get_column(data_frame, field_name)).astype(np.int64)
+    first = np.floor(times.min() / step)
+    key = (np.floor(times / step) - first).astype(np.int64)
+    if np.any(key[1:] < key[:-1]):
+        order = np.argsort(key, kind='stable')
+        key = key[order]
+        values = values[order]
+    edges = log_bucket_edges()
+    bins = get_bucket_index(values, edges)
+    lowest = bins.min()
+    bins = bins - lowest
+    width = bins.max() + 1
+    steps_count = key[-1] + 1
+    window_steps = min(window_steps, steps_count)
+    windows_count = steps_count - window_steps + 1
+
+    def sliding(ufunc, initial):
+        reduced = _reduce_by_bucket(
+            ufunc, values, key, steps_count, initial)
+        return ufunc.reduce(np.lib.stride_tricks.sliding_window_view(
+            reduced, window_steps), axis=1)
+
+    min_values = sliding(np.minimum, np.iinfo(np.int64).max)
+    max_values = sliding(np.maximum, np.iinfo(np.int64).min)
+    quantiles = np.asarray(quantile_list, dtype=np.float64)
+    result = np.full((windows_count, len(quantiles)), np.nan)
+    counts = np.zeros(windows_count, dtype=np.int64)
+    row_bounds = np.searchsorted(key, np.arange(steps_count + 1))
+    block = max(4096, window_steps)
+    carry = np.zeros((0, width), dtype=np.int64)
+
+    for block_start in range(0, steps_count, block):
+        block_end = min(block_start + block, steps_count)
+        low, high = row_bounds[block_start], row_bounds[block_end]
+        histograms = np.bincount(
+            (key[low:high] - block_start) * width + bins[low:high],
+            minlength=(block_end - block_start) * width
+        ).reshape(-1, width)
+        histograms = np.concatenate((carry, histograms))
+        offset = block_start - len(carry)
+        carry = histograms[len(histograms) - window_steps + 1:]
+
+        first_window = max(block_start - window_steps + 1, 0)
+        last_window = block_end - window_steps
+        if last_window < first_window:
+            continue
+        cumulative = np.concatenate((
+            np.zeros((1, width), dtype=np.int64),
+            np.cumsum(histograms, axis=0)
+        ))
+        starts = np.arange(first_window, last_window + 1) - offset
+        windows = np.cumsum(
+            cumulative[starts + window_steps] - cumulative[starts], axis=1)
+        totals = windows[:, -1]
+        ranks = np.maximum(
+            np.ceil(quantiles[None, :] * totals[:, None] - 1e-9), 1)
+        index = (windows[:, None, :] < ranks[:, :, None]).sum(axis=2)
+        index = np.minimum(index, width - 1) + lowest
+        block_result = (edges[index + 1] - 1).astype(np.float64)
+        block_result[totals == 0] = np.nan
+        result[first_window:last_window + 1] = block_result
+        counts[first_window:last_window + 1] = totals
+
+    result = np.minimum(np.maximum(result, min_values[:, None]),
+                        max_values[:, None])
+    rolling = pd.DataFrame(result, columns=list(quantile_list))
+    rolling.insert(0, 'count', counts)
+    rolling.insert(0, 'time', (first + np.arange(windows_count)) * step)
+    return rolling
+
+
+def _window_means(values, window):
+    """Get means of window values before and after each element
+
+    Args:
+        values (ndarray): values
+        window (int): window size
+
+    Returns:
+        tuple: means before and after each element,
+               NaN where window is incomplete
+    """
+
+    cumulative = np.concatenate(([0.0], np.cumsum(values)))
+    count = len(values)
+    before = np.full(count, np.nan)
+    after = np.full(count, np.nan)
+    if count >= window:
+        sums = (cumulative[window:] - cumulative[:-window]) / window
+        before[window:] = sums[:-1]
+        after[:count - window + 1] = sums
+    return before, after
+
+
+def _relative_change(before, after):
+    """Get relative change between two values
+
+    Args:
+        before (ndarray): values before
+        after (ndarray): values after
+
+    Returns:
+        ndarray: relative change, NaN where both values are zero
+    """
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.abs(after - before) / np.maximum(before, after)
+
+
+def get_steady_segments(data_frame, period=1, window=5, tolerance=0.1,
+                        latency_tolerance=0.5, min_duration=10):
+    """Detect segments of steady load, skipping ramp-up, cool-down
+       and steps of load
+
+    Requests are aggregated per period first. A bucket is steady
+    if average RPS and average interval_real of window buckets before
+    and after it differ less than tolerance and latency_tolerance.
+
+    Args:
+        data_frame (DataFrame): data
+        period (float): bucket duration in seconds
+        window (int): buckets count to compare before and after a bucket
+        tolerance (float): allowed relative change of RPS
+        latency_tolerance (float): allowed relative change of interval_real
+        min_duration (float): minimal segment duration in seconds
+
+    Returns:
+        DataFrame: segments 'from_date', 'to_date', requests 'count'
+                   and 'rps' within segment
+    """
+
+    columns = ['from_date', 'to_date', 'count', 'rps']
+    if data_frame.shape[0] == 0:
+        return pd.DataFrame(columns=columns)
+    times = get_column(data_frame, 'time').astype(np.float64)
+    first = np.floor(times.min() / period)
+    key = (np.floor(times / period) - first).astype(np.int64)
+    counts = np.bincount(key)
+    intervals = np.bincount(
+        key,
+        weights=get_column(data_frame, 'interval_real').astype(np.float64))
+    with np.errstate(invalid='ignore', divide='ignore'):
+        latency = np.where(counts > 0, intervals / counts, 0)
+
+    rps_change = _relative_change(*_window_means(counts, window))
+    latency_change = _relative_change(*_window_means(latency, window))
+    steady = (rps_change <= tolerance) & \
+        (latency_change <= latency_tolerance) & (counts > 0)
+
+    bounds = np.flatnonzero(np.diff(np.concatenate(([0], steady, [0]))))
+    starts, ends = bounds[::2], bounds[1::2]
+    long_enough = (ends - starts) * period >= min_duration
+    starts, ends = starts[long_enough], ends[long_enough]
+    cumulative = np.concatenate(([0], np.cumsum(counts)))
+    segments = pd.DataFrame({
+        'from_date': (first + starts) * period,
+        'to_date': (first + ends) * period,
+        'count': cumulative[ends] - cumulative[starts],
+    }, columns=columns[:3])
+    segments['rps'] = segments['count'] / ((ends - starts) * period)
+    return segments
+
+
+def select_segments(data_frame, segments):
+    """Get rows within segments
+
+    Args:
+        data_frame (DataFrame): data
+        segments (DataFrame): non-overlapping sorted segments
+                              with 'from_date' and 'to_date'
+
+    Returns:
+        DataFrame: rows with from_date <= time < to_date of any segment
+    """
+
+    bounds = np.column_stack((
+        segments['from_date'].values, segments['to_date'].values
+    )).ravel()
+    index = np.searchsorted(
+        bounds, get_column(data_frame, 'time').astype(np.float64),
+        side='right')
+    return filter_rows(data_frame, index % 2 == 1)
+
+
+def get_segments_rps(data_frame, segments):
+    """Calculate RPS for requests selected from segments,
+       gaps between segments are not counted as load time
+
+    Args:
+        data_frame (DataFrame): rows within segments, see select_segments
+        segments (DataFrame): non-overlapping sorted segments
+                              with 'from_date' and 'to_date'
+
+    Returns:
+        float: Requests per second
+    """
+
+    from_date, to_date = get_time_bounds(data_frame)
+    durations = np.minimum(segments['to_date'].values, to_date) - \
+        np.maximum(segments['from_date'].values, from_date)
+    return count_rps(size(data_frame), 0, durations.clip(min=0).sum())
+
+
+def _sorted_quantiles(sorted_values, quantile_list):
+    """Get quantiles of sorted values with linear interpolation,
+       the same way pandas and numpy do
+
+    Args:
+        sorted_values (ndarray): sorted values
+        quantile_list (list): list of quantile values
+
+    Returns:
+        ndarray: quantiles, NaN for empty values
+    """
+
+    quantiles = np.asarray(quantile_list, dtype=np.float64)
+    count = len(sorted_values)
+    if count == 0:
+        return np.full(len(quantiles), np.nan)
+    position = quantiles * (count - 1)
+    previous = np.clip(np.floor(position).astype(np.int64), 0, count - 1)
+    following = np.clip(previous + 1, 0, count - 1)
+    gamma = position - previous
+    lower = sorted_values[previous].astype(np.float64)
+    upper = sorted_values[following].astype(np.float64)
+    difference = upper - lower
+    return np.where(
+        gamma >= 0.5,
+        upper - difference * (1 - gamma),
+        lower + difference * gamma
+    )
+
+
+class PhoutRun(object):
+    """Parsed phout data with lazily cached statistics
+
+    Sorted field values, values count and time bounds are computed once
+    on the first request and reused by all statistics. Sorted values
+    are kept for max_cached_fields recently used fields only,
+    the least recently used field is evicted first.
+    Call invalidate after data_frame modification.
+    """
+
+    def __init__(self, data_frame, max_cached_fields=2):
+        """Constructor
+
+        Args:
+            data_frame (DataFrame): parsed phout data
+            max_cached_fields (int): count of fields to keep sorted values
+        """
+
+        self.data_frame = data_frame
+        self.max_cached_fields = max_cached_fields
+        self._sorted = OrderedDict()
+        self._cache = {}
+
+    @classmethod
+    def from_file(cls, input_file, flags=None, max_cached_fields=2,
+                  backend='pandas'):
+        """Parse yandex-tank phout file
+
+        Args:
+            input_file (str): input file path
+            flags (dict): List of flags, see parse_phout
+            max_cached_fields (int): count of fields to keep sorted values
+            backend (str): DataFrame implementation, one of BACKENDS
+
+        Returns:
+            PhoutRun: parsed run
+        """
+
+        return cls(parse_phout(input_file, flags, backend), max_cached_fields)
+
+    def invalidate(self, field_name=None):
+        """Drop cached values
+
+        Args:
+            field_name (str): drop values of the field only,
+                              all cached values by default
+        """
+
+        if field_name is None:
+            self._sorted.clear()
+            self._cache.clear()
+            return
+        self._sorted.pop(field_name, None)
+        for key in list(self._cache.keys()):
+            if field_name in key:
+                del self._cache[key]
+
+    def _cached(self, key, function):
+        """Get cached value or compute it
+
+        Args:
+            key (tuple): cache key
+            function (function): computes the value
+
+        Returns:
+            object: cached value
+        """
+
+        if key not in self._cache:
+            self._cache[key] = function()
+        return self._cache[key]
+
+    @property
+    def size(self):
+        """int: rows count"""
+
+        return self._cached(('size',), lambda: self.data_frame.shape[0])
+
+    @property
+    def from_date(self):
+        """float: the first request timestamp"""
+
+        return self._time_bounds()[0]
+
+    @property
+    def to_date(self):
+        """float: the last request timestamp"""
+
+        return self._time_bounds()[1]
+
+    def _time_bounds(self):
+        """Get cached the first and the last request timestamps
+
+        Returns:
+            tuple: the first and the last timestamps
+        """
+
+        return self._cached(
+            ('time_bounds', 'time'),
+            lambda: tuple(float(date)
+                          for date in get_time_bounds(self.data_frame)))
+
+    def sorted_values(self, field_name):
+        """Get sorted values of field, NaN is counted as 0
+
+        Args:
+            field_name (str): data_frame column name
+
+        Returns:
+            ndarray: sorted values
+        """
+
+        if field_name in self._sorted:
+            self._sorted[field_name] = self._sorted.pop(field_name)
+            return self._sorted[field_name]
+        values = np.sort(np.nan_to_num(
+            get_column(self.data_frame, field_name)).astype(np.int64))
+        self._sorted[field_name] = values
+        while len(self._sorted) > max(self.max_cached_fields, 1):
+            self._sorted.popitem(last=False)
+        return values
+
+    def get_quantiles(self, field_name, quantile_list=None,
+                      expected_interval=None):
+        """Get quantiles for specific field, see get_quantiles
+
+        Args:
+            field_name (str): data_frame column name
+            quantile_list (list): list of quantile values
+            expected_interval (int): expected interval between requests (mks)
+                                     to correct coordinated omission
+
+        Returns:
+            DataFrame: counted quantiles in get_quantiles format
+        """
+
+        if not quantile_list:
+            quantile_list = DEFAULT_QUANTILES
+        if expected_interval:
+            return get_quantiles(
+                self.data_frame, field_name, quantile_list, expected_interval)
+        return pd.DataFrame({
+            'quantile': quantile_list,
+            field_name: _sorted_quantiles(
+                self.sorted_values(field_name), quantile_list)
+        })
+
+    def print_quantiles(self, field_name, quantile_list=None,
+                        expected_interval=None):
+        """Print quantiles for specific field
+
+        Args:
+            field_name (str): data_frame column name
+            quantile_list (list): list of quantile values
+            expected_interval (int): expected interval between requests (mks)
+                                     to correct coordinated omission
+        """
+
+        _print_quantiles(
+            self.get_quantiles(field_name, quantile_list, expected_interval),
+            field_name, self.size, self.from_date, self.to_date
+        )
+
+    def median(self, field_name):
+        """Get median of field
+
+        Args:
+            field_name (str): data_frame column name
+
+        Returns:
+            float: median value
+        """
+
+        return _sorted_quantiles(self.sorted_values(field_name), [0.5])[0]
+
+    def mean(self, field_name):
+        """Get mean of field
+
+        Args:
+            field_name (str): data_frame column name
+
+        Returns:
+            float: mean value
+        """
+
+        return self._cached(
+            ('mean', field_name),
+            lambda: float(
+                get_column(self.data_frame, field_name).astype(float).mean()))
+
+    def get_medians_by_field(self, field_name, by_field):
+        """Get median of field for each value of another field
+
+        Args:
+            field_name (str): data_frame column name to get median of
+            by_field (str): data_frame column name to group by
+
+        Returns:
+            Series: medians indexed by by_field values
+        """
+
+        def medians():
+            if _is_polars(self.data_frame):
+                pl = _import_polars()
+                result = self.data_frame.lazy().group_by(by_field).agg(
+                    pl.col(field_name).median()).collect()
+                return pd.Series(
+                    result.get_column(field_name).to_numpy(),
+                    index=pd.Index(result.get_column(by_field).to_numpy(),
+                                   name=by_field),
+                    name=field_name)
+            return self.data_frame.groupby(by_field)[field_name].median()
+
+        return self._cached(('medians', field_name, by_field), medians)
+
+    def count_uniq_by_field(self, field):
+        """Count unique values for field, see count_uniq_by_field
+
+        Args:
+            field (str): field name
+
+        Returns:
+            DataFrame: Statistics for HTTP responses
+        """
+
+        return self._cached(
+            ('counts', field),
+            lambda: count_uniq_by_field(self.data_frame, field)).copy()
+
+    def print_http_reponses(self):
+        """Print stats for HTTP responses"""
+
+        _print_http_stats(self.count_uniq_by_field('proto_code'))
+
+    def get_rps(self):
+        """Calculate RPS for all requests
+
+        Returns:
+            float: Requests per second
+        """
+
+        return count_rps(self.size, self.from_date, self.to_date)
+
+
+def _import_pyarrow():
+    """Import optional pyarrow module
+
+    Returns:
+        module: pyarrow
+    """
+
+    try:
+        import pyarrow
+        import pyarrow.ipc  # noqa: F401
+    except ImportError:
+        raise ImportError(
+            "pyarrow is required for Arrow support, " +
+            "install it with \"pip install tanktools[arrow]\"")
+    return pyarrow
+
+
+def arrow_schema():
+    """Get Arrow schema of phout data,
+       tag is dictionary-encoded, other fields are fixed-width
+
+    Returns:
+        pyarrow.Schema: phout schema
+    """
+
+    pa = _import_pyarrow()
+    types = {
+        'time': pa.float64(),
+        'tag': pa.dictionary(pa.int32(), pa.string()),
+        'net_code': pa.int32(),
+        'proto_code': pa.int32(),
+    }
+    return pa.schema([
+        (field, types.get(field, pa.int64())) for field in PHOUT_FIELDS
+    ])
+
+
+def iter_arrow_batches(data_frame, batch_size=65536):
+    """Convert parsed data to Arrow record batches
+
+    Numeric columns are wrapped without copying where dtypes match,
+    tag is encoded once and batches are zero-copy slices.
+
+    Args:
+        data_frame (DataFrame): data
+        batch_size (int): rows count per batch
+
+    Yields:
+        pyarrow.RecordBatch: record batch in arrow_schema format
+    """
+
+    pa = _import_pyarrow()
+    schema = arrow_schema()
+    tags = pd.Categorical(get_column(data_frame, 'tag').astype(str))
+    columns = []
+    for field in schema:
+        if field.name == 'tag':
+            columns.append(pa.DictionaryArray.from_arrays(
+                pa.array(tags.codes.astype(np.int32)),
+                pa.array(np.asarray(tags.categories, dtype=object),
+                         type=pa.string())
+            ))
+        else:
+            columns.append(pa.array(
+                get_column(data_frame, field.name).astype(
+                    field.type.to_pandas_dtype(), copy=False)
+            ))
+    batch = pa.RecordBatch.from_arrays(columns, schema=schema)
+    for offset in range(0, max(batch.num_rows, 1), batch_size):
+        yield batch.slice(offset, batch_size)
+
+
+def to_arrow(data_frame):
+    """Convert parsed data to Arrow table
+
+    Args:
+        data_frame (DataFrame): data
+
+    Returns:
+        pyarrow.Table: table in arrow_schema format
+    """
+
+    pa = _import_pyarrow()
+    return pa.Table.from_batches(
+        list(iter_arrow_batches(data_frame)), schema=arrow_schema())
+
+
+def write_arrow(data_frame, output_file, batch_size=65536):
+    """Write parsed data in Arrow IPC streaming format
+
+    Args:
+        data_frame (DataFrame): data
+        output_file (str): output file path
+        batch_size (int): rows count per batch
+    """
+
+    pa = _import_pyarrow()
+    with pa.OSFile(output_file, 'wb') as sink:
+        with pa.ipc.new_stream(sink, arrow_schema()) as writer:
+            for batch in iter_arrow_batches(data_frame, batch_size):
+                writer.write_batch(batch)
+
+
+def read_arrow(input_file):
+    """Read memory-mapped Arrow IPC stream written by write_arrow
+
+    Args:
+        input_file (str): input file path
+
+    Returns:
+        DataFrame: parsed records
+    """
+
+    pa = _import_pyarrow()
+    with pa.memory_map(input_file, 'r') as source:
+        table = pa.ipc.open_stream(source).read_all()
+    data_frame = table.to_pandas()
+    data_frame['tag'] = data_frame['tag'].astype(str)
+    data_frame[PHOUT_FIELDS[-10:]] = data_frame[PHOUT_FIELDS[-10:]].astype(int)
+    return data_frame
@@ -0,0 +1,156 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2018 Alexander Grechin
+#
+# Licensed under the BSD 3-Clause license.
+# See LICENSE file in the project root for full license information.
+#
+
+"""Reader, transform and writer stages running in parallel threads
+
+Stages are connected by bounded queues, so a fast stage waits for
+a slow one instead of keeping the whole input in memory.
+Reading overlaps with transforming and writing, transform workers run
+in parallel where the interpreter allows it (I/O, free-threaded builds).
+"""
+
+import threading
+
+try:
+    import queue
+except ImportError:
+    import Queue as queue
+
+QUEUE_SIZE = 1024
+
+# end of stream marker
+_DONE = object()
+
+
+def run_pipeline(items, transform, write, workers=0, queue_size=QUEUE_SIZE,
+                 keep_order=True):
+    """Transform items and write results
+
+    Items are read from the iterable by a reader thread, transformed
+    by worker threads and written by the current thread.
+    The first exception of any stage stops the pipeline and is raised.
+
+    Args:
+        items (iterable): input items
+        transform (function): function of an item, None results
+                              are not written
+        write (function): function writing a result
+        workers (int): transform threads count,
+                       0 runs all stages in the current thread
+        queue_size (int): the largest count of items waiting in a queue,
+                          and of items read but not written yet
+                          if order is kept
+        keep_order (bool): write results in items order
+
+    Returns:
+        int: count of written results
+    """
+
+    written = 0
+    if workers < 1:
+        for item in items:
+            result = transform(item)
+            if result is not None:
+                write(result)
+                written += 1
+        return written
+
+    inbox = queue.Queue(queue_size)
+    outbox = queue.Queue(queue_size)
+    # a token per item read but not written yet bounds results waiting
+    # for a slow item in order, the queue is used as a semaphore
+    # which can be interrupted by stop
+    window = queue.Queue(queue_size) if keep_order else None
+    stop = threading.Event()
+    errors = []
+
+    def put(box, item):
+        while not stop.is_set():
+            try:
+                box.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                pass
+
+    def get(box):
+        while not stop.is_set():
+            try:
+                return box.get(timeout=0.1)
+            except queue.Empty:
+                pass
+        return _DONE
+
+    def fail(exception):
+        errors.append(exception)
+        stop.set()
+
+    def read():
+        try:
+            for item in enumerate(items):
+                if stop.is_set():
+                    return
+                if window is not None:
+                    put(window, None)
+                put(inbox, item)
+        except Exception as exception:
+            fail(exception)
+        finally:
+            for _ in range(workers):
+                put(inbox, _DONE)
+
+    def work():
+        try:
+            while True:
+                item = get(inbox)
+                if item is _DONE:
+                    return
+                index, value = item
+                put(outbox, (index, transform(value)))
+        except Exception as exception:
+            fail(exception)
+        finally:
+            put(outbox, _DONE)
+
+    threads = [threading.Thread(target=read)] + \
+        [threading.Thread(target=work) for _ in range(workers)]
+    for thread in threads:
+        thread.daemon = True
+        thread.start()
+
+    try:
+        finished = 0
+        pending = {}
+        expected = 0
+        while finished < workers and not stop.is_set():
+            item = get(outbox)
+            if item is _DONE:
+                finished += 1
+                continue
+            index, result = item
+            if keep_order:
+                pending[index] = result
+                if index != expected:
+                    continue
+                while expected in pending:
+                    result = pending.pop(expected)
+                    expected += 1
+                    window.get_nowait()
+                    if result is not None:
+                        write(result)
+                        written += 1
+            elif result is not None:
+                write(result)
+                written += 1
+    finally:
+        stop.set()
+        for thread in threads:
+            thread.join()
+    if errors:
+        raise errors[0]
+    return written
@@ -0,0 +1,420 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2018 Alexander Grechin
+#
+# Licensed under the BSD 3-Clause license.
+# See LICENSE file in the project root for full license information.
+#
+
+"""Self-contained HTML report of a yandex-tank run
+
+Data is aggregated into a per-second rollup and every chart series
+is downsampled to a fixed points count while the report is built,
+so the page size doesn't depend on requests count.
+Charts are inline SVG, the page needs neither scripts nor network.
+"""
+
+import argparse
+import datetime
+import io
+import sys
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+from . import _version
+from tanktools import phout
+
+try:
+    from html import escape
+except ImportError:
+    from cgi import escape
+
+REPORT_QUANTILES = [0.5, 0.9, 0.95, 0.99, 1.0]
+
+# quantiles drawn on the latency chart
+CHART_QUANTILES = [0.5, 0.95, 0.99]
+
+REPORT_POINTS = 1000
+
+CHART_WIDTH = 960
+
+CHART_HEIGHT = 240
+
+CHART_COLORS = ['#1f77b4', '#ff7f0e', '#d62728', '#2ca02c', '#9467bd']
+
+STYLE = """
+body {font-family: sans-serif; margin: 2em; color: #222}
+table {border-collapse: collapse; margin-bottom: 1em}
+td, th {border: 1px solid #ccc; padding: 2px 8px; text-align: right}
+svg {display: block; margin-bottom: 1.5em}
+svg text {font-size: 11px; fill: #555}
+.legend {font-size: 12px}
+"""
+
+
+def _bucket_quantiles(rollup, field_name, quantile_list):
+    """Get quantiles of field for every rollup bucket
+
+    Args:
+        rollup (dict): rollup
+        field_name (str): one of ROLLUP_HISTOGRAM_FIELDS
+        quantile_list (list): list of quantile values
+
+    Returns:
+        ndarray: quantiles, a row per bucket and a column per quantile
+    """
+
+    bins = rollup['hist_%s_bin' % field_name]
+    order = np.lexsort((bins, rollup['hist_%s_bucket' % field_name]))
+    bins = bins[order]
+    counts = rollup['hist_%s_count' % field_name][order]
+    cumulative = np.cumsum(counts)
+    totals = rollup['count']
+    offsets = np.cumsum(totals) - totals
+    result = np.empty((len(totals), len(quantile_list)))
+    for index, quantile in enumerate(quantile_list):
+        ranks = np.maximum(np.ceil(quantile * totals - 1e-9), 1)
+        positions = np.searchsorted(cumulative, offsets + ranks, side='left')
+        positions = np.minimum(positions, len(cumulative) - 1)
+        result[:, index] = rollup['edges'][bins[positions] + 1] - 1
+    result = np.minimum(result, rollup['max_' + field_name][:, None])
+    return np.maximum(result, rollup['min_' + field_name][:, None])
+
+
+def _downsample(data_frame, points):
+    """Downsample chart series, every column keeps its shape
+
+    Args:
+        data_frame (DataFrame): 'time' and value columns
+        points (int): the largest points count per column
+
+    Returns:
+        DataFrame: 'time' and value columns, NaN where a point
+                   is not selected for the column
+    """
+
+    if data_frame.shape[0] <= points:
+        return data_frame
+    times = data_frame['time'].values
+    columns = [column for column in data_frame.columns if column != 'time']
+    selected = [
+        phout.lttb_indices(
+            times, data_frame[column].values.astype(np.float64), points)
+        for column in columns
+    ]
+    rows = np.unique(np.concatenate(selected))
+    result = data_frame.iloc[rows].reset_index(drop=True)
+    for column, indexes in zip(columns, selected):
+        kept = np.isin(rows, indexes)
+        result[column] = result[column].where(kept)
+    return result
+
+
+def build_rollup_report(rollup, title=None, points=REPORT_POINTS,
+                        quantile_list=None):
+    """Build report data from rollup
+
+    Concurrency is estimated by Little's law per bucket:
+    the sum of request durations divided by bucket duration.
+
+    Args:
+        rollup (dict): rollup, see phout.make_rollup
+        title (str): report title
+        points (int): the largest points count per chart line
+        quantile_list (list): list of quantile values of tables
+
+    Returns:
+        dict: report data
+    """
+
+    if not quantile_list:
+        quantile_list = REPORT_QUANTILES
+    count = int(rollup['count'].sum())
+    if not count:
+        raise ValueError("Nothing to report")
+    quantiles = phout.get_rollup_quantiles(
+        rollup, 'interval_real', quantile_list)
+    for field in phout.ROLLUP_HISTOGRAM_FIELDS[1:]:
+        quantiles[field] = phout.get_rollup_quantiles(
+            rollup, field, quantile_list)[field]
+
+    period = rollup['period']
+    times = rollup['time']
+    latency = OrderedDict([('time', times)])
+    for field in phout.ROLLUP_HISTOGRAM_FIELDS:
+        values = _bucket_quantiles(rollup, field, CHART_QUANTILES)
+        for index, quantile in enumerate(CHART_QUANTILES):
+            latency['%s %g%%' % (field, quantile * 100)] = \
+                values[:, index] / 1000.0
+    concurrency = pd.DataFrame(OrderedDict([
+        ('time', times),
+        ('concurrency', rollup['sum_interval_real'] / 1e6 / period),
+    ]))
+
+    return {
+        'title': title or 'Load test report',
+        'count': count,
+        'from_date': rollup['from_date'],
+        'to_date': rollup['to_date'],
+        'rps': phout.get_rollup_rps(rollup),
+        'quantiles': quantiles,
+        'codes': phout.count_rollup_codes(rollup),
+        'charts': OrderedDict([
+            ('RPS', _downsample(pd.DataFrame(OrderedDict([
+                ('time', times), ('rps', rollup['count'] / period)])),
+                points)),
+            ('Response time (ms)', _downsample(
+                pd.DataFrame(latency), points)),
+            ('Concurrency', _downsample(concurrency, points)),
+        ]),
+    }
+
+
+def build_report(data_frame, title=None, points=REPORT_POINTS,
+                 quantile_list=None, period=1):
+    """Build report data from parsed run
+
+    Quantile tables are exact, charts are built from a rollup.
+
+    Args:
+        data_frame (DataFrame): parsed phout data
+        title (str): report title
+        points (int): the largest points count per chart line
+        quantile_list (list): list of quantile values of tables
+        period (float): chart bucket duration in seconds
+
+    Returns:
+        dict: report data
+    """
+
+    if not quantile_list:
+        quantile_list = REPORT_QUANTILES
+    report = build_rollup_report(
+        phout.make_rollup(data_frame, period), title, points, quantile_list)
+    quantiles = phout.get_quantiles(
+        data_frame, 'interval_real', quantile_list)
+    for field in phout.TIMING_FIELDS[1:]:
+        quantiles[field] = phout.get_quantiles(
+            data_frame, field, quantile_list)[field].values
+    report['quantiles'] = quantiles
+    report['codes'] = phout.count_uniq_by_field(data_frame, 'proto_code')
+    report['net_codes'] = phout.count_uniq_by_field(data_frame, 'net_code')
+    concurrency = phout.get_concurrency(data_frame, period)
+    report['charts']['Concurrency'] = _downsample(
+        concurrency[['time', 'concurrency', 'max_concurrency']], points)
+    return report
+
+
+def _format_date(timestamp, milliseconds=True):
+    """Format timestamp as local date and time
+
+    Args:
+        timestamp (float): timestamp
+        milliseconds (bool): add milliseconds
+
+    Returns:
+        str: formatted date
+    """
+
+    date = datetime.datetime.fromtimestamp(float(timestamp))
+    if milliseconds:
+        return date.strftime('%Y-%m-%d %H:%M:%S.%f')[:-3]
+    return date.strftime('%H:%M:%S')
+
+
+def _html_table(data_frame, formats=None):
+    """Render DataFrame as HTML table
+
+    Args:
+        data_frame (DataFrame): table
+        formats (dict): format string per column, '%s' by default
+
+    Returns:
+        str: HTML table
+    """
+
+    formats = formats or {}
+    lines = ['<table>', '<tr>%s</tr>' % ''.join(
+        '<th>%s</th>' % escape(str(column)) for column in data_frame.columns)]
+    for row in data_frame.itertuples(index=False):
+        lines.append('<tr>%s</tr>' % ''.join(
+            '<td>%s</td>' % escape(formats.get(column, '%s') % value)
+            for column, value in zip(data_frame.columns, row)))
+    lines.append('</table>')
+    return '\n'.join(lines)
+
+
+def _svg_chart(data_frame, width=CHART_WIDTH, height=CHART_HEIGHT):
+    """Render line chart as inline SVG
+
+    Args:
+        data_frame (DataFrame): 'time' and a column per line,
+                                NaN values are skipped
+        width (int): chart width (px)
+        height (int): chart height (px)
+
+    Returns:
+        str: SVG element
+    """
+
+    left, right, top, bottom = 60, 10, 10, 40
+    plot_width = width - left - right
+    plot_height = height - top - bottom
+    times = data_frame['time'].values.astype(np.float64)
+    columns = [column for column in data_frame.columns if column != 'time']
+    values = data_frame[columns].values.astype(np.float64)
+    start, end = times.min(), times.max()
+    duration = max(end - start, 1e-9)
+    highest = np.nanmax(values) if np.isfinite(values).any() else 0
+    highest = highest if highest > 0 else 1.0
+
+    def x(time):
+        return left + (time - start) / duration * plot_width
+
+    def y(value):
+        return top + plot_height - value / highest * plot_height
+
+    parts = ['<svg xmlns="http://www.w3.org/2000/svg" width="%d" '
+             'height="%d">' % (width, height)]
+    for tick in np.linspace(0, highest, 5):
+        parts.append(
+            '<line x1="%d" x2="%d" y1="%.1f" y2="%.1f" stroke="#eee"/>'
+            '<text x="%d" y="%.1f" text-anchor="end">%.4g</text>' % (
+                left, width - right, y(tick), y(tick),
+                left - 4, y(tick) + 4, tick))
+    for tick in np.linspace(start, end, 5):
+        parts.append('<text x="%.1f" y="%d" text-anchor="middle">%s</text>' % (
+            x(tick), height - bottom + 16, _format_date(tick, False)))
+    for index, column in enumerate(columns):
+        kept = np.isfinite(values[:, index])
+        color = CHART_COLORS[index % len(CHART_COLORS)]
+        parts.append(
+            '<polyline fill="none" stroke="%s" stroke-width="1" '
+            'points="%s"/>' % (color, ' '.join(
+                '%.1f,%.1f' % (x(time), y(value)) for time, value in
+                zip(times[kept], values[kept, index]))))
+        parts.append(
+            '<text class="legend" x="%d" y="%d" fill="%s">%s</text>' % (
+                left + 150 * index, height - 4, color, escape(str(column))))
+    parts.append('</svg>')
+    return ''.join(parts)
+
+
+def render_report(report):
+    """Render report data as a self-contained HTML page
+
+    Args:
+        report (dict): report data, see build_report
+
+    Returns:
+        str: HTML page
+    """
+
+    quantiles = report['quantiles'].copy()
+    quantiles['quantile'] = quantiles['quantile'] * 100
+    quantiles.rename(columns={'quantile': 'quantile (%)'}, inplace=True)
+    formats = dict((column, '%d') for column in quantiles.columns)
+    formats['quantile (%)'] = '%.2f'
+    code_formats = {'count': '%d', 'percent': '%.2f'}
+
+    parts = [
+        '<!DOCTYPE html>',
+        '<html><head><meta charset="utf-8">',
+        '<title>%s</title>' % escape(report['title']),
+        '<style>%s</style>' % STYLE,
+        '</head><body>',
+        '<h1>%s</h1>' % escape(report['title']),
+        '<p>%d requests from %s to %s, %.2f RPS</p>' % (
+            report['count'], _format_date(report['from_date']),
+            _format_date(report['to_date']), report['rps']),
+        '<h2>Percentiles (mks)</h2>',
+        _html_table(quantiles, formats),
+        '<h2>HTTP codes</h2>',
+        _html_table(report['codes'], code_formats),
+    ]
+    if 'net_codes' in report:
+        parts.extend([
+            '<h2>Net codes</h2>',
+            _html_table(report['net_codes'], code_formats)])
+    for name, chart in report['charts'].items():
+        parts.extend(['<h2>%s</h2>' % escape(name), _svg_chart(chart)])
+    parts.append('</body></html>')
+    return '\n'.join(parts) + '\n'
+
+
+def write_report(report, output_file):
+    """Write report to HTML file
+
+    Args:
+        report (dict): report data, see build_report
+        output_file (str): output file path
+    """
+
+    with io.open(output_file, 'w', encoding='utf-8') as file_handler:
+        file_handler.write(u'%s' % render_report(report))
+
+
+def parse_args():
+    """Parse console arguments
+
+    Returns:
+        dict: console arguments
+    """
+
+    parser = argparse.ArgumentParser(
+        description="Build self-contained HTML report of yandex-tank run",
+        add_help=True
+    )
+
+    parser.add_argument(
+        'input', help='phout file or rollup file with --rollup')
+    parser.add_argument(
+        '-o', '--output', type=str, default='report.html',
+        help='output HTML file, report.html by default')
+    parser.add_argument(
+        '--rollup', action='store_true',
+        help='input is a rollup file written with --save-rollup')
+    parser.add_argument('--title', type=str, help='report title')
+    parser.add_argument(
+        '-q', '--quantile', action='append', type=float, default=[],
+        help='quantile of tables, 0.5, 0.9, 0.95, 0.99 and 1 by default')
+    parser.add_argument(
+        '--points', type=int, default=REPORT_POINTS,
+        help='the largest points count per chart line')
+    parser.add_argument(
+        '--period', type=float, default=1,
+        help='chart bucket duration in seconds')
+
+    parser.add_argument(
+        '-v', '--version', help='print version', action='version',
+        version='{version}'.format(version=_version.__version__)
+    )
+
+    return vars(parser.parse_args())
+
+
+def main():
+    """The main function"""
+
+    args = parse_args()
+    title = args['title'] or args['input']
+    if args['rollup']:
+        report = build_rollup_report(
+            phout.read_rollup(args['input']), title, args['points'],
+            args['quantile'])
+    else:
+        report = build_report(
+            phout.parse_phout(args['input']), title, args['points'],
+            args['quantile'], args['period'])
+    write_report(report, args['output'])
+
+
+def init():
+    """Testable init function"""
+
+    if __name__ == '__main__':
+        sys.exit(main())
+
+
+init()
@@ -0,0 +1,221 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2018 Alexander Grechin
+#
+# Licensed under the BSD 3-Clause license.
+# See LICENSE file in the project root for full license information.
+#
+
+"""URI routes classifier for ammo case tags
+
+Rules file has a rule per line: method (or * for any), URI pattern and tag.
+Pattern is a path prefix matched by whole segments, e.g. /api/users
+matches /api/users and /api/users/5 but not /api/usersearch,
+or a regular expression after ~ matched from the path start.
+Empty lines and lines starting with # are skipped.
+The first matching rule wins.
+
+    # method  pattern              tag
+    GET       /api/users           users
+    POST      ~/api/orders/\\d+$    order_update
+    *         /static              static
+
+Prefixes are compiled into a trie of path segments,
+regular expressions into one regex with a named group per rule.
+Regular expressions with their own groups are matched one by one,
+so their backreferences and group names are kept.
+"""
+
+import re
+
+# the largest count of cached path classifications
+CACHE_SIZE = 65536
+
+ANY_METHOD = '*'
+
+
+def request_path(uri):
+    """Get path of URI without scheme, host and query
+
+    Args:
+        uri (str): absolute or relative URI
+
+    Returns:
+        str: path
+    """
+
+    if '://' in uri:
+        uri = '/' + uri.split('://', 1)[1].partition('/')[2]
+    return uri.split('?', 1)[0].split('#', 1)[0]
+
+
+def read_routes(input_file):
+    """Read rules file
+
+    Args:
+        input_file (str): rules file path
+
+    Returns:
+        list: (method, pattern, tag) tuples
+    """
+
+    rules = []
+    with open(input_file, 'r') as file_handler:
+        for number, line in enumerate(file_handler, 1):
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            fields = line.split(None, 1)
+            if len(fields) < 2 or len(fields[1].rsplit(None, 1)) < 2:
+                raise ValueError(
+                    "Wrong route at line %d: %s" % (number, line))
+            pattern, tag = fields[1].rsplit(None, 1)
+            rules.append((fields[0].upper(), pattern, tag))
+    return rules
+
+
+class RouteClassifier(object):
+    """Classify HTTP requests by the first matching rule"""
+
+    def __init__(self, rules, default=''):
+        """Constructor
+
+        Args:
+            rules (list): (method, pattern, tag) tuples, see read_routes
+            default (str): tag of requests without matching rule
+        """
+
+        self.tags = [tag for _, _, tag in rules]
+        self.default = default
+        self.trie = {}
+        self.cache = {}
+        self.regexes = []
+        for number, (method, pattern, _) in enumerate(rules):
+            if pattern.startswith('~'):
+                method_regex = r'\S+' if method == ANY_METHOD \
+                    else re.escape(method)
+                regex = '%s (?:%s)' % (method_regex, pattern[1:])
+                try:
+                    self.regexes.append((number, re.compile(regex)))
+                except re.error as e:
+                    raise ValueError(
+                        "Wrong route regex %s: %s" % (pattern[1:], e))
+                continue
+            node = self.trie
+            for segment in self._segments(pattern):
+                node = node.setdefault(segment, {})
+            # rules are stored in leaf under None key, method to rule number
+            node.setdefault(None, {}).setdefault(method, number)
+        # regexes without groups are joined, others are matched one by one
+        self.regex = None
+        plain = [(number, regex) for number, regex in self.regexes
+                 if not regex.groups]
+        if plain:
+            try:
+                self.regex = re.compile('|'.join(
+                    '(?P<_%d>%s)' % (number, regex.pattern)
+                    for number, regex in plain))
+                self.regexes = [(number, regex)
+                                for number, regex in self.regexes
+                                if regex.groups]
+            except re.error:
+                # e.g. inline flags are allowed only at the rule start
+                pass
+
+    @staticmethod
+    def _segments(path):
+        """Split path to non-empty segments"""
+
+        return [segment for segment in path.split('/') if segment]
+
+    def _match_trie(self, method, path):
+        """Get number of the first prefix rule matching request
+
+        Args:
+            method (str): HTTP method
+            path (str): URI path
+
+        Returns:
+            int: rule number, None if no rule matches
+        """
+
+        found = None
+        node = self.trie
+        segments = self._segments(path)
+        for depth in range(len(segments) + 1):
+            rules = node.get(None)
+            if rules:
+                for key in (method, ANY_METHOD):
+                    number = rules.get(key)
+                    if number is not None and \
+                            (found is None or number < found):
+                        found = number
+            if depth == len(segments):
+                break
+            node = node.get(segments[depth])
+            if node is None:
+                break
+        return found
+
+    def _match_regexes(self, text):
+        """Get number of the first regex rule matching request
+
+        Args:
+            text (str): HTTP method and URI path joined by space
+
+        Returns:
+            int: rule number, None if no rule matches
+        """
+
+        found = None
+        if self.regex is not None:
+            match = self.regex.match(text)
+            if match is not None:
+                found = int(match.lastgroup[1:])
+        for number, regex in self.regexes:
+            if found is not None and number > found:
+                break
+            if regex.match(text) is not None:
+                return number
+        return found
+
+    def classify(self, method, uri):
+        """Get tag of request
+
+        Args:
+            method (str): HTTP method
+            uri (str): request URI
+
+        Returns:
+            str: tag of the first matching rule, default tag otherwise
+        """
+
+        key = (method, uri)
+        tag = self.cache.get(key)
+        if tag is not None:
+            return tag
+        path = request_path(uri)
+        number = self._match_trie(method, path)
+        if self.regex is not None or self.regexes:
+            regex_number = self._match_regexes('%s %s' % (method, path))
+            if regex_number is not None and \
+                    (number is None or regex_number < number):
+                number = regex_number
+        tag = self.default if number is None else self.tags[number]
+        if len(self.cache) >= CACHE_SIZE:
+            self.cache.clear()
+        self.cache[key] = tag
+        return tag
+
+    def classify_request(self, request):
+        """Get tag of HTTP request
+
+        Args:
+            request (HTTPRequest): HTTP request
+
+        Returns:
+            str: tag
+        """
+
+        return self.classify(request.method, request.uri)
@@ -0,0 +1,194 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2018 Alexander Grechin
+#
+# Licensed under the BSD 3-Clause license.
+# See LICENSE file in the project root for full license information.
+#
+
+"""Sampling of HTTP requests before ammo is made
+
+Hash sampling keeps the same requests on every run, reservoir sampling
+keeps a fixed count of requests with fixed memory, optionally per stratum
+(method, host or URI prefix). Reservoirs use Li's algorithm L:
+random numbers are drawn only for accepted requests,
+skipped ones cost a counter decrement.
+"""
+
+import hashlib
+import math
+import random
+import struct
+
+STRATIFY_KEYS = ['method', 'host', 'prefix']
+
+# 2 ** 64 as float, hash values are divided by it
+HASH_RANGE = 18446744073709551616.0
+
+
+def hash_fraction(data, seed=0):
+    """Map data to a stable number in [0, 1)
+
+    Args:
+        data (str): data
+        seed (int): hash seed
+
+    Returns:
+        float: number
+    """
+
+    digest = hashlib.md5(
+        ('%d:' % seed).encode('ascii') +
+        data.encode('utf-8', 'replace')).digest()
+    return struct.unpack('<Q', digest[:8])[0] / HASH_RANGE
+
+
+def hash_sample(requests, rate, seed=0):
+    """Select requests with stable hash below rate
+
+    Args:
+        requests (iterable): HTTP requests
+        rate (float): selected fraction of requests
+        seed (int): hash seed
+
+    Yields:
+        HTTPRequest: selected requests in input order
+    """
+
+    for request in requests:
+        if hash_fraction(request.origin, seed) < rate:
+            yield request
+
+
+def stratum_key(request, stratify, depth=1):
+    """Get stratum of HTTP request
+
+    Args:
+        request (HTTPRequest): HTTP request
+        stratify (str): one of STRATIFY_KEYS
+        depth (int): count of URI path segments of 'prefix' stratum
+
+    Returns:
+        str: stratum
+    """
+
+    if stratify == 'method':
+        return request.method
+    if stratify == 'host':
+        host = request.headers.get('host', '')
+        return host[0] if isinstance(host, list) else host
+    if stratify == 'prefix':
+        path = request.uri
+        if '://' in path:
+            path = '/' + path.split('://', 1)[1].partition('/')[2]
+        path = path.split('?', 1)[0]
+        return '/' + '/'.join(path.lstrip('/').split('/')[:depth])
+    raise ValueError("Unknown stratify key %s" % stratify)
+
+
+class Reservoir(object):
+    """Uniform sample of fixed size from a stream"""
+
+    def __init__(self, size, generator):
+        """Constructor
+
+        Args:
+            size (int): sample size
+            generator (random.Random): random numbers generator
+        """
+
+        self.size = size
+        self.generator = generator
+        self.items = []
+        self.weight = 1.0
+        self.skip = 0
+
+    def _next_skip(self):
+        """Update weight and draw count of items to skip"""
+
+        self.weight *= math.exp(
+            math.log(1.0 - self.generator.random()) / self.size)
+        if self.weight >= 1.0:
+            self.skip = 0
+            return
+        self.skip = int(math.floor(
+            math.log(1.0 - self.generator.random()) /
+            math.log(1.0 - self.weight)))
+
+    def offer(self, item):
+        """Offer the next item of stream
+
+        Args:
+            item (object): item
+        """
+
+        if len(self.items) < self.size:
+            self.items.append(item)
+            if len(self.items) == self.size:
+                self._next_skip()
+        elif self.skip:
+            self.skip -= 1
+        else:
+            self.items[self.generator.randrange(self.size)] = item
+            self._next_skip()
+
+
+def reservoir_sample(requests, size, stratify=None, depth=1, seed=0):
+    """Select a fixed count of requests uniformly
+
+    Args:
+        requests (iterable): HTTP requests
+        size (int): selected requests count, per stratum if stratified
+        stratify (str): one of STRATIFY_KEYS, no strata by default
+        depth (int): count of URI path segments of 'prefix' stratum
+        seed (int): random seed
+
+    Returns:
+        list: selected requests in input order
+    """
+
+    if size < 1:
+        raise ValueError("Sample size should be positive")
+    generator = random.Random(seed)
+    reservoirs = {}
+    for index, request in enumerate(requests):
+        key = stratum_key(request, stratify, depth) if stratify else None
+        reservoir = reservoirs.get(key)
+        if reservoir is None:
+            reservoir = reservoirs[key] = Reservoir(size, generator)
+        reservoir.offer((index, request))
+    selected = [item for reservoir in reservoirs.values()
+                for item in reservoir.items]
+    selected.sort(key=lambda item: item[0])
+    return [request for _, request in selected]
+
+
+def sample_requests(requests, rate=None, size=None, stratify=None, depth=1,
+                    seed=0):
+    """Sample requests by hash, then by reservoir
+
+    Args:
+        requests (iterable): HTTP requests
+        rate (float): selected fraction of requests, all by default
+        size (int): selected requests count, per stratum if stratified,
+                    all by default
+        stratify (str): one of STRATIFY_KEYS, applied with size
+        depth (int): count of URI path segments of 'prefix' stratum
+        seed (int): random seed
+
+    Returns:
+        iterable: selected requests in input order
+    """
+
+    if stratify and stratify not in STRATIFY_KEYS:
+        raise ValueError("Unknown stratify key %s" % stratify)
+    if rate is not None:
+        if not 0 < rate <= 1:
+            raise ValueError("Sample rate should be in (0, 1]")
+        requests = hash_sample(requests, rate, seed)
+    if size is not None:
+        requests = reservoir_sample(requests, size, stratify, depth, seed)
+    elif stratify:
+        raise ValueError("Stratified sampling requires sample size")
+    return requests
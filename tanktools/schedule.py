@@ -0,0 +1,303 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2018 Alexander Grechin
+#
+# Licensed under the BSD 3-Clause license.
+# See LICENSE file in the project root for full license information.
+#
+
+"""Yandex-tank load schedule of captured requests
+
+Arrival timestamps are counted into RPS per period,
+the RPS curve is smoothed with moving average, simplified
+with Douglas-Peucker algorithm and written as line, const
+and step segments.
+"""
+
+from array import array
+import numpy as np
+
+SCHEDULE_MODES = ['fit', 'rps']
+
+# default tolerance of fitted schedule relative to the highest RPS
+DEFAULT_TOLERANCE = 0.1
+
+# default moving average window in periods
+DEFAULT_WINDOW = 10
+
+
+def collect_timestamps(requests, timestamps):
+    """Pass requests through and keep their timestamps
+
+    Args:
+        requests (iterable): HTTP requests
+        timestamps (array): array of doubles timestamps are appended to
+
+    Yields:
+        HTTPRequest: requests
+    """
+
+    for request in requests:
+        if request.timestamp != '':
+            timestamps.append(float(request.timestamp))
+        yield request
+
+
+def get_rps(timestamps, period=1):
+    """Count requests per period from the first request
+
+    Args:
+        timestamps (ndarray): arrival timestamps
+        period (float): period duration in seconds
+
+    Returns:
+        ndarray: requests per second of every period
+    """
+
+    timestamps = np.asarray(timestamps, dtype=np.float64)
+    if not len(timestamps):
+        return np.array([], dtype=np.float64)
+    buckets = np.floor(
+        (timestamps - timestamps.min()) / period).astype(np.int64)
+    return np.bincount(buckets) / float(period)
+
+
+def smooth_rps(rps, window=DEFAULT_WINDOW):
+    """Smooth RPS curve with centered moving average
+
+    Args:
+        rps (ndarray): requests per second of every period
+        window (int): window in periods, 1 keeps curve as is
+
+    Returns:
+        ndarray: smoothed RPS
+    """
+
+    rps = np.asarray(rps, dtype=np.float64)
+    if window < 1:
+        raise ValueError("Schedule window should be positive")
+    if window == 1 or not len(rps):
+        return rps
+    padded = np.pad(rps, (window // 2, window - 1 - window // 2), mode='edge')
+    return np.convolve(padded, np.ones(window) / window, mode='valid')
+
+
+def _douglas_peucker(values, tolerance):
+    """Simplify polyline of values with Douglas-Peucker algorithm
+
+    Args:
+        values (ndarray): y values at x = 0, 1, 2, ...
+        tolerance (float): the largest vertical distance
+                           of skipped points from the simplified line
+
+    Returns:
+        ndarray: sorted indexes of kept points
+    """
+
+    if len(values) < 3:
+        return np.arange(len(values))
+    keep = np.zeros(len(values), dtype=bool)
+    keep[0] = keep[-1] = True
+    stack = [(0, len(values) - 1)]
+    while stack:
+        start, end = stack.pop()
+        if end - start < 2:
+            continue
+        inner = np.arange(start + 1, end)
+        line = values[start] + (values[end] - values[start]) * \
+            (inner - start) / float(end - start)
+        distances = np.abs(values[inner] - line)
+        farthest = int(np.argmax(distances))
+        if distances[farthest] > tolerance:
+            middle = start + 1 + farthest
+            keep[middle] = True
+            stack.append((start, middle))
+            stack.append((middle, end))
+    return np.flatnonzero(keep)
+
+
+def _merge_steps(segments):
+    """Replace runs of const segments with equal duration and increment
+    by step segments
+
+    Args:
+        segments (list): line and const segments
+
+    Returns:
+        list: segments
+    """
+
+    result = []
+    index = 0
+    while index < len(segments):
+        first = segments[index]
+        end = index + 1
+        if first[0] == 'const' and end < len(segments) and \
+                segments[end][0] == 'const':
+            increment = segments[end][1] - first[1]
+            while end < len(segments) and segments[end][0] == 'const' and \
+                    segments[end][2] == first[2] and \
+                    segments[end][1] - segments[end - 1][1] == increment:
+                end += 1
+            if increment > 0 and end - index >= 3:
+                result.append(('step', first[1], segments[end - 1][1],
+                               increment, first[2]))
+                index = end
+                continue
+        result.append(first)
+        index += 1
+    return result
+
+
+def fit_schedule(rps, period=1, tolerance=None):
+    """Fit RPS curve with line, const and step segments
+
+    Segments between kept points of simplified curve become const
+    if their ends differ by tolerance at most, otherwise line.
+    A jump between neighbouring periods extends the preceding const.
+
+    Args:
+        rps (ndarray): requests per second of every period
+        period (float): period duration in seconds
+        tolerance (float): the largest RPS deviation of fitted schedule,
+                           DEFAULT_TOLERANCE of the highest RPS by default
+
+    Returns:
+        list: ('line', from, to, duration), ('const', rps, duration) and
+              ('step', from, to, increment, step duration) segments
+    """
+
+    rps = np.asarray(rps, dtype=np.float64)
+    if not len(rps):
+        return []
+    if tolerance is None:
+        tolerance = DEFAULT_TOLERANCE * rps.max()
+    points = _douglas_peucker(rps, tolerance)
+    segments = []
+    jump = False
+    for start, end in zip(points[:-1], points[1:]):
+        if abs(rps[end] - rps[start]) <= tolerance:
+            segments.append(('const', int(round(rps[start:end + 1].mean())),
+                             float((end - start) * period)))
+            jump = False
+        elif end - start == 1:
+            _hold(segments, rps[start], period, jump)
+            jump = True
+        else:
+            segments.append(('line', int(round(rps[start])),
+                             int(round(rps[end])),
+                             float((end - start) * period)))
+            jump = False
+    _hold(segments, rps[points[-1]], period, jump)
+    return _merge_steps(segments)
+
+
+def _hold(segments, value, period, jump):
+    """Hold the last segment value for one more period
+
+    Args:
+        segments (list): segments
+        value (float): RPS of the period
+        period (float): period duration in seconds
+        jump (bool): the last segment ends with a jump
+    """
+
+    if segments and segments[-1][0] == 'const' and not jump:
+        segments[-1] = segments[-1][:2] + (segments[-1][2] + period,)
+    else:
+        segments.append(('const', int(round(value)), float(period)))
+
+
+def rps_schedule(rps, period=1):
+    """Make const segment per period, equal neighbours are joined
+
+    Args:
+        rps (ndarray): requests per second of every period
+        period (float): period duration in seconds
+
+    Returns:
+        list: ('const', rps, duration) segments
+    """
+
+    rps = np.rint(np.asarray(rps, dtype=np.float64)).astype(np.int64)
+    if not len(rps):
+        return []
+    starts = np.flatnonzero(np.diff(rps, prepend=rps[0] - 1))
+    lengths = np.diff(np.append(starts, len(rps)))
+    return [('const', int(rps[start]), float(length * period))
+            for start, length in zip(starts, lengths)]
+
+
+def format_duration(duration):
+    """Format duration in seconds without exponent
+
+    Args:
+        duration (float): duration in seconds
+
+    Returns:
+        str: whole seconds, or up to milliseconds, e.g. "1000000s", "2.5s"
+    """
+
+    if duration == int(duration):
+        return '%ds' % duration
+    return ('%.3f' % duration).rstrip('0').rstrip('.') + 's'
+
+
+def format_schedule(segments):
+    """Format segments in yandex-tank schedule syntax
+
+    Args:
+        segments (list): segments, see fit_schedule
+
+    Returns:
+        str: schedule, e.g. "line(1, 100, 60s) const(100, 300s)"
+    """
+
+    parts = []
+    for segment in segments:
+        arguments = ['%d' % value for value in segment[1:-1]]
+        arguments.append(format_duration(segment[-1]))
+        parts.append('%s(%s)' % (segment[0], ', '.join(arguments)))
+    return ' '.join(parts)
+
+
+def make_schedule(timestamps, mode='fit', period=1, tolerance=None,
+                  window=DEFAULT_WINDOW):
+    """Make yandex-tank schedule of arrival timestamps
+
+    Args:
+        timestamps (iterable): arrival timestamps
+        mode (str): one of SCHEDULE_MODES, 'fit' simplifies RPS curve,
+                    'rps' keeps RPS of every period
+        period (float): period duration in seconds
+        tolerance (float): the largest RPS deviation of fitted schedule
+        window (int): moving average window of fitted schedule in periods
+
+    Returns:
+        str: schedule
+    """
+
+    if mode not in SCHEDULE_MODES:
+        raise ValueError("Unknown schedule mode %s" % mode)
+    if isinstance(timestamps, array):
+        timestamps = np.frombuffer(timestamps, dtype=np.float64)
+    if period <= 0:
+        raise ValueError("Schedule period should be positive")
+    rps = get_rps(timestamps, period)
+    if mode == 'fit':
+        return format_schedule(
+            fit_schedule(smooth_rps(rps, window), period, tolerance))
+    return format_schedule(rps_schedule(rps, period))
+
+
+def write_schedule(schedule, output_file):
+    """Write schedule to file
+
+    Args:
+        schedule (str): schedule
+        output_file (str): output file path
+    """
+
+    with open(output_file, 'w') as file_handler:
+        file_handler.write(schedule + "\n")
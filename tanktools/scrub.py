@@ -0,0 +1,297 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2018 Alexander Grechin
+#
+# Licensed under the BSD 3-Clause license.
+# See LICENSE file in the project root for full license information.
+#
+
+"""Scrubbing of sensitive data in HTTP requests of bytes
+
+All literal patterns are found in one pass by Aho-Corasick automaton
+of pyahocorasick if it is installed, or by one regex of escaped literals
+otherwise, both return leftmost longest matches. Regular expressions
+and builtin patterns are joined into another regex, the ones with their
+own groups are matched one by one to keep backreferences and group names.
+Matches are masked
+with the same count of bytes or replaced by REDACTED, then
+Content-Length header is fixed if body length is changed.
+pyahocorasick works with str, so bytes are decoded as latin-1,
+which keeps offsets.
+"""
+
+import re
+from collections import OrderedDict
+from tanktools import ammo
+
+try:
+    import ahocorasick
+except ImportError:
+    ahocorasick = None
+
+SCRUB_MODES = ['mask', 'redact']
+
+MASK_CHAR = b'*'
+
+REDACTED = b'REDACTED'
+
+
+def luhn_valid(number):
+    """Check card number checksum
+
+    Args:
+        number (bytes): digits with optional spaces and dashes
+
+    Returns:
+        bool: True if checksum is valid
+    """
+
+    digits = [int(char) for char in number.decode('ascii', 'ignore')
+              if char.isdigit()]
+    total = 0
+    for position, digit in enumerate(reversed(digits)):
+        if position % 2:
+            digit *= 2
+            if digit > 9:
+                digit -= 9
+        total += digit
+    return total % 10 == 0
+
+
+# issuer prefixes and lengths of Visa, Mastercard, American Express,
+# Discover, JCB and UnionPay card numbers
+CARD_NUMBER = re.compile(
+    r'(?:4[0-9]{12}(?:[0-9]{3}){0,2}|5[1-5][0-9]{14}|2[2-7][0-9]{14}|'
+    r'3[47][0-9]{13}|6(?:011|5[0-9]{2})[0-9]{12,15}|35[0-9]{14,17}|'
+    r'62[0-9]{14,17})$')
+
+
+def card_valid(number):
+    """Check card number issuer prefix, length and checksum,
+       so IDs and timestamps of the same length are not matched
+
+    Args:
+        number (bytes): digits with optional spaces and dashes
+
+    Returns:
+        bool: True if number looks like a card number
+    """
+
+    digits = ''.join(char for char in number.decode('ascii', 'ignore')
+                     if char.isdigit())
+    return CARD_NUMBER.match(digits) is not None and luhn_valid(number)
+
+
+# builtin name to (regex, validator of matched text)
+BUILTIN_PATTERNS = OrderedDict([
+    ('email', (r'[A-Za-z0-9._%+-]+@[A-Za-z0-9-]+(?:\.[A-Za-z0-9-]+)+',
+               None)),
+    ('card', (r'(?<![0-9])[0-9](?:[ -]?[0-9]){12,18}(?![0-9])',
+              card_valid)),
+    ('bearer', (r'(?<=[Bb]earer )[A-Za-z0-9._~+/=-]+', None)),
+    ('jwt', (r'eyJ[A-Za-z0-9_-]+\.[A-Za-z0-9_-]+\.[A-Za-z0-9_-]*', None)),
+])
+
+CONTENT_LENGTH = re.compile(
+    br'^(content-length:[ \t]*)[0-9]+', re.IGNORECASE | re.MULTILINE)
+
+
+def read_literals(input_file):
+    """Read literals, one per line, empty lines are skipped
+
+    Args:
+        input_file (str): file path
+
+    Returns:
+        list: literals
+    """
+
+    with open(input_file, 'r') as file_handler:
+        return [line.rstrip('\r\n') for line in file_handler
+                if line.rstrip('\r\n')]
+
+
+def _find_literals_automaton(automaton, text):
+    """Find leftmost longest literals with Aho-Corasick automaton
+
+    Args:
+        automaton (ahocorasick.Automaton): automaton of latin-1 literals
+        text (bytes): text
+
+    Returns:
+        list: (start, end) of matches
+    """
+
+    return [(end - length + 1, end + 1)
+            for end, length in automaton.iter_long(
+                bytes(text).decode('latin-1'))]
+
+
+def _find_literals_regex(regex, text):
+    """Find leftmost longest literals with regex of escaped literals
+
+    Args:
+        regex (re.Pattern): literals sorted by length descending
+        text (bytes): text
+
+    Returns:
+        list: (start, end) of matches
+    """
+
+    return [match.span() for match in regex.finditer(text)]
+
+
+class Scrubber(object):
+    """Mask or redact literals and regular expressions in requests"""
+
+    def __init__(self, literals=(), regexes=(), builtins=(), mode='mask',
+                 use_automaton=None):
+        """Constructor
+
+        Args:
+            literals (list): literal strings, matched in utf-8
+            regexes (list): regular expressions, matched in utf-8 bytes
+            builtins (list): names of BUILTIN_PATTERNS
+            mode (str): one of SCRUB_MODES, 'mask' keeps length in bytes,
+                        'redact' replaces matches by REDACTED
+            use_automaton (bool): find literals by pyahocorasick,
+                                  by default if it is installed
+        """
+
+        if mode not in SCRUB_MODES:
+            raise ValueError("Unknown scrub mode %s" % mode)
+        if use_automaton is None:
+            use_automaton = ahocorasick is not None
+        elif use_automaton and ahocorasick is None:
+            raise ValueError("pyahocorasick is not installed")
+        self.mode = mode
+        self.find_literals = None
+        literals = sorted(set(literal.encode('utf-8') for literal in literals
+                              if literal), key=len, reverse=True)
+        if literals and use_automaton:
+            automaton = ahocorasick.Automaton()
+            for literal in literals:
+                automaton.add_word(literal.decode('latin-1'), len(literal))
+            automaton.make_automaton()
+            self.literals = automaton
+            self.find_literals = _find_literals_automaton
+        elif literals:
+            self.literals = re.compile(
+                b'|'.join(re.escape(literal) for literal in literals))
+            self.find_literals = _find_literals_regex
+        patterns = [(regex, None) for regex in regexes]
+        for name in builtins:
+            if name not in BUILTIN_PATTERNS:
+                raise ValueError("Unknown scrub pattern %s" % name)
+            patterns.append(BUILTIN_PATTERNS[name])
+        self.validators = [validator for _, validator in patterns]
+        self.regexes = []
+        for number, (regex, _) in enumerate(patterns):
+            try:
+                self.regexes.append(
+                    (number, re.compile(regex.encode('utf-8'))))
+            except re.error as e:
+                raise ValueError("Wrong scrub regex: %s" % e)
+        # regexes without groups are joined, others are matched one by one
+        self.regex = None
+        plain = [(number, regex) for number, regex in self.regexes
+                 if not regex.groups]
+        if plain:
+            try:
+                self.regex = re.compile(b'|'.join(
+                    ('(?P<_%d>' % number).encode('ascii') + regex.pattern +
+                    b')' for number, regex in plain))
+                self.regexes = [(number, regex)
+                                for number, regex in self.regexes
+                                if regex.groups]
+            except re.error:
+                # e.g. inline flags are allowed only at the regex start
+                pass
+
+    def _find(self, text):
+        """Find non-overlapping matches, leftmost longest first
+
+        Args:
+            text (bytes): text
+
+        Returns:
+            list: (start, end) of matches
+        """
+
+        found = []
+        if self.find_literals is not None:
+            found = self.find_literals(self.literals, text)
+        if self.regex is not None:
+            for match in self.regex.finditer(text):
+                validator = self.validators[int(match.lastgroup[1:])]
+                if validator is None or validator(match.group()):
+                    found.append(match.span())
+        for number, regex in self.regexes:
+            validator = self.validators[number]
+            for match in regex.finditer(text):
+                if validator is None or validator(match.group()):
+                    found.append(match.span())
+        found.sort(key=lambda span: (span[0], -span[1]))
+        spans = []
+        end = 0
+        for start, stop in found:
+            if start >= end and stop > start:
+                spans.append((start, stop))
+                end = stop
+        return spans
+
+    def scrub(self, text):
+        """Replace all matches in text
+
+        Args:
+            text (bytes): text, memoryview is accepted
+
+        Returns:
+            bytes: scrubbed text, text itself if nothing is found
+        """
+
+        spans = self._find(text)
+        if not spans:
+            return text
+        parts = []
+        position = 0
+        for start, end in spans:
+            parts.append(text[position:start])
+            parts.append(MASK_CHAR * (end - start)
+                         if self.mode == 'mask' else REDACTED)
+            position = end
+        parts.append(text[position:])
+        return b''.join(parts)
+
+    def scrub_parts(self, head, body):
+        """Scrub HTTP request parts and fix Content-Length of changed body
+
+        Args:
+            head (bytes): request head, see ammo.split_request
+            body (memoryview): request body
+
+        Returns:
+            tuple: head and body
+        """
+
+        head = self.scrub(head)
+        scrubbed = self.scrub(body)
+        if scrubbed is not body and len(scrubbed) != len(body):
+            # body starts with CRLF of the empty line
+            length = str(max(len(scrubbed) - 2, 0)).encode('ascii')
+            head = CONTENT_LENGTH.sub(
+                lambda match: match.group(1) + length, head)
+        return head, scrubbed
+
+    def scrub_request(self, request):
+        """Scrub HTTP request and fix Content-Length of changed body
+
+        Args:
+            request (bytes): HTTP request
+
+        Returns:
+            bytes: scrubbed HTTP request
+        """
+
+        return b''.join(self.scrub_parts(*ammo.split_request(request)))
@@ -0,0 +1,224 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2018 Alexander Grechin
+#
+# Licensed under the BSD 3-Clause license.
+# See LICENSE file in the project root for full license information.
+#
+
+"""Split ammo into shards for several tanks in one pass
+
+Every request goes to the least loaded shard by requests count or bytes.
+Requests with shard key (client address, cookie or header) go to the shard
+chosen by jump consistent hash of the key, so a session stays on one tank
+and only 1/N of sessions move when a shard is added.
+"""
+
+import hashlib
+import os
+import struct
+from tanktools import ammo as ammo_index
+
+SHARD_BALANCE = ['count', 'bytes']
+
+# write buffer size of every shard file
+BUFFER_SIZE = 1024 * 1024
+
+# linear congruential generator multiplier of jump consistent hash
+JUMP_MULTIPLIER = 2862933555777941757
+
+UINT64_MASK = 0xFFFFFFFFFFFFFFFF
+
+
+def shard_filename(filename, number):
+    """Get shard file name, number is inserted before extension
+
+    Args:
+        filename (str): output file path, e.g. out.ammo
+        number (int): shard number
+
+    Returns:
+        str: shard file path, e.g. out.0.ammo
+    """
+
+    root, extension = os.path.splitext(filename)
+    return '%s.%d%s' % (root, number, extension)
+
+
+def hash_key(key):
+    """Map shard key to 64-bit integer
+
+    Args:
+        key (str): shard key
+
+    Returns:
+        int: hash
+    """
+
+    return struct.unpack(
+        '<Q', hashlib.md5(key.encode('utf-8', 'replace')).digest()[:8])[0]
+
+
+def jump_hash(key, buckets):
+    """Jump consistent hash by Lamping and Veach
+
+    Args:
+        key (int): 64-bit key hash
+        buckets (int): buckets count
+
+    Returns:
+        int: bucket number
+    """
+
+    bucket, jump = -1, 0
+    while jump < buckets:
+        bucket = jump
+        key = (key * JUMP_MULTIPLIER + 1) & UINT64_MASK
+        jump = int((bucket + 1) * (float(1 << 31) / float((key >> 33) + 1)))
+    return bucket
+
+
+def _header(request, name):
+    """Get header value joined by '; ' if header is repeated"""
+
+    value = request.headers.get(name.lower(), '')
+    return '; '.join(value) if isinstance(value, list) else value
+
+
+def check_shard_key(key):
+    """Check shard key name
+
+    Args:
+        key (str): shard key, see shard_key
+    """
+
+    kind, _, name = key.partition(':')
+    if key not in ('client', 'cookie') and \
+            not (kind in ('cookie', 'header') and name):
+        raise ValueError("Unknown shard key %s" % key)
+
+
+def shard_key(request, key):
+    """Get shard key of HTTP request
+
+    Args:
+        request (HTTPRequest): HTTP request
+        key (str): 'client' for source address, 'cookie' for Cookie header,
+                   'cookie:<name>' for a cookie value,
+                   'header:<name>' for a header value
+
+    Returns:
+        str: shard key, None if request doesn't have it
+    """
+
+    if key == 'client':
+        return request.src or None
+    if key == 'cookie':
+        return _header(request, 'cookie') or None
+    kind, _, name = key.partition(':')
+    if kind == 'cookie' and name:
+        for cookie in _header(request, 'cookie').split(';'):
+            cookie_name, _, value = cookie.strip().partition('=')
+            if cookie_name == name:
+                return value or None
+        return None
+    if kind == 'header' and name:
+        return _header(request, name) or None
+    raise ValueError("Unknown shard key %s" % key)
+
+
+def keyed_transform(transform, key=None):
+    """Make transform returning shard key with ammo
+
+    Args:
+        transform (function): function of HTTP request returning ammo
+        key (str): shard key, see shard_key
+
+    Returns:
+        function: function of HTTP request returning (key, ammo) tuple
+    """
+
+    if key:
+        check_shard_key(key)
+
+    def _transform(request):
+        ammo = transform(request)
+        if ammo is None:
+            return None
+        return (shard_key(request, key) if key else None, ammo)
+
+    return _transform
+
+
+class ShardWriter(object):
+    """Write ammo entries to several buffered shard files"""
+
+    def __init__(self, output, shards, balance='count', index_file=None,
+                 buffer_size=BUFFER_SIZE):
+        """Constructor
+
+        Args:
+            output (str): output file path, see shard_filename
+            shards (int): shards count
+            balance (str): one of SHARD_BALANCE
+            index_file (str): index file path, index is written per shard
+            buffer_size (int): write buffer size of every shard file
+        """
+
+        if shards < 1:
+            raise ValueError("Shards count should be positive")
+        if balance not in SHARD_BALANCE:
+            raise ValueError("Unknown shard balance %s" % balance)
+        self.shards = shards
+        self.balance = balance
+        self.loads = [0] * shards
+        self.counts = [0] * shards
+        self.files = []
+        self.indexes = []
+        self.writers = []
+        try:
+            for number in range(shards):
+                file_handler = open(
+                    shard_filename(output, number), 'wb',
+                    buffering=buffer_size)
+                self.files.append(file_handler)
+                if index_file:
+                    index = ammo_index.AmmoIndexWriter(
+                        shard_filename(index_file, number), file_handler)
+                    self.indexes.append(index)
+                    self.writers.append(index.write)
+                else:
+                    self.writers.append(file_handler.write)
+        except (IOError, OSError):
+            self.close()
+            raise
+
+    def write(self, item):
+        """Write ammo entry to its shard
+
+        Args:
+            item (tuple): shard key or None and ammo entry of bytes
+        """
+
+        key, ammo = item
+        if key is not None:
+            number = jump_hash(hash_key(key), self.shards)
+        else:
+            number = self.loads.index(min(self.loads))
+        self.writers[number](ammo)
+        self.counts[number] += 1
+        if self.balance == 'bytes':
+            self.loads[number] += len(ammo)
+        else:
+            self.loads[number] += 1
+
+    def close(self):
+        """Close indexes and shard files"""
+
+        for index in self.indexes:
+            index.close()
+        for file_handler in self.files:
+            file_handler.close()
+        self.indexes = []
+        self.files = []
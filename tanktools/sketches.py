@@ -0,0 +1,493 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2018 Alexander Grechin
+#
+# Licensed under the BSD 3-Clause license.
+# See LICENSE file in the project root for full license information.
+#
+
+"""Fixed memory sketches of HTTP traffic
+
+Count-Min sketch estimates frequency of any key, Space-Saving keeps
+the most frequent keys, HyperLogLog counts distinct keys.
+Every sketch is mergeable, so profiles of several captures
+may be built separately and merged.
+Keys are buffered and added in batches of distinct keys.
+"""
+
+import hashlib
+import json
+from collections import Counter, OrderedDict
+import numpy as np
+
+# top-K fields of traffic profile
+PROFILE_FIELDS = ['uri', 'host', 'method', 'user_agent']
+
+# distinct keys counted by traffic profile
+DISTINCT_FIELDS = ['client', 'uri']
+
+BATCH_SIZE = 65536
+
+# HyperLogLog precision range, the hash rest below the register index
+# has 53 bits at most, so its rank is exact in float64
+MIN_PRECISION = 11
+MAX_PRECISION = 18
+
+
+def hash_keys(keys):
+    """Get stable 64-bit hashes of keys
+
+    Args:
+        keys (list): strings
+
+    Returns:
+        ndarray: uint64 hashes
+    """
+
+    return np.array([
+        int(hashlib.md5(key.encode('utf-8', 'replace')).hexdigest()[:16], 16)
+        for key in keys
+    ], dtype=np.uint64)
+
+
+class CountMinSketch(object):
+    """Count-Min sketch, estimates are never below true counts"""
+
+    def __init__(self, width=2 ** 14, depth=4):
+        """Constructor
+
+        Args:
+            width (int): counters count per row
+            depth (int): rows count, estimate is the minimum over rows
+        """
+
+        self.width = width
+        self.depth = depth
+        self.table = np.zeros((depth, width), dtype=np.int64)
+
+    def _columns(self, hashes):
+        """Get counter column of every hash in every row
+
+        Args:
+            hashes (ndarray): uint64 hashes
+
+        Returns:
+            ndarray: columns, a row per sketch row
+        """
+
+        low = (hashes & np.uint64(0xffffffff)).astype(np.int64)
+        high = (hashes >> np.uint64(32)).astype(np.int64) | 1
+        rows = np.arange(self.depth, dtype=np.int64)[:, None]
+        return (low[None, :] + rows * high[None, :]) % self.width
+
+    def update(self, hashes, counts):
+        """Add counts of hashed keys
+
+        Args:
+            hashes (ndarray): uint64 hashes of keys
+            counts (ndarray): counts of keys
+        """
+
+        columns = self._columns(hashes)
+        for row in range(self.depth):
+            np.add.at(self.table[row], columns[row], counts)
+
+    def estimate(self, hashes):
+        """Estimate counts of hashed keys
+
+        Args:
+            hashes (ndarray): uint64 hashes of keys
+
+        Returns:
+            ndarray: estimated counts
+        """
+
+        columns = self._columns(hashes)
+        return self.table[np.arange(self.depth)[:, None], columns].min(axis=0)
+
+    def merge(self, other):
+        """Add counts of another sketch with the same dimensions
+
+        Args:
+            other (CountMinSketch): sketch
+        """
+
+        if self.table.shape != other.table.shape:
+            raise ValueError(
+                "Count-Min sketches of different size can't be merged")
+        self.table += other.table
+
+
+class SpaceSaving(object):
+    """Space-Saving summary of the most frequent keys
+
+    A key with true count above total / capacity is always kept,
+    its count is overestimated by at most its error.
+    """
+
+    def __init__(self, capacity=1000):
+        """Constructor
+
+        Args:
+            capacity (int): the largest count of kept keys
+        """
+
+        self.capacity = capacity
+        self.counts = {}
+        self.errors = {}
+
+    def _minimum(self):
+        """Get the smallest kept count if summary is full
+
+        Returns:
+            int: count which any missing key may have
+        """
+
+        if len(self.counts) < self.capacity:
+            return 0
+        return min(self.counts.values())
+
+    def merge_counts(self, counts, errors=None, minimum=0):
+        """Merge counts of another summary
+
+        Missing keys of each summary get its minimum count as
+        both count and error, then the largest counts are kept.
+
+        Args:
+            counts (dict): counts of keys
+            errors (dict): overestimation of counts, 0 by default
+            minimum (int): count which keys missing in counts may have
+        """
+
+        errors = errors or {}
+        own_minimum = self._minimum()
+        merged_counts = {}
+        merged_errors = {}
+        for key in set(self.counts) | set(counts):
+            merged_counts[key] = \
+                self.counts.get(key, own_minimum) + counts.get(key, minimum)
+            merged_errors[key] = \
+                self.errors.get(key, own_minimum) + errors.get(key, minimum)
+        kept = sorted(merged_counts, key=lambda key: (-merged_counts[key],
+                                                      key))[:self.capacity]
+        self.counts = dict((key, merged_counts[key]) for key in kept)
+        self.errors = dict((key, merged_errors[key]) for key in kept)
+
+    def merge(self, other):
+        """Merge another summary
+
+        Args:
+            other (SpaceSaving): summary
+        """
+
+        self.merge_counts(other.counts, other.errors, other._minimum())
+
+    def top(self, count=10):
+        """Get the most frequent keys
+
+        Args:
+            count (int): keys count
+
+        Returns:
+            list: (key, count, error) tuples, the most frequent first
+        """
+
+        keys = sorted(self.counts, key=lambda key: (-self.counts[key], key))
+        return [(key, self.counts[key], self.errors[key])
+                for key in keys[:count]]
+
+
+class HyperLogLog(object):
+    """HyperLogLog distinct keys counter"""
+
+    def __init__(self, precision=14):
+        """Constructor
+
+        Args:
+            precision (int): log2 of registers count from MIN_PRECISION
+                             to MAX_PRECISION, relative error
+                             is about 1.04 / 2 ** (p / 2)
+        """
+
+        if not MIN_PRECISION <= precision <= MAX_PRECISION:
+            raise ValueError(
+                "HyperLogLog precision should be from %d to %d" %
+                (MIN_PRECISION, MAX_PRECISION))
+        self.precision = precision
+        self.registers = np.zeros(2 ** precision, dtype=np.uint8)
+
+    def update(self, hashes):
+        """Add hashed keys
+
+        Args:
+            hashes (ndarray): uint64 hashes of keys
+        """
+
+        bits = 64 - self.precision
+        index = (hashes >> np.uint64(bits)).astype(np.int64)
+        rest = (hashes & np.uint64((1 << bits) - 1)).astype(np.float64)
+        # the rest has 53 bits at most, so the exponent is exact
+        rank = bits - np.frexp(rest)[1] + 1
+        np.maximum.at(self.registers, index, rank.astype(np.uint8))
+
+    def estimate(self):
+        """Estimate distinct keys count
+
+        Returns:
+            float: distinct keys count
+        """
+
+        size = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / size)
+        estimate = alpha * size * size / np.sum(
+            2.0 ** -self.registers.astype(np.float64))
+        zeros = np.count_nonzero(self.registers == 0)
+        if estimate <= 2.5 * size and zeros:
+            estimate = size * np.log(size / float(zeros))
+        return float(estimate)
+
+    def merge(self, other):
+        """Merge another counter with the same precision
+
+        Args:
+            other (HyperLogLog): counter
+        """
+
+        if self.precision != other.precision:
+            raise ValueError(
+                "HyperLogLog counters of different precision " +
+                "can't be merged")
+        np.maximum(self.registers, other.registers, out=self.registers)
+
+
+def _header(request, name):
+    """Get header value of HTTP request
+
+    Args:
+        request (HTTPRequest): HTTP request
+        name (str): header name in lower case
+
+    Returns:
+        str: header value, the first one of repeated header,
+             None if header is absent
+    """
+
+    value = request.headers.get(name)
+    if isinstance(value, list):
+        value = value[0] if value else None
+    return value
+
+
+class TrafficProfile(object):
+    """Top keys and distinct keys counts of HTTP requests"""
+
+    def __init__(self, capacity=1000, width=2 ** 14, depth=4, precision=14,
+                 batch_size=BATCH_SIZE):
+        """Constructor
+
+        Args:
+            capacity (int): kept keys count per field
+            width (int): Count-Min sketch width
+            depth (int): Count-Min sketch depth
+            precision (int): HyperLogLog precision
+            batch_size (int): requests buffered before sketches update
+        """
+
+        self.requests = 0
+        self.batch_size = batch_size
+        self.top_keys = OrderedDict(
+            (field, SpaceSaving(capacity)) for field in PROFILE_FIELDS)
+        self.frequencies = OrderedDict(
+            (field, CountMinSketch(width, depth)) for field in PROFILE_FIELDS)
+        self.distinct = OrderedDict(
+            (field, HyperLogLog(precision)) for field in DISTINCT_FIELDS)
+        self._pending = dict(
+            (field, []) for field in set(PROFILE_FIELDS + DISTINCT_FIELDS))
+
+    def add(self, request):
+        """Add HTTP request
+
+        Args:
+            request (HTTPRequest): HTTP request
+        """
+
+        self.requests += 1
+        keys = {
+            'uri': request.uri,
+            'host': _header(request, 'host'),
+            'method': request.method,
+            'user_agent': _header(request, 'user-agent'),
+            'client': request.src,
+        }
+        for field, key in keys.items():
+            if key:
+                self._pending[field].append(key)
+        if len(self._pending['uri']) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        """Add buffered keys to sketches"""
+
+        for field, keys in self._pending.items():
+            if not keys:
+                continue
+            counts = Counter(keys)
+            distinct = list(counts)
+            hashes = hash_keys(distinct)
+            if field in self.top_keys:
+                self.top_keys[field].merge_counts(counts)
+                self.frequencies[field].update(
+                    hashes, np.array([counts[key] for key in distinct],
+                                     dtype=np.int64))
+            if field in self.distinct:
+                self.distinct[field].update(hashes)
+            self._pending[field] = []
+
+    def top(self, field, count=10):
+        """Get the most frequent keys of field
+
+        Counts are the smallest of Space-Saving and Count-Min estimates.
+
+        Args:
+            field (str): one of PROFILE_FIELDS
+            count (int): keys count
+
+        Returns:
+            list: (key, count) tuples, the most frequent first
+        """
+
+        self.flush()
+        top = self.top_keys[field].top(count)
+        if not top:
+            return []
+        estimates = self.frequencies[field].estimate(
+            hash_keys([key for key, _, _ in top]))
+        result = [(key, int(min(value, estimate)))
+                  for (key, value, _), estimate in zip(top, estimates)]
+        return sorted(result, key=lambda item: (-item[1], item[0]))
+
+    def count_distinct(self, field):
+        """Estimate distinct keys count of field
+
+        Args:
+            field (str): one of DISTINCT_FIELDS
+
+        Returns:
+            int: distinct keys count
+        """
+
+        self.flush()
+        return int(round(self.distinct[field].estimate()))
+
+    def merge(self, other):
+        """Merge profile built with the same parameters
+
+        Args:
+            other (TrafficProfile): profile
+        """
+
+        self.flush()
+        other.flush()
+        self.requests += other.requests
+        for field in PROFILE_FIELDS:
+            self.top_keys[field].merge(other.top_keys[field])
+            self.frequencies[field].merge(other.frequencies[field])
+        for field in DISTINCT_FIELDS:
+            self.distinct[field].merge(other.distinct[field])
+
+    def to_dict(self):
+        """Convert profile to JSON serializable dict
+
+        Returns:
+            dict: profile
+        """
+
+        self.flush()
+        return {
+            'requests': self.requests,
+            'top_keys': dict(
+                (field, {'capacity': summary.capacity,
+                         'counts': summary.counts,
+                         'errors': summary.errors})
+                for field, summary in self.top_keys.items()),
+            'frequencies': dict(
+                (field, sketch.table.tolist())
+                for field, sketch in self.frequencies.items()),
+            'distinct': dict(
+                (field, counter.registers.tolist())
+                for field, counter in self.distinct.items()),
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        """Build profile from dict made by to_dict
+
+        Args:
+            data (dict): profile
+
+        Returns:
+            TrafficProfile: profile
+        """
+
+        table = np.array(data['frequencies']['uri'], dtype=np.int64)
+        registers = data['distinct']['uri']
+        profile = cls(
+            data['top_keys']['uri']['capacity'], table.shape[1],
+            table.shape[0], int(np.log2(len(registers))))
+        profile.requests = data['requests']
+        for field in PROFILE_FIELDS:
+            profile.top_keys[field].counts = dict(
+                data['top_keys'][field]['counts'])
+            profile.top_keys[field].errors = dict(
+                data['top_keys'][field]['errors'])
+            profile.frequencies[field].table = np.array(
+                data['frequencies'][field], dtype=np.int64)
+        for field in DISTINCT_FIELDS:
+            profile.distinct[field].registers = np.array(
+                data['distinct'][field], dtype=np.uint8)
+        return profile
+
+
+def write_profile(profile, output_file):
+    """Write traffic profile to JSON file
+
+    Args:
+        profile (TrafficProfile): profile
+        output_file (str): output file path
+    """
+
+    with open(output_file, 'w') as file_handler:
+        json.dump(profile.to_dict(), file_handler, separators=(',', ':'))
+
+
+def read_profile(input_file):
+    """Read traffic profile written by write_profile
+
+    Args:
+        input_file (str): input file path
+
+    Returns:
+        TrafficProfile: profile
+    """
+
+    with open(input_file, 'r') as file_handler:
+        return TrafficProfile.from_dict(json.load(file_handler))
+
+
+def print_profile(profile, count=10):
+    """Print requests count, distinct keys counts and top keys
+
+    Args:
+        profile (TrafficProfile): profile
+        count (int): keys count per field
+    """
+
+    print("Profile:")
+    print("\trequests: %d" % profile.requests)
+    for field in DISTINCT_FIELDS:
+        print("\tdistinct %s: %d" % (field, profile.count_distinct(field)))
+    for field in PROFILE_FIELDS:
+        print("\ttop %s:" % field)
+        for key, value in profile.top(field, count):
+            print("\t\t%d\t%s" % (value, key))
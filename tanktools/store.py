@@ -0,0 +1,395 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2018 Alexander Grechin
+#
+# Licensed under the BSD 3-Clause license.
+# See LICENSE file in the project root for full license information.
+#
+
+"""Embedded SQLite store of tank runs
+
+Every ingested run keeps its metadata, per-second rollups and
+log-bucketed histograms of the whole run for each tag,
+so cross-run trends are built without parsing phout files again.
+"""
+
+import os
+import sqlite3
+import time
+import numpy as np
+import pandas as pd
+from tanktools import phout
+
+ALL_TAGS = '*'
+
+SECONDS_FIELDS = ['count', 'errors'] + \
+    ['sum_' + field for field in phout.ROLLUP_SUM_FIELDS] + \
+    ['max_' + field for field in phout.ROLLUP_HISTOGRAM_FIELDS]
+
+SCHEMA = [
+    """CREATE TABLE IF NOT EXISTS runs (
+        run_id INTEGER PRIMARY KEY AUTOINCREMENT,
+        name TEXT NOT NULL,
+        source TEXT,
+        from_date REAL,
+        to_date REAL,
+        count INTEGER NOT NULL,
+        period REAL NOT NULL,
+        edges BLOB NOT NULL,
+        ingested REAL NOT NULL
+    )""",
+    "CREATE INDEX IF NOT EXISTS runs_from_date ON runs (from_date)",
+    """CREATE TABLE IF NOT EXISTS seconds (
+        run_id INTEGER NOT NULL,
+        tag TEXT NOT NULL,
+        time REAL NOT NULL,
+        %s,
+        PRIMARY KEY (run_id, tag, time)
+    ) WITHOUT ROWID""" % ",\n        ".join(
+        "%s INTEGER NOT NULL" % field for field in SECONDS_FIELDS),
+    "CREATE INDEX IF NOT EXISTS seconds_tag_time ON seconds (tag, time)",
+    """CREATE TABLE IF NOT EXISTS histograms (
+        run_id INTEGER NOT NULL,
+        tag TEXT NOT NULL,
+        field TEXT NOT NULL,
+        count INTEGER NOT NULL,
+        min INTEGER,
+        max INTEGER,
+        bins BLOB NOT NULL,
+        counts BLOB NOT NULL,
+        PRIMARY KEY (run_id, tag, field)
+    ) WITHOUT ROWID""",
+    """CREATE INDEX IF NOT EXISTS histograms_tag_field
+        ON histograms (tag, field, run_id)""",
+]
+
+
+def open_store(path):
+    """Open store, create tables if they don't exist
+
+    Args:
+        path (str): SQLite database file path, ':memory:' for temporary store
+
+    Returns:
+        sqlite3.Connection: store connection
+    """
+
+    connection = sqlite3.connect(path)
+    if path != ':memory:':
+        connection.execute("PRAGMA journal_mode = WAL")
+    with connection:
+        for statement in SCHEMA:
+            connection.execute(statement)
+    return connection
+
+
+def _to_blob(values, dtype):
+    """Pack array into little-endian binary blob
+
+    Args:
+        values (ndarray): values
+        dtype (str): numpy type of stored values
+
+    Returns:
+        sqlite3.Binary: blob
+    """
+
+    return sqlite3.Binary(np.ascontiguousarray(values, dtype=dtype).tobytes())
+
+
+def _from_blob(blob, dtype):
+    """Unpack array from binary blob
+
+    Args:
+        blob (bytes): blob
+        dtype (str): numpy type of stored values
+
+    Returns:
+        ndarray: values
+    """
+
+    return np.frombuffer(bytes(blob), dtype=dtype)
+
+
+def _tag_rows(run_id, tag, rollup):
+    """Make seconds and histograms table rows from rollup of a tag
+
+    Args:
+        run_id (int): run identifier
+        tag (str): tag
+        rollup (dict): rollup of tag requests
+
+    Returns:
+        tuple: seconds rows and histograms rows
+    """
+
+    buckets_count = len(rollup['time'])
+    errors_mask = (rollup['code'] == 0) | (rollup['code'] >= 400)
+    errors = np.bincount(
+        rollup['code_bucket'][errors_mask],
+        weights=rollup['code_count'][errors_mask],
+        minlength=buckets_count
+    ).astype(np.int64)
+    columns = [rollup['time'].tolist(), rollup['count'].tolist(),
+               errors.tolist()]
+    for field in SECONDS_FIELDS[2:]:
+        columns.append(rollup[field].tolist())
+    seconds = [(run_id, tag) + row for row in zip(*columns)]
+
+    histograms = []
+    for field in phout.ROLLUP_HISTOGRAM_FIELDS:
+        counts = phout.get_rollup_histogram(rollup, field)
+        bins = np.flatnonzero(counts)
+        histograms.append((
+            run_id, tag, field, int(rollup['count'].sum()),
+            int(rollup['min_' + field].min()) if buckets_count else None,
+            int(rollup['max_' + field].max()) if buckets_count else None,
+            _to_blob(bins, '<i4'), _to_blob(counts[bins], '<i8')
+        ))
+    return seconds, histograms
+
+
+def ingest_data_frame(connection, data_frame, name, source=None, period=1,
+                      edges=None, batch_size=10000):
+    """Store parsed run
+
+    Args:
+        connection (sqlite3.Connection): store connection
+        data_frame (DataFrame): parsed phout data
+        name (str): run name
+        source (str): phout file path
+        period (float): rollup bucket duration in seconds
+        edges (ndarray): histogram bucket edges, log_bucket_edges by default
+        batch_size (int): count of rows inserted at once
+
+    Returns:
+        int: run identifier
+    """
+
+    if edges is None:
+        edges = phout.log_bucket_edges()
+    from_date = to_date = None
+    if phout.size(data_frame):
+        from_date, to_date = (
+            float(date) for date in phout.get_time_bounds(data_frame))
+
+    with connection:
+        cursor = connection.execute(
+            "INSERT INTO runs (name, source, from_date, to_date, count, "
+            "period, edges, ingested) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (name, source, from_date, to_date, phout.size(data_frame),
+             float(period), _to_blob(edges, '<i8'), time.time()))
+        run_id = cursor.lastrowid
+
+        tag_column = phout.get_column(data_frame, 'tag').astype(str)
+        tags = np.unique(tag_column).tolist()
+        parts = [(ALL_TAGS, data_frame)]
+        if len(tags) > 1:
+            parts.extend(
+                (tag, phout.filter_rows(data_frame, tag_column == tag))
+                for tag in tags)
+        elif tags:
+            parts.append((tags[0], data_frame))
+
+        seconds = []
+        histograms = []
+        for tag, part in parts:
+            tag_seconds, tag_histograms = _tag_rows(
+                run_id, tag, phout.make_rollup(part, period, edges))
+            seconds.extend(tag_seconds)
+            histograms.extend(tag_histograms)
+
+        statement = "INSERT INTO seconds (run_id, tag, time, %s) " \
+            "VALUES (?, ?, ?, %s)" % (
+                ", ".join(SECONDS_FIELDS),
+                ", ".join("?" * len(SECONDS_FIELDS)))
+        for start in range(0, len(seconds), batch_size):
+            connection.executemany(
+                statement, seconds[start:start + batch_size])
+        connection.executemany(
+            "INSERT INTO histograms (run_id, tag, field, count, min, max, "
+            "bins, counts) VALUES (?, ?, ?, ?, ?, ?, ?, ?)", histograms)
+    return run_id
+
+
+def ingest_phout(connection, input_file, name=None, flags=None, period=1,
+                 edges=None):
+    """Parse yandex-tank phout file and store it
+
+    Args:
+        connection (sqlite3.Connection): store connection
+        input_file (str): input file path
+        name (str): run name, file name by default
+        flags (dict): List of flags, see parse_phout
+        period (float): rollup bucket duration in seconds
+        edges (ndarray): histogram bucket edges, log_bucket_edges by default
+
+    Returns:
+        int: run identifier
+    """
+
+    if name is None:
+        name = os.path.basename(input_file)
+    return ingest_data_frame(
+        connection, phout.parse_phout(input_file, flags), name,
+        input_file, period, edges)
+
+
+def ingest_phouts(connection, input_files, flags=None, period=1, edges=None):
+    """Parse several phout files and store them, one transaction per run
+
+    Args:
+        connection (sqlite3.Connection): store connection
+        input_files (list): input file paths
+        flags (dict): List of flags, see parse_phout
+        period (float): rollup bucket duration in seconds
+        edges (ndarray): histogram bucket edges, log_bucket_edges by default
+
+    Returns:
+        list: run identifiers
+    """
+
+    return [ingest_phout(connection, input_file, None, flags, period, edges)
+            for input_file in input_files]
+
+
+def delete_run(connection, run_id):
+    """Delete run from store
+
+    Args:
+        connection (sqlite3.Connection): store connection
+        run_id (int): run identifier
+    """
+
+    with connection:
+        for table in ['histograms', 'seconds', 'runs']:
+            connection.execute(
+                "DELETE FROM %s WHERE run_id = ?" % table, (run_id,))
+
+
+def get_runs(connection, last=None):
+    """Get metadata of stored runs ordered by start time
+
+    Args:
+        connection (sqlite3.Connection): store connection
+        last (int): count of the latest runs, all runs by default
+
+    Returns:
+        DataFrame: run_id, name, source, from_date, to_date, count, period
+    """
+
+    query = "SELECT run_id, name, source, from_date, to_date, count, " \
+        "period FROM runs ORDER BY from_date DESC, run_id DESC"
+    params = ()
+    if last is not None:
+        query += " LIMIT ?"
+        params = (int(last),)
+    runs = pd.read_sql_query(query, connection, params=params)
+    return runs.iloc[::-1].reset_index(drop=True)
+
+
+def get_tags(connection, run_id=None):
+    """Get stored tags
+
+    Args:
+        connection (sqlite3.Connection): store connection
+        run_id (int): run identifier, all runs by default
+
+    Returns:
+        list: sorted tags, ALL_TAGS excluded
+    """
+
+    query = "SELECT DISTINCT tag FROM histograms WHERE tag != ?"
+    params = (ALL_TAGS,)
+    if run_id is not None:
+        query += " AND run_id = ?"
+        params += (run_id,)
+    return sorted(row[0] for row in connection.execute(query, params))
+
+
+def get_trend(connection, field_name, quantile_list=None, tag=ALL_TAGS,
+              last=200):
+    """Get quantiles of field across the latest runs
+
+    Quantiles are computed from stored histograms,
+    precision is limited by histogram buckets.
+
+    Args:
+        connection (sqlite3.Connection): store connection
+        field_name (str): one of ROLLUP_HISTOGRAM_FIELDS
+        quantile_list (list): list of quantile values
+        tag (str): requests tag, ALL_TAGS for all requests
+        last (int): count of the latest runs
+
+    Returns:
+        DataFrame: run_id, name, from_date, count, rps
+                   and a column per quantile, ordered by start time
+    """
+
+    if field_name not in phout.ROLLUP_HISTOGRAM_FIELDS:
+        raise ValueError("Field %s is not kept in store" % field_name)
+    if not quantile_list:
+        quantile_list = phout.DEFAULT_QUANTILES
+    rows = connection.execute(
+        "SELECT runs.run_id, runs.name, runs.from_date, runs.to_date, "
+        "runs.edges, histograms.count, histograms.min, histograms.max, "
+        "histograms.bins, histograms.counts "
+        "FROM histograms JOIN runs ON runs.run_id = histograms.run_id "
+        "WHERE histograms.tag = ? AND histograms.field = ? "
+        "ORDER BY runs.from_date DESC, runs.run_id DESC LIMIT ?",
+        (tag, field_name, int(last))).fetchall()[::-1]
+
+    edges_cache = {}
+    trend = {'run_id': [], 'name': [], 'from_date': [], 'count': [],
+             'rps': []}
+    values = []
+    for (run_id, name, from_date, to_date, edges, count, min_value,
+         max_value, bins, counts) in rows:
+        edges = bytes(edges)
+        if edges not in edges_cache:
+            edges_cache[edges] = _from_blob(edges, '<i8')
+        edges = edges_cache[edges]
+        histogram = np.zeros(len(edges) - 1, dtype=np.int64)
+        histogram[_from_blob(bins, '<i4')] = _from_blob(counts, '<i8')
+        values.append(phout.get_histogram_quantiles(
+            histogram, edges, quantile_list, min_value, max_value))
+        trend['run_id'].append(run_id)
+        trend['name'].append(name)
+        trend['from_date'].append(from_date)
+        trend['count'].append(count)
+        trend['rps'].append(
+            phout.count_rps(count, from_date, to_date) if count else 0.0)
+
+    result = pd.DataFrame(
+        trend, columns=['run_id', 'name', 'from_date', 'count', 'rps'])
+    values = np.array(values).reshape(len(rows), len(quantile_list))
+    for index, quantile in enumerate(quantile_list):
+        result[quantile] = values[:, index]
+    return result
+
+
+def get_timeline(connection, run_id, tag=ALL_TAGS):
+    """Get per-second statistics of stored run
+
+    Args:
+        connection (sqlite3.Connection): store connection
+        run_id (int): run identifier
+        tag (str): requests tag, ALL_TAGS for all requests
+
+    Returns:
+        DataFrame: time, count, errors, rps, mean and max
+                   of ROLLUP_HISTOGRAM_FIELDS per bucket
+    """
+
+    timeline = pd.read_sql_query(
+        "SELECT seconds.*, runs.period FROM seconds "
+        "JOIN runs ON runs.run_id = seconds.run_id "
+        "WHERE seconds.run_id = ? AND seconds.tag = ? ORDER BY time",
+        connection, params=(run_id, tag))
+    result = timeline[['time', 'count', 'errors']].copy()
+    result['rps'] = timeline['count'] / timeline['period']
+    for field in phout.ROLLUP_HISTOGRAM_FIELDS:
+        result['mean_' + field] = timeline['sum_' + field] / timeline['count']
+        result['max_' + field] = timeline['max_' + field]
+    return result
@@ -0,0 +1,135 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2018 Alexander Grechin
+#
+# Licensed under the BSD 3-Clause license.
+# See LICENSE file in the project root for full license information.
+#
+
+import io
+import os
+import pytest
+import tempfile
+from tanktools import ammo
+from tanktools import pcap2ammo
+
+
+class TestAmmo(object):
+
+    def set_ammo_data(self):
+        """Prepare ammo entries with cases"""
+
+        requests = [
+            u"GET /%d HTTP/1.1\r\nHost: rambler.ru\r\n\r\n" % index
+            for index in range(5)
+        ]
+        requests[3] = u"POST /ё HTTP/1.1\r\nContent-Length: 2\r\n\r\nok"
+        cases = ['', 'search', '', 'post', 'search']
+        return requests, cases
+
+    @pytest.fixture()
+    def prepare_files(self):
+        """Prepare ammo and index file names"""
+
+        filenames = [tempfile.NamedTemporaryFile(delete=False).name
+                     for _ in range(3)]
+        yield filenames
+        for filename in filenames:
+            os.remove(filename)
+
+    def write_ammo(self, ammo_file, index_file):
+        """Write ammo file with index"""
+
+        requests, cases = self.set_ammo_data()
+        with io.open(ammo_file, 'w', encoding='utf-8') as file_handler:
+            writer = ammo.AmmoIndexWriter(index_file, file_handler)
+            for request, case in zip(requests, cases):
+                writer.write(pcap2ammo.make_ammo(request, case))
+            writer.close()
+        return requests, cases
+
+    @pytest.mark.positive
+    def test_ammo_reader_random_access(self, prepare_files):
+        """Check requests and cases read by number"""
+
+        ammo_file, index_file, _ = prepare_files
+        requests, cases = self.write_ammo(ammo_file, index_file)
+        with ammo.AmmoReader(ammo_file, index_file) as reader:
+            assert len(reader) == 5, "unexpected requests count"
+            for number in [4, 0, 3, 1]:
+                assert reader[number] == requests[number].encode('utf-8'), \
+                    "unexpected request"
+                assert reader.get_case(number) == cases[number], \
+                    "unexpected case"
+            assert reader[-1] == requests[-1].encode('utf-8'), \
+                "unexpected last request"
+            assert reader[1:4:2] == [requests[1].encode('utf-8'),
+                                     requests[3].encode('utf-8')], \
+                "unexpected slice"
+            assert reader.get_entry(1) == pcap2ammo.make_ammo(
+                requests[1], 'search').encode('utf-8'), "unexpected entry"
+
+    @pytest.mark.positive
+    def test_build_index_equals_written(self, prepare_files):
+        """Check that index of existing ammo equals written one"""
+
+        ammo_file, index_file, built_file = prepare_files
+        requests = [u"GET /%d HTTP/1.1\r\n\r\n" % index for index in range(3)]
+        with io.open(ammo_file, 'w', encoding='utf-8') as file_handler:
+            writer = ammo.AmmoIndexWriter(index_file, file_handler)
+            for index, request in enumerate(requests):
+                writer.write(pcap2ammo.make_ammo(request, 'case%d' % index))
+            writer.close()
+        assert ammo.build_index(ammo_file, built_file) == 3, \
+            "unexpected indexed count"
+        with open(index_file, 'rb') as written, \
+                open(built_file, 'rb') as built:
+            assert written.read() == built.read(), "unexpected index"
+
+    @pytest.mark.positive
+    def test_build_index_empty_ammo(self, prepare_files):
+        """Check index of empty ammo file"""
+
+        ammo_file, index_file, _ = prepare_files
+        assert ammo.build_index(ammo_file, index_file) == 0, \
+            "unexpected indexed count"
+        with ammo.AmmoReader(ammo_file, index_file) as reader:
+            assert len(reader) == 0, "unexpected requests count"
+
+    @pytest.mark.positive
+    def test_rewrite_request_bytes(self):
+        """Check headers rewritten in head and body passed as memoryview"""
+
+        body = b'\r\n' + b'\x00\xff' * 1000
+        head, view = ammo.split_request(
+            b"POST / HTTP/1.1\r\nCookie: a=1\r\nHost: rambler.ru\r\n" + body)
+        assert isinstance(view, memoryview) and view == body, \
+            "unexpected body"
+        head = ammo.delete_head_headers(head, ['cookie'])
+        head = ammo.add_head_headers(
+            head, ['Host: other', 'X-Test: 1', 'X-Test: 2'], {'host': ''})
+        assert head == b"POST / HTTP/1.1\r\nHost: rambler.ru\r\n" \
+            b"X-Test: 1\r\n", "unexpected head"
+        entry = ammo.join_ammo([head, view], u'ёлка')
+        assert entry == (u'%d ёлка\n' % (len(head) + len(body))) \
+            .encode('utf-8') + head + body, "unexpected ammo entry"
+
+    @pytest.mark.negative
+    def test_build_index_wrong_header(self, prepare_files):
+        """Check ammo with wrong length header"""
+
+        ammo_file, index_file, _ = prepare_files
+        with open(ammo_file, 'w') as file_handler:
+            file_handler.write("GET / HTTP/1.1\r\n\r\n")
+        with pytest.raises(ValueError, match='Wrong ammo header at offset 0'):
+            ammo.build_index(ammo_file, index_file)
+
+    @pytest.mark.negative
+    def test_ammo_reader_wrong_index(self, prepare_files):
+        """Check file which is not index"""
+
+        ammo_file, index_file, _ = prepare_files
+        self.write_ammo(ammo_file, index_file)
+        with pytest.raises(ValueError, match='Wrong ammo index file'):
+            ammo.AmmoReader(ammo_file, ammo_file)
@@ -0,0 +1,157 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2018 Alexander Grechin
+#
+# Licensed under the BSD 3-Clause license.
+# See LICENSE file in the project root for full license information.
+#
+
+import os
+import mock
+import numpy as np
+import pandas as pd
+import pytest
+import tempfile
+from tanktools import compare
+from tanktools import phout
+
+
+class TestCompare(object):
+
+    def set_phout_data(self, scale=1.0, count=2000):
+        """Prepare data in phout format with lognormal timings"""
+
+        random = np.random.RandomState(1)
+        timings = (random.lognormal(8, 0.3, count) * scale).astype(int)
+        template = "%.3f\t#0\t%d\t281\t94\t%d\t41\t5991\t26697\t391\t0\t200"
+        return [template % (1516295382 + index * 0.01, timing, timing - 500)
+                for index, timing in enumerate(timings)]
+
+    @pytest.fixture()
+    def prepare_data_file(self):
+        """Prepare data file decorator"""
+
+        def make_file(scale=1.0):
+            filename = tempfile.NamedTemporaryFile(delete=False).name
+            with open(filename, "w") as file_handler:
+                file_handler.write("\n".join(self.set_phout_data(scale)))
+            filenames.append(filename)
+            return filename
+
+        filenames = []
+        yield make_file
+
+        for filename in filenames:
+            os.remove(filename)
+
+    @pytest.mark.positive
+    def test_value_counts_exact(self):
+        """Check that few distinct values are counted exactly"""
+
+        values, counts = compare._value_counts(np.array([5, 3, 5, 7, 5]))
+        assert values.tolist() == [3, 5, 7], "unexpected values"
+        assert counts.tolist() == [1, 3, 1], "unexpected counts"
+
+    @pytest.mark.positive
+    def test_value_counts_rounded(self):
+        """Check that many distinct values are rounded with small error"""
+
+        data = np.arange(100000)
+        values, counts = compare._value_counts(data, 1000)
+        assert counts.sum() == len(data), "unexpected total count"
+        assert len(values) < 20000, "unexpected values count"
+        rounded = values[np.searchsorted(values, data)]
+        assert (rounded - data <= data / 1024.0 + 1).all(), \
+            "unexpected rounding error"
+
+    @pytest.mark.positive
+    def test_summarize_run_quantiles(self, prepare_data_file):
+        """Check that quantiles of summary are equal to nearest-rank ones"""
+
+        data_frame = phout.parse_phout(prepare_data_file())
+        summary = compare.summarize_run(data_frame)
+        assert summary['count'] == 2000, "unexpected count"
+        values, counts = summary['fields']['latency']
+        result = compare._rank_quantiles(
+            values, np.cumsum(counts), [0.01, 0.5, 1])
+        expected = np.sort(data_frame['latency'].values)[[19, 999, 1999]]
+        assert result[0].tolist() == expected.tolist(), \
+            "unexpected quantiles"
+
+    @pytest.mark.positive
+    def test_compare_phouts_verdict(self, prepare_data_file):
+        """Check that regression fails and equal run passes"""
+
+        filenames = [prepare_data_file(), prepare_data_file(),
+                     prepare_data_file(1.2)]
+        comparison = compare.compare_phouts(
+            filenames, fields=['interval_real'], resamples=200, workers=1)
+        assert comparison.shape[0] == 6, "unexpected rows count"
+        same = comparison[comparison['run'] == filenames[1]]
+        assert (same['delta'] == 0).all(), "unexpected delta"
+        assert (same['verdict'] == 'pass').all(), "unexpected verdict"
+        worse = comparison[comparison['run'] == filenames[2]]
+        assert (worse['delta_low'] > 0).all(), "unexpected interval"
+        assert (worse['delta_low'] <= worse['delta']).all() and \
+            (worse['delta'] <= worse['delta_high']).all(), \
+            "unexpected interval bounds"
+        assert (worse['verdict'] == 'fail').all(), "unexpected verdict"
+
+    @pytest.mark.positive
+    def test_compare_runs_workers_independent(self, prepare_data_file):
+        """Check that result doesn't depend on processes count"""
+
+        summaries = compare.load_runs(
+            [prepare_data_file(), prepare_data_file(1.01)], workers=2)
+        result = compare.compare_runs(summaries, resamples=120, workers=1)
+        assert result.equals(compare.compare_runs(
+            summaries, resamples=120, workers=2)), "unexpected result"
+
+    @pytest.mark.negative
+    def test_compare_runs_single_run(self, prepare_data_file):
+        """Check that baseline only can't be compared"""
+
+        summary = compare.summarize_run(
+            phout.parse_phout(prepare_data_file()))
+        with pytest.raises(ValueError, match='At least two runs'):
+            compare.compare_runs([summary])
+
+    @pytest.mark.negative
+    def test_compare_runs_empty_run(self, prepare_data_file):
+        """Check run without requests"""
+
+        summary = compare.summarize_run(
+            phout.parse_phout(prepare_data_file()))
+        empty = compare.summarize_run(
+            pd.DataFrame({'time': [], 'interval_real': [], 'latency': []}))
+        with pytest.raises(ValueError, match='has no requests'):
+            compare.compare_runs([summary, empty], ['base', 'empty'])
+
+    @pytest.mark.positive
+    def test_compare_main(self, prepare_data_file, capsys):
+        """Check console output and exit code"""
+
+        filenames = [prepare_data_file(), prepare_data_file(1.2)]
+        with mock.patch.object(
+            compare.sys, 'argv',
+            ['phout-compare', '--field', 'latency', '-q', '0.5',
+             '--resamples', '100', '-w', '1'] + filenames
+        ):
+            assert compare.main() == 1, "unexpected exit code"
+        captured = capsys.readouterr()
+        lines = captured.out.splitlines()
+        assert lines[0] == filenames[1] + ":", "unexpected header"
+        assert lines[1].startswith("\tlatency  50.00: "), \
+            "unexpected metric"
+        assert lines[1].endswith(" FAIL"), "unexpected verdict"
+
+    @pytest.mark.positive
+    def test_compare_init(self):
+        """Check init function works correctly"""
+
+        with mock.patch.object(compare, "main", return_value=42):
+            with mock.patch.object(compare, "__name__", "__main__"):
+                with mock.patch.object(compare.sys, 'exit') as mock_exit:
+                    compare.init()
+                    assert mock_exit.call_args[0][0] == 42
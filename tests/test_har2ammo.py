@@ -160,6 +160,35 @@ class TestParseHttp(object):
             str(len(http_request_with_referer)) + " \n" + \
             http_request_with_referer, "unexpected output"
 
+    @pytest.mark.negative
+    def test_har2ammo_workers_wrong_header(
+        self,
+        prepare_har_file,
+        capsys
+    ):
+        """Check transform error in worker thread is handled correctly"""
+
+        http_request = "GET https://rambler.ru/ HTTP/1.1\r\n" + \
+                       "Host: rambler.ru\r\n" + \
+                       "Content-Length: 0\r\n\r\n"
+        data = har_gen.generate_http_request_har_object(http_request)
+        filename = prepare_har_file(data)
+        assert har2ammo.har2ammo({
+            'input': filename,
+            'output': None,
+            'stats_only': False,
+            'add_header': ['Referer'],
+            'delete_header': [],
+            'filter': None,
+            'workers': 2,
+        }) == 1, "unexpected exit code"
+        captured = capsys.readouterr()
+        assert captured.out == "", "unexpected output"
+        assert captured.err == \
+            'Error: Wrong header format, expected ' + \
+            "\"<header_name>: <header_value>\"\n", \
+            "unexpected output"
+
     @pytest.mark.negative
     def test_har2ammo_add_header_wrong_format(
         self,
@@ -317,6 +346,32 @@ class TestParseHttp(object):
             "Stats:\n\ttotal: 1\n\tcomplete: 1\n\t" + \
             "incorrect: 0\n\tincomplete: 0\n", "unexpected output"
 
+    @pytest.mark.positive
+    def test_har2ammo_count_only(
+        self,
+        prepare_har_file,
+        capsys
+    ):
+        """Check count-only flag handled correctly"""
+
+        http_request = "GET https://rambler.ru/ HTTP/1.1\r\n" + \
+                       "Host: rambler.ru\r\n" + \
+                       "Content-Length: 0\r\n\r\n"
+        data = har_gen.generate_http_request_har_object(http_request)
+        data['log']['entries'].append({'response': {}})
+        filename = prepare_har_file(data)
+        assert har2ammo.har2ammo({
+            'input': filename,
+            'output': False,
+            'stats_only': False,
+            'count_only': True,
+            'filter': None,
+            'http_filter': None
+        }) == 0, "unexpected exit code"
+        captured = capsys.readouterr()
+        assert captured.out == \
+            "Counts:\n\tentries: 2\n\trequests: 1\n", "unexpected output"
+
     @pytest.mark.negative
     def test_har2ammo_empty_input_file(
         self,
@@ -0,0 +1,143 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2018 Alexander Grechin
+#
+# Licensed under the BSD 3-Clause license.
+# See LICENSE file in the project root for full license information.
+#
+
+import subprocess
+import sys
+import numpy as np
+import pytest
+from tanktools import kernels
+
+
+class TestKernels(object):
+
+    def set_phout_buffer(self):
+        """Prepare phout lines with irregular numbers and wrong lines"""
+
+        lines = [
+            "1516295382.983\t#0\t6201\t281\t94\t5785\t41\t5991\t26697\t391"
+            "\t0\t200",
+            "  1516295383.1\ttag\t-1\t0\t0\t0\t0\t0\t0\t0\t0\t0 \r",
+            "1.516295383e9\t#2\t5547\t248\t67\t5191\t41\t5400\t26697\t389"
+            "\t0\t200",
+            "1516295383\t\t5\t+248\t67\t5191\t41\t5400\t26697\t389\t0\t200",
+            "1516295383.239\t#4\t1",
+            "1516295383.1234567890\t#5\t1\t2\t3\t4\t5\t6\t7\t8\t9\t10",
+            "1516295383.3\t#6\t1\t2\t3\t4\t5\t6\t7\t8\t9\t1234567890123456789",
+            "\t \r",
+            "1516295383.4\t#8\t1\t2\t3\t4\t5\t6\t7\t8\t9\t10",
+        ]
+        data = "\n".join(lines).encode('utf-8')
+        return np.frombuffer(data, dtype=np.uint8)
+
+    def assert_equal_results(self, result, expected):
+        """Compare tuples of arrays"""
+
+        assert len(result) == len(expected), "unexpected result size"
+        for value, expected_value in zip(result, expected):
+            assert np.array_equal(value, expected_value), \
+                "unexpected value"
+            assert np.asarray(value).dtype == \
+                np.asarray(expected_value).dtype, "unexpected type"
+
+    @pytest.mark.positive
+    def test_tokenize_check_lines(self):
+        """Check line statuses and parsed values"""
+
+        (count, empty, line_bounds, status, times, values,
+         tag_bounds) = kernels._tokenize_numpy(self.set_phout_buffer())
+        assert count == 7, "unexpected lines count"
+        assert empty, "unexpected empty line flag"
+        assert status.tolist() == [0, 0, 1, 1, 2, 1, 1], \
+            "unexpected statuses"
+        assert times[:2].tolist() == [1516295382.983, 1516295383.1], \
+            "unexpected times"
+        assert values[0].tolist() == \
+            [6201, 281, 94, 5785, 41, 5991, 26697, 391, 0, 200], \
+            "unexpected values"
+        assert values[1].tolist() == [-1] + [0] * 9, \
+            "unexpected negative value"
+        assert (tag_bounds[1, 1] - tag_bounds[1, 0]) == 3, \
+            "unexpected tag bounds"
+        assert line_bounds[1].tolist() == [line_bounds[0, 1] + 3,
+                                           line_bounds[0, 1] + 40], \
+            "unexpected stripped line bounds"
+
+    @pytest.mark.positive
+    def test_tokenize_loop_equals_numpy(self):
+        """Check that loop and NumPy tokenizers are identical"""
+
+        buffer = self.set_phout_buffer()
+        for end in [0, 1, 70, 120, len(buffer)]:
+            self.assert_equal_results(
+                kernels._tokenize_loop(buffer[:end]),
+                kernels._tokenize_numpy(buffer[:end]))
+
+    @pytest.mark.positive
+    def test_bucket_kernels_loop_equals_numpy(self):
+        """Check that loop and NumPy bucket kernels are identical"""
+
+        random = np.random.RandomState(0)
+        values = random.randint(0, 100000, 1000).astype(np.int64)
+        buckets = np.sort(random.randint(0, 20, 1000)).astype(np.int64)
+        shuffled = random.permutation(buckets)
+        for maximum in [True, False]:
+            initial = -1 if maximum else 10 ** 6
+            assert np.array_equal(
+                kernels._reduce_by_bucket_loop(
+                    values, shuffled, 25, initial, maximum),
+                kernels._reduce_by_bucket_numpy(
+                    values, shuffled, 25, initial, maximum)), \
+                "unexpected reduced values"
+        keys = values % 7
+        self.assert_equal_results(
+            kernels._sparse_counts_loop(buckets, keys, 7),
+            kernels._sparse_counts_numpy(buckets, keys, 7))
+        edges = np.array([10, 100, 1000, 10000, 50000], dtype=np.int64)
+        assert np.array_equal(
+            kernels._histogram_loop(values, edges),
+            kernels._histogram_numpy(values, edges)), \
+            "unexpected histogram"
+
+    @pytest.mark.positive
+    def test_jit_equals_numpy(self):
+        """Check that compiled kernels are identical to NumPy ones"""
+
+        pytest.importorskip('numba')
+        if not kernels.JIT_ENABLED:
+            pytest.skip("JIT is disabled")
+        assert kernels.warm_up(), "unexpected JIT state"
+        buffer = self.set_phout_buffer()
+        self.assert_equal_results(
+            kernels.tokenize(buffer), kernels._tokenize_numpy(buffer))
+        values = np.arange(100, dtype=np.int64)[::-1]
+        buckets = np.repeat(np.arange(10), 10)
+        assert np.array_equal(
+            kernels.reduce_by_bucket(values, buckets[::-1], 10, 0, True),
+            kernels._reduce_by_bucket_numpy(
+                values, buckets[::-1], 10, 0, True)), \
+            "unexpected reduced values"
+        self.assert_equal_results(
+            kernels.sparse_counts(buckets, values % 3, 3),
+            kernels._sparse_counts_numpy(buckets, values % 3, 3))
+        edges = np.array([0, 10, 20, 40], dtype=np.int64)
+        assert np.array_equal(
+            kernels.histogram(values, edges),
+            kernels._histogram_numpy(values, edges)), \
+            "unexpected histogram"
+
+    @pytest.mark.positive
+    def test_jit_is_lazy(self):
+        """Check that numba is not imported until a kernel is called"""
+
+        pytest.importorskip('numba')
+        code = "import sys\n" \
+            "from tanktools import phout\n" \
+            "sys.exit('numba' in sys.modules)\n"
+        assert subprocess.call([sys.executable, '-c', code]) == 0, \
+            "numba is imported with phout"
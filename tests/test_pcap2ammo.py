@@ -12,7 +12,9 @@ import mock
 import pytest
 import tempfile
 import dpkt
+from tanktools import ammo
 from tanktools import pcap2ammo
+from tanktools import sharding
 import tanktools
 import sys
 import socket
@@ -193,6 +195,164 @@ class TestParseHttp(object):
             str(len(http_request_with_referer)) + " \n" + \
             http_request_with_referer, "unexpected output"
 
+    @pytest.mark.positive
+    def test_pcap2ammo_workers(
+        self,
+        prepare_data_file,
+        capsys
+    ):
+        """Check requests are converted in parallel threads in order"""
+
+        requests = []
+        data = []
+        for index in range(20):
+            http_request = "GET https://rambler.ru/%d HTTP/1.1\r\n" % index + \
+                           "Host: rambler.ru\r\n" + \
+                           "Content-Length: 0\r\n\r\n"
+            requests.append(http_request)
+            ethernet = pcap_gen.generate_custom_http_request_packet(
+                http_request, {'tcp': {'sport': 10000 + index}})
+            data.append({
+                'timestamp': 1489136209.000001 + index,
+                'data': ethernet.__bytes__()
+            })
+        filename = prepare_data_file(data)
+        pcap2ammo.pcap2ammo({
+            'input': filename,
+            'output': None,
+            'stats_only': False,
+            'add_header': ['Referer: http://domain.com/'],
+            'delete_header': [],
+            'filter': None,
+            'workers': 4,
+            'queue_size': 2,
+        })
+        captured = capsys.readouterr()
+        assert captured.out == "".join(
+            pcap2ammo.make_ammo(http_request[:-2] +
+                                "Referer: http://domain.com/\r\n\r\n")
+            for http_request in requests), "unexpected output"
+
+    @pytest.mark.positive
+    def test_pcap2ammo_sample_size(
+        self,
+        prepare_data_file,
+        capsys
+    ):
+        """Check requests sampled before conversion keep order"""
+
+        data = []
+        for index in range(20):
+            http_request = "GET https://rambler.ru/%d HTTP/1.1\r\n" % index + \
+                           "Host: rambler.ru\r\n\r\n"
+            ethernet = pcap_gen.generate_custom_http_request_packet(
+                http_request, {'tcp': {'sport': 10000 + index}})
+            data.append({
+                'timestamp': 1489136209.000001 + index,
+                'data': ethernet.__bytes__()
+            })
+        filename = prepare_data_file(data)
+        pcap2ammo.pcap2ammo({
+            'input': filename,
+            'output': None,
+            'stats_only': False,
+            'add_header': [],
+            'delete_header': [],
+            'filter': None,
+            'sample_size': 5,
+            'seed': 1,
+        })
+        captured = capsys.readouterr()
+        numbers = [int(line.split('/')[3].split(' ')[0])
+                   for line in captured.out.splitlines()
+                   if line.startswith('GET ')]
+        assert len(numbers) == 5, "unexpected requests count"
+        assert numbers == sorted(numbers), "unexpected order"
+
+    @pytest.mark.positive
+    def test_pcap2ammo_shards(
+        self,
+        prepare_data_file,
+        remove_data_file
+    ):
+        """Check requests split into balanced shards"""
+
+        data = []
+        for index in range(10):
+            http_request = "GET https://rambler.ru/%d HTTP/1.1\r\n" % index + \
+                           "Host: rambler.ru\r\n\r\n"
+            ethernet = pcap_gen.generate_custom_http_request_packet(
+                http_request, {'tcp': {'sport': 10000 + index}})
+            data.append({
+                'timestamp': 1489136209.000001 + index,
+                'data': ethernet.__bytes__()
+            })
+        filename = prepare_data_file(data)
+        output_file = remove_data_file()
+        shard_files = [sharding.shard_filename(output_file, number)
+                       for number in range(2)]
+        try:
+            assert pcap2ammo.pcap2ammo({
+                'input': filename,
+                'output': output_file,
+                'stats_only': False,
+                'add_header': [],
+                'delete_header': [],
+                'filter': None,
+                'shards': 2,
+            }) == 0, "unexpected return code"
+            for number, shard_file in enumerate(shard_files):
+                with open(shard_file, 'rb') as file_handler:
+                    requests = [line for line in file_handler
+                                if line.startswith(b'GET ')]
+                assert requests == [
+                    b"GET https://rambler.ru/%d HTTP/1.1\r\n" % index
+                    for index in range(number, 10, 2)
+                ], "unexpected shard requests"
+        finally:
+            for shard_file in shard_files:
+                if os.path.isfile(shard_file):
+                    os.remove(shard_file)
+
+    @pytest.mark.positive
+    def test_pcap2ammo_schedule(
+        self,
+        prepare_data_file,
+        remove_data_file,
+        capsys
+    ):
+        """Check schedule of all captured requests written with sampling"""
+
+        data = []
+        for index in range(9):
+            http_request = "GET https://rambler.ru/%d HTTP/1.1\r\n" % index + \
+                           "Host: rambler.ru\r\n\r\n"
+            ethernet = pcap_gen.generate_custom_http_request_packet(
+                http_request, {'tcp': {'sport': 10000 + index}})
+            data.append({
+                'timestamp': 1489136209.000001 + (0 if index < 6 else 2),
+                'data': ethernet.__bytes__()
+            })
+        filename = prepare_data_file(data)
+        schedule_file = remove_data_file()
+        pcap2ammo.pcap2ammo({
+            'input': filename,
+            'output': None,
+            'stats_only': False,
+            'add_header': [],
+            'delete_header': [],
+            'filter': None,
+            'sample_size': 2,
+            'schedule': schedule_file,
+            'schedule_mode': 'rps',
+        })
+        captured = capsys.readouterr()
+        assert captured.out.count('GET ') == 2, "unexpected requests count"
+        with open(schedule_file) as file_handler:
+            assert file_handler.read() == \
+                "const(6, 1s) const(0, 1s) const(3, 1s)\n", \
+                "unexpected schedule"
+
     @pytest.mark.negative
     def test_pcap2ammo_add_header_wrong_format(
         self,
@@ -487,6 +647,237 @@ class TestParseHttp(object):
             "Stats:\n\ttotal: 1\n\tcomplete: 1\n\t" + \
             "incorrect: 0\n\tincomplete: 0\n", "unexpected output"
 
+    def set_count_data(self):
+        """Prepare HTTP requests of two flows and a response"""
+
+        http_request = "GET https://rambler.ru/ HTTP/1.1\r\n" + \
+                       "Host: rambler.ru\r\n" + \
+                       "Content-Length: 0\r\n\r\n"
+        data = []
+        for index, payload in enumerate(
+                [http_request, http_request, "HTTP/1.1 200 OK\r\n\r\n"]):
+            ethernet = pcap_gen.generate_custom_http_request_packet(
+                payload, {'tcp': {'sport': 10000 + index % 2}})
+            data.append({
+                'timestamp': 1489136209.000001 + index,
+                'data': ethernet.__bytes__()
+            })
+        return data
+
+    @pytest.mark.positive
+    def test_pcap2ammo_index(
+        self,
+        prepare_data_file,
+        remove_data_file
+    ):
+        """Check index written with output ammo"""
+
+        filename = prepare_data_file(self.set_count_data())
+        output_file = remove_data_file()
+        index_file = output_file + '.idx'
+        try:
+            pcap2ammo.pcap2ammo({
+                'input': filename,
+                'output': output_file,
+                'stats_only': False,
+                'add_header': [],
+                'delete_header': [],
+                'filter': None,
+                'index': index_file,
+            })
+            with ammo.AmmoReader(output_file, index_file) as reader:
+                assert len(reader) == 2, "unexpected requests count"
+                assert reader[1] == b"GET https://rambler.ru/ HTTP/1.1\r\n" \
+                    b"Host: rambler.ru\r\nContent-Length: 0\r\n\r\n", \
+                    "unexpected request"
+        finally:
+            os.remove(index_file)
+
+    @pytest.mark.positive
+    def test_pcap2ammo_routes(
+        self,
+        prepare_data_file,
+        remove_data_file,
+        capsys
+    ):
+        """Check ammo case tags of route rules"""
+
+        filename = prepare_data_file(self.set_count_data())
+        routes_file = remove_data_file()
+        with open(routes_file, 'w') as file_handler:
+            file_handler.write("POST / post\nGET / root\n")
+        pcap2ammo.pcap2ammo({
+            'input': filename,
+            'output': None,
+            'stats_only': False,
+            'add_header': [],
+            'delete_header': [],
+            'filter': None,
+            'routes': routes_file,
+        })
+        captured = capsys.readouterr()
+        assert captured.out.count("73 root\n") == 2, "unexpected case tags"
+
+    @pytest.mark.positive
+    def test_pcap2ammo_scrub(
+        self,
+        prepare_data_file,
+        capsys
+    ):
+        """Check literal redacted in requests"""
+
+        filename = prepare_data_file(self.set_count_data())
+        pcap2ammo.pcap2ammo({
+            'input': filename,
+            'output': None,
+            'stats_only': False,
+            'add_header': [],
+            'delete_header': [],
+            'filter': None,
+            'scrub_literal': ['rambler.ru'],
+            'scrub_mode': 'redact',
+        })
+        captured = capsys.readouterr()
+        assert captured.out.count(
+            "69 \nGET https://REDACTED/ HTTP/1.1\r\nHost: REDACTED\r\n") \
+            == 2, "unexpected scrubbed requests"
+
+    @pytest.mark.positive
+    def test_rewrite_headers_keeps_str_origin(self):
+        """Check that header helpers keep str origin of request"""
+
+        request = mock.Mock(
+            origin=u"GET / HTTP/1.1\r\nHost: rambler.ru\r\n"
+                   u"Cookie: a=1\r\nX-Name: ёлка\r\n\r\n",
+            headers={'host': 'rambler.ru', 'cookie': 'a=1', 'x-name': 'x'})
+        pcap2ammo.delete_headers(request, ['Cookie'])
+        pcap2ammo.add_headers(request, ['Referer: http://domain.com/'])
+        expected = u"GET / HTTP/1.1\r\nHost: rambler.ru\r\n" \
+            u"X-Name: ёлка\r\nReferer: http://domain.com/\r\n\r\n"
+        assert request.origin == expected, "unexpected origin"
+        assert pcap2ammo.make_ammo(request.origin) == \
+            u"%d \n%s" % (len(expected), expected), "unexpected ammo"
+
+    @pytest.mark.positive
+    def test_pcap2ammo_non_ascii_header(
+        self,
+        prepare_data_file,
+        remove_data_file
+    ):
+        """Check ammo length of non-ASCII request counted in bytes"""
+
+        http_request = u"GET https://rambler.ru/ HTTP/1.1\r\n" + \
+                       u"Host: rambler.ru\r\n" + \
+                       u"X-Name: ёлка\r\n\r\n"
+        ethernet = pcap_gen.generate_custom_http_request_packet(http_request)
+        filename = prepare_data_file([{
+            'timestamp': 1489136209.000001,
+            'data': ethernet.__bytes__()
+        }])
+        output_file = remove_data_file()
+        pcap2ammo.pcap2ammo({
+            'input': filename,
+            'output': output_file,
+            'stats_only': False,
+            'add_header': ['Referer: http://domain.com/'],
+            'delete_header': [],
+            'filter': None,
+        })
+        expected = (http_request[:-2] + u"Referer: http://domain.com/" +
+                    u"\r\n\r\n").encode('utf-8')
+        with open(output_file, 'rb') as file_handler:
+            assert file_handler.read() == \
+                b"%d \n" % len(expected) + expected, "unexpected ammo"
+
+    @pytest.mark.positive
+    def test_pcap2ammo_count_only(
+        self,
+        prepare_data_file,
+        capsys
+    ):
+        """Check count-only flag handled correctly"""
+
+        filename = prepare_data_file(self.set_count_data())
+        assert pcap2ammo.pcap2ammo({
+            'input': filename,
+            'output': False,
+            'stats_only': False,
+            'count_only': True,
+            'filter': None,
+            'http_filter': None
+        }) == 0, "unexpected exit code"
+        captured = capsys.readouterr()
+        assert captured.out == \
+            "Counts:\n\tpackets: 3\n\tflows: 2\n\trequests: 2\n", \
+            "unexpected output"
+
+    @pytest.mark.positive
+    def test_count_pcap_pcapng(self, remove_data_file):
+        """Check counting of pcapng file"""
+
+        filename = remove_data_file()
+        with open(filename, "wb") as file_handler:
+            writer = dpkt.pcapng.Writer(file_handler)
+            for packet in self.set_count_data():
+                writer.writepkt(packet['data'], packet['timestamp'])
+        assert pcap2ammo.count_pcap(filename) == \
+            {'packets': 3, 'flows': 2, 'requests': 2}, "unexpected counts"
+
+    @pytest.mark.positive
+    def test_pcap2ammo_profile_traffic(
+        self,
+        prepare_data_file,
+        remove_data_file,
+        capsys
+    ):
+        """Check profile-traffic flag with saved profile merged"""
+
+        filename = prepare_data_file(self.set_count_data())
+        profile_file = remove_data_file()
+        args = {
+            'input': filename,
+            'output': False,
+            'stats_only': False,
+            'profile_traffic': True,
+            'top': 1,
+            'save_profile': profile_file,
+            'filter': None,
+            'http_filter': None
+        }
+        assert pcap2ammo.pcap2ammo(dict(args)) == 0, "unexpected exit code"
+        capsys.readouterr()
+        args['save_profile'] = None
+        args['merge_profile'] = [profile_file]
+        assert pcap2ammo.pcap2ammo(args) == 0, "unexpected exit code"
+        captured = capsys.readouterr()
+        assert captured.out == (
+            "Profile:\n\trequests: 4\n\tdistinct client: 1\n"
+            "\tdistinct uri: 1\n\ttop uri:\n\t\t4\thttps://rambler.ru/\n"
+            "\ttop host:\n\t\t4\trambler.ru\n\ttop method:\n\t\t4\tGET\n"
+            "\ttop user_agent:\n"), "unexpected output"
+
+    @pytest.mark.negative
+    def test_pcap2ammo_count_only_filter(
+        self,
+        prepare_data_file,
+        capsys
+    ):
+        """Check count-only flag with filter"""
+
+        filename = prepare_data_file(self.set_count_data())
+        assert pcap2ammo.pcap2ammo({
+            'input': filename,
+            'output': False,
+            'stats_only': False,
+            'count_only': True,
+            'filter': 'tcp.dport == 80',
+            'http_filter': None
+        }) == 1, "unexpected exit code"
+        captured = capsys.readouterr()
+        assert captured.err == \
+            "Error: Filters can't be used with --count-only\n", \
+            "unexpected output"
+
     @pytest.mark.negative
     def test_pcap2ammo_empty_input_file(
         self,
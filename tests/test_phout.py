@@ -9,6 +9,7 @@
 
 import os
 import dateutil
+import threading
 import pytest
 import tempfile
 from tanktools import phout
@@ -271,6 +272,93 @@ class TestPhout(object):
                 ValueError, match=r'Incorrect fields count in line 11'):
             phout.parse_phout(filename)
 
+    @pytest.mark.positive
+    def test_parse_phout_small_read_buffer(
+            self, prepare_data_file, monkeypatch):
+        """Check that lines split between read blocks are parsed the same"""
+
+        expected = phout.parse_phout(prepare_data_file)
+        for buffer_size in [1, 7, 64]:
+            monkeypatch.setattr(phout, 'READ_BUFFER_SIZE', buffer_size)
+            result = phout.parse_phout(prepare_data_file)
+            assert result.equals(expected), "unexpected result"
+
+    def record_threads(self, monkeypatch):
+        """Record threads started by phout"""
+
+        started = []
+        base = threading.Thread
+
+        class Thread(base):
+            def start(self):
+                started.append(self)
+                base.start(self)
+
+        monkeypatch.setattr(phout.threading, 'Thread', Thread)
+        return started
+
+    @pytest.mark.positive
+    def test_parse_phout_read_ahead(self, monkeypatch, prepare_data_file):
+        """Check that blocks read in background thread are parsed the same"""
+
+        started = self.record_threads(monkeypatch)
+        expected = phout.parse_phout(prepare_data_file)
+        for buffers in [1, 3]:
+            result = phout.parse_phout(
+                prepare_data_file, buffer_size=16, read_ahead=buffers)
+            assert result.equals(expected), "unexpected result"
+        result = phout.parse_phout(
+            prepare_data_file, {'limit': 2}, buffer_size=16, read_ahead=1)
+        assert result.equals(expected.iloc[:2]), "unexpected limited result"
+        assert len(started) == 3, "unexpected reading threads count"
+        assert not any(thread.is_alive() for thread in started), \
+            "reading thread is not stopped"
+
+    @pytest.mark.negative
+    def test_parse_phout_read_ahead_error(self, monkeypatch,
+                                          prepare_data_file):
+        """Check that any reading thread error is raised by parser"""
+
+        started = self.record_threads(monkeypatch)
+
+        def read_blocks(file_handler, buffer_size):
+            yield file_handler.read(buffer_size)
+            raise RuntimeError("Broken reader")
+
+        monkeypatch.setattr(phout, '_read_blocks', read_blocks)
+        with pytest.raises(RuntimeError, match='Broken reader'):
+            phout.parse_phout(
+                prepare_data_file, buffer_size=16, read_ahead=1)
+        assert not any(thread.is_alive() for thread in started), \
+            "reading thread is not stopped"
+
+    @pytest.mark.positive
+    def test_parse_phout_irregular_numbers(self, remove_data_file):
+        """Check that numbers uncommon for phout are parsed by Python"""
+
+        filename = remove_data_file()
+        data = self.set_phout_data()[:2]
+        data[0] = data[0].replace("1516295382.983", "1.516295382983e9")
+        data[1] = data[1].replace("\t0\t200", "\t+1\t-2")
+        self.set_phout_file(filename, data)
+        result = phout.parse_phout(filename)
+        assert result['time'].tolist() == [1516295382.983, 1516295383.127], \
+            "unexpected time"
+        assert result['net_code'].tolist() == [0, 1], "unexpected net_code"
+        assert result['proto_code'].tolist() == [200, -2], \
+            "unexpected proto_code"
+
+    @pytest.mark.negative
+    def test_parse_phout_wrong_line_after_limit(self, remove_data_file):
+        """Check that lines after stop criteria are not checked"""
+
+        filename = remove_data_file()
+        data = self.set_phout_data()
+        data.append("a\tb")
+        self.set_phout_file(filename, data)
+        result = phout.parse_phout(filename, {'limit': 10})
+        assert result.shape[0] == 10, "unexpected rows count"
+
     @pytest.mark.positive
     @pytest.mark.skip(reason="format is not checked in parse_phout")
     def test_parse_phout_incorrect_fields_format(self, remove_data_file):
@@ -581,3 +669,601 @@ Percentiles for 10 requests
         out, err = capsys.readouterr()
         assert out == expected_output, "unexpected output text"
         assert err == "", "error is absent"
+
+    @pytest.mark.positive
+    def test_log_bucket_edges_check_structure(self):
+        """Check that log_bucket_edges returns exact small buckets
+        and sub_buckets per power of two range
+        """
+
+        edges = phout.log_bucket_edges(64, 4)
+        assert edges.tolist() == [
+            0, 1, 2, 3, 4, 5, 6, 7, 8, 10, 12, 14,
+            16, 20, 24, 28, 32, 40, 48, 56, 64
+        ], "unexpected edges"
+
+    @pytest.mark.negative
+    def test_log_bucket_edges_wrong_sub_buckets(self):
+        """Check that sub_buckets should be a power of two"""
+
+        with pytest.raises(ValueError, match=r'should be a power of two'):
+            phout.log_bucket_edges(64, 3)
+
+    @pytest.mark.positive
+    def test_make_rollup_check_buckets(self, prepare_data_file):
+        """Check that make_rollup aggregates requests per second"""
+
+        data_frame = phout.parse_phout(prepare_data_file)
+        rollup = phout.make_rollup(data_frame)
+        assert rollup['time'].tolist() == [
+            1516295382.0, 1516295383.0], "unexpected buckets"
+        assert rollup['count'].tolist() == [1, 9], "unexpected counts"
+        assert rollup['sum_latency'].tolist() == [
+            5785, 45292], "unexpected sums"
+        assert rollup['min_latency'].tolist() == [
+            5785, 4500], "unexpected min values"
+        assert rollup['max_latency'].tolist() == [
+            5785, 5740], "unexpected max values"
+        assert rollup['code'].tolist() == [200, 200], "unexpected codes"
+        assert rollup['code_count'].tolist() == [1, 9], \
+            "unexpected codes count"
+
+    @pytest.mark.positive
+    def test_get_rollup_quantiles_check_precision(self, prepare_data_file):
+        """Check that rollup quantiles are close to exact quantiles"""
+
+        data_frame = phout.parse_phout(prepare_data_file)
+        rollup = phout.make_rollup(data_frame)
+        quantiles = phout.get_rollup_quantiles(rollup, 'latency')
+        exact = phout.get_quantiles(data_frame, 'latency')
+        assert quantiles['quantile'].tolist() == \
+            exact['quantile'].tolist(), "unexpected quantile list"
+        for value, expected in zip(quantiles['latency'], exact['latency']):
+            assert abs(value - expected) <= expected / 16.0 + 1, \
+                "unexpected quantile precision"
+        assert quantiles['latency'].iloc[-1] == 5785, \
+            "maximum should be exact"
+
+    @pytest.mark.negative
+    def test_get_rollup_quantiles_unknown_field(self, prepare_data_file):
+        """Check that only histogram fields are supported"""
+
+        rollup = phout.make_rollup(phout.parse_phout(prepare_data_file))
+        with pytest.raises(ValueError, match=r'is not kept in rollup'):
+            phout.get_rollup_quantiles(rollup, 'size_in')
+
+    @pytest.mark.positive
+    def test_merge_rollups_equals_whole_rollup(self, prepare_data_file):
+        """Check that merged rollups of parts equal to rollup of all data"""
+
+        data_frame = phout.parse_phout(prepare_data_file)
+        whole = phout.make_rollup(data_frame)
+        merged = phout.merge_rollups([
+            phout.make_rollup(phout.subset(data_frame, 0, 4)),
+            phout.make_rollup(phout.subset(data_frame, 4, 10)),
+        ])
+        for key in whole:
+            assert str(whole[key]) == str(merged[key]), \
+                "unexpected merged %s" % key
+
+    @pytest.mark.negative
+    def test_merge_rollups_different_period(self, prepare_data_file):
+        """Check that rollups with different periods can't be merged"""
+
+        data_frame = phout.parse_phout(prepare_data_file)
+        with pytest.raises(ValueError, match=r"can't be merged"):
+            phout.merge_rollups([
+                phout.make_rollup(data_frame, 1),
+                phout.make_rollup(data_frame, 60),
+            ])
+
+    @pytest.mark.positive
+    def test_write_rollup_read_rollup(
+            self, prepare_data_file, remove_data_file):
+        """Check that rollup is read back as it was written,
+        rollup answers like original data
+        """
+
+        data_frame = phout.parse_phout(prepare_data_file)
+        rollup = phout.make_rollup(data_frame)
+        filename = remove_data_file()
+        phout.write_rollup(rollup, filename)
+        result = phout.read_rollup(filename)
+        assert sorted(result.keys()) == sorted(rollup.keys()), \
+            "unexpected keys"
+        assert phout.get_rollup_rps(result) == phout.get_rps(data_frame), \
+            "unexpected RPS"
+        assert phout.get_rollup_mean(result, 'size_in') == 389.9, \
+            "unexpected mean"
+        http_stats = phout.count_rollup_codes(result)
+        assert http_stats.values.tolist() == \
+            phout.count_uniq_by_field(data_frame, 'proto_code').values.tolist()
+
+    @pytest.mark.positive
+    def test_print_rollup_quantiles_check_header(
+            self, capsys, prepare_data_file):
+        """Check that print_rollup_quantiles prints the same header"""
+
+        rollup = phout.make_rollup(phout.parse_phout(prepare_data_file))
+        phout.print_rollup_quantiles(rollup, 'latency', [1.0])
+        out, err = capsys.readouterr()
+        assert out == u"""
+Percentiles for 10 requests
+     from 2018-01-18 20:09:42.983
+     to   2018-01-18 20:09:43.436:
+ quantile (%)  latency (mks)
+        100.0           5785
+""", "unexpected output text"
+
+    @pytest.mark.positive
+    def test_get_inflight_check_events_order(self, remove_data_file):
+        """Check that finishes go before starts at the same moment"""
+
+        data = [
+            "1516295383.0	#0	1000000	0	0	1000000	0	0	0	0	0	200",
+            "1516295384.0	#1	500000	0	0	500000	0	0	0	0	0	200",
+        ]
+        filename = remove_data_file()
+        self.set_phout_file(filename, data)
+        inflight = phout.get_inflight(phout.parse_phout(filename))
+        assert inflight['time'].values.tolist() == [
+            1516295383.0, 1516295384.0, 1516295384.0, 1516295384.5
+        ], "unexpected events"
+        assert inflight['concurrency'].values.tolist() == [1, 0, 1, 0], \
+            "unexpected concurrency"
+
+    @pytest.mark.positive
+    def test_get_concurrency_check_buckets(self, remove_data_file):
+        """Check that get_concurrency returns average and max
+        in-flight requests per bucket
+        """
+
+        data = [
+            "1516295383.0	#0	1500000	0	0	1500000	0	0	0	0	0	200",
+            "1516295383.5	#1	250000	0	0	250000	0	0	0	0	0	200",
+        ]
+        filename = remove_data_file()
+        self.set_phout_file(filename, data)
+        concurrency = phout.get_concurrency(phout.parse_phout(filename))
+        assert concurrency['time'].values.tolist() == [
+            1516295383.0, 1516295384.0], "unexpected buckets"
+        assert concurrency['concurrency'].values.tolist() == [1.25, 0.5], \
+            "unexpected average concurrency"
+        assert concurrency['max_concurrency'].values.tolist() == [2, 1], \
+            "unexpected max concurrency"
+
+    @pytest.mark.positive
+    def test_get_littles_law_check_result(self, prepare_data_file):
+        """Check that observed concurrency is close to expected one"""
+
+        data_frame = phout.parse_phout(prepare_data_file)
+        result = phout.get_littles_law(data_frame)
+        assert round(result['rps'], 2) == 22.08, "unexpected RPS"
+        assert result['interval_real'] == 5427.3, "unexpected interval"
+        assert round(result['expected'], 4) == 0.1198, \
+            "unexpected expected concurrency"
+        assert round(result['observed'], 4) == 0.1087, \
+            "unexpected observed concurrency"
+
+    @pytest.mark.positive
+    def test_get_quantiles_expected_interval(self, remove_data_file):
+        """Check that coordinated omission correction back-fills
+        requests missed during a stall
+        """
+
+        data = [
+            "1516295383.0	#0	10	0	0	10	0	0	0	0	0	200",
+            "1516295383.1	#1	10	0	0	10	0	0	0	0	0	200",
+            "1516295383.2	#2	10	0	0	10	0	0	0	0	0	200",
+            "1516295384.2	#3	1000	0	0	1000	0	0	0	0	0	200",
+        ]
+        filename = remove_data_file()
+        self.set_phout_file(filename, data)
+        data_frame = phout.parse_phout(filename)
+        quantiles = phout.get_quantiles(
+            data_frame, 'latency', [0.5, 0.75, 1.0], expected_interval=100)
+        assert quantiles.columns.tolist() == ['quantile', 'latency'], \
+            "unexpected columns"
+        # 1000 falls into [992, 1024) and back-fills 923, 823, ... 123
+        assert quantiles['latency'].tolist() == [431.0, 735.0, 1000.0], \
+            "unexpected corrected quantiles"
+        quantiles = phout.get_quantiles(
+            data_frame, 'latency', [0.5, 0.75, 1.0])
+        assert quantiles['latency'].tolist() == [10.0, 257.5, 1000.0], \
+            "unexpected quantiles"
+
+    @pytest.mark.negative
+    def test_get_quantiles_expected_interval_no_stalls(
+            self, prepare_data_file):
+        """Check that correction doesn't change values
+        below expected interval
+        """
+
+        data_frame = phout.parse_phout(prepare_data_file)
+        corrected = phout.get_rollup_quantiles(
+            phout.make_rollup(data_frame), 'latency', [0.5, 1.0],
+            expected_interval=1000000)
+        quantiles = phout.get_rollup_quantiles(
+            phout.make_rollup(data_frame), 'latency', [0.5, 1.0])
+        assert corrected.values.tolist() == quantiles.values.tolist(), \
+            "unexpected corrected quantiles"
+
+    @pytest.mark.positive
+    def test_get_histogram_check_buckets(self, prepare_data_file):
+        """Check histogram buckets and counts"""
+
+        data_frame = phout.parse_phout(prepare_data_file)
+        histogram = phout.get_histogram(data_frame)
+        assert histogram.columns.tolist() == \
+            ['from', 'to'] + phout.TIMING_FIELDS, "unexpected columns"
+        for field in phout.TIMING_FIELDS:
+            assert histogram[field].sum() == 10, "unexpected total count"
+        row = histogram[histogram['connect_time'] > 0].iloc[0]
+        assert (row['from'], row['to'], row['connect_time']) == \
+            (192, 200, 2), "unexpected bucket"
+        latency = phout.get_histogram(data_frame, ['latency'])
+        assert latency[['from', 'to', 'latency']].values.tolist() == \
+            [[4352, 4608, 3], [4608, 4864, 1], [4864, 5120, 1],
+             [5120, 5376, 2], [5376, 5632, 1], [5632, 5888, 2]], \
+            "unexpected latency histogram"
+
+    @pytest.mark.positive
+    def test_get_heatmap_check_cells(self, prepare_data_file):
+        """Check heatmap cells"""
+
+        data_frame = phout.parse_phout(prepare_data_file)
+        heatmap = phout.get_heatmap(data_frame, 'latency')
+        assert heatmap.columns.tolist() == ['time', 'from', 'to', 'count'], \
+            "unexpected columns"
+        assert heatmap['time'].unique().tolist() == \
+            [1516295382.0, 1516295383.0], "unexpected time buckets"
+        assert heatmap.groupby('time')['count'].sum().tolist() == [1, 9], \
+            "unexpected counts"
+        assert heatmap.iloc[0].tolist() == [1516295382.0, 5632, 5888, 1], \
+            "unexpected cell"
+        assert phout.get_heatmap(data_frame.iloc[:0]).shape[0] == 0, \
+            "unexpected empty heatmap"
+
+    @pytest.mark.positive
+    def test_merge_histograms_equals_whole(self, prepare_data_file):
+        """Check that merged chunks are equal to the whole data"""
+
+        data_frame = phout.parse_phout(prepare_data_file)
+        chunks = [data_frame.iloc[:4], data_frame.iloc[4:]]
+        assert phout.merge_histograms(
+            [phout.get_histogram(chunk) for chunk in chunks]
+        ).equals(phout.get_histogram(data_frame)), "unexpected histogram"
+        assert phout.merge_histograms(
+            [phout.get_heatmap(chunk, period=0.1) for chunk in chunks]
+        ).equals(phout.get_heatmap(data_frame, period=0.1)), \
+            "unexpected heatmap"
+
+    @pytest.mark.negative
+    def test_merge_histograms_different_edges(self, prepare_data_file):
+        """Check histograms with different edges"""
+
+        data_frame = phout.parse_phout(prepare_data_file)
+        histograms = [
+            phout.get_histogram(data_frame),
+            phout.get_histogram(
+                data_frame, edges=phout.log_bucket_edges(sub_buckets=4))
+        ]
+        with pytest.raises(ValueError, match="can't be merged"):
+            phout.merge_histograms(histograms)
+        with pytest.raises(ValueError, match="Nothing to merge"):
+            phout.merge_histograms([])
+
+    @pytest.mark.positive
+    def test_downsample_timeline_lttb(self, prepare_data_file):
+        """Check points selected by LTTB"""
+
+        data_frame = phout.parse_phout(prepare_data_file)
+        timeline = phout.downsample_timeline(data_frame, 'latency', 4)
+        assert timeline.columns.tolist() == ['time', 'latency'], \
+            "unexpected columns"
+        assert timeline['latency'].tolist() == [5785, 5740, 4555, 4750], \
+            "unexpected points"
+        assert timeline['time'].tolist() == [
+            1516295382.983, 1516295383.282, 1516295383.316,
+            1516295383.436], "unexpected times"
+        assert phout.downsample_timeline(data_frame, points=20).shape[0] == \
+            10, "unexpected points count"
+
+    @pytest.mark.positive
+    def test_downsample_timeline_minmax(self, prepare_data_file):
+        """Check minimum and maximum of every bucket"""
+
+        data_frame = phout.parse_phout(prepare_data_file)
+        timeline = phout.downsample_timeline(
+            data_frame, 'latency', 4, 'minmax')
+        assert timeline['latency'].tolist() == [5785, 5191, 5079, 4500], \
+            "unexpected points"
+
+    @pytest.mark.negative
+    def test_downsample_timeline_unknown_method(self, prepare_data_file):
+        """Check unknown downsampling method"""
+
+        data_frame = phout.parse_phout(prepare_data_file)
+        with pytest.raises(ValueError, match='Unknown method'):
+            phout.downsample_timeline(data_frame, method='random')
+
+    @pytest.mark.positive
+    def test_write_timeline_formats(self, prepare_data_file, remove_data_file):
+        """Check JSON and CSV output"""
+
+        data_frame = phout.parse_phout(prepare_data_file)
+        timeline = phout.downsample_timeline(data_frame, 'latency', 3)
+        filename = remove_data_file()
+        phout.write_timeline(timeline, filename, 'json')
+        with open(filename) as file_handler:
+            assert file_handler.read() == \
+                '{"time":[1516295382.983,1516295383.282,1516295383.436],' \
+                '"latency":[5785,5740,4750]}', "unexpected JSON"
+        phout.write_timeline(timeline, filename)
+        with open(filename) as file_handler:
+            assert file_handler.read().splitlines() == [
+                'time,latency', '1516295382.983,5785',
+                '1516295383.282,5740', '1516295383.436,4750'], \
+                "unexpected CSV"
+
+    @pytest.mark.positive
+    def test_get_rolling_quantiles_check_windows(self, remove_data_file):
+        """Check that get_rolling_quantiles counts quantiles
+        for each window
+        """
+
+        data = [
+            "1516295383.0	#0	10	0	0	10	0	0	0	0	0	200",
+            "1516295383.5	#1	20	0	0	20	0	0	0	0	0	200",
+            "1516295384.0	#2	30	0	0	30	0	0	0	0	0	200",
+            "1516295386.0	#3	40	0	0	40	0	0	0	0	0	200",
+        ]
+        filename = remove_data_file()
+        self.set_phout_file(filename, data)
+        rolling = phout.get_rolling_quantiles(
+            phout.parse_phout(filename), 'latency', 2, 1, [0.5, 1.0])
+        assert rolling.columns.tolist() == ['time', 'count', 0.5, 1.0], \
+            "unexpected columns"
+        assert rolling['time'].tolist() == [
+            1516295383.0, 1516295384.0, 1516295385.0], "unexpected windows"
+        assert rolling['count'].tolist() == [3, 1, 1], "unexpected counts"
+        assert rolling[0.5].tolist() == [20.0, 30.0, 40.0], \
+            "unexpected medians"
+        assert rolling[1.0].tolist() == [30.0, 30.0, 40.0], \
+            "unexpected maximums"
+
+    @pytest.mark.negative
+    def test_get_rolling_quantiles_window_longer_than_data(
+            self, prepare_data_file):
+        """Check that the only window is returned for short runs"""
+
+        data_frame = phout.parse_phout(prepare_data_file)
+        rolling = phout.get_rolling_quantiles(
+            data_frame, 'latency', 60, 1, [1.0])
+        assert rolling['count'].tolist() == [10], "unexpected counts"
+        assert rolling[1.0].tolist() == [5785.0], "unexpected maximums"
+
+    @pytest.mark.negative
+    def test_get_rolling_quantiles_wrong_window(self, prepare_data_file):
+        """Check that window should be a multiple of step"""
+
+        data_frame = phout.parse_phout(prepare_data_file)
+        with pytest.raises(ValueError, match=r'multiple of step'):
+            phout.get_rolling_quantiles(data_frame, 'latency', 2.5, 1)
+
+    def set_load_data(self, rates):
+        """Prepare phout lines with specified requests count per second"""
+
+        data = []
+        for second, rate in enumerate(rates):
+            for index in range(rate):
+                data.append(
+                    "%.3f	#0	%d	0	0	1000	0	0	0	0	0	200" %
+                    (1516295383 + second + float(index) / rate,
+                     1000 + index % 10)
+                )
+        return data
+
+    @pytest.mark.positive
+    def test_get_steady_segments_check_result(self, remove_data_file):
+        """Check that ramp-up, step and cool-down are skipped"""
+
+        rates = [5, 10, 15] + [20] * 15 + [40] * 15 + [5]
+        filename = remove_data_file()
+        self.set_phout_file(filename, self.set_load_data(rates))
+        data_frame = phout.parse_phout(filename)
+        segments = phout.get_steady_segments(
+            data_frame, window=3, min_duration=5)
+        assert segments['from_date'].tolist() == [
+            1516295388.0, 1516295404.0], "unexpected segment starts"
+        assert segments['to_date'].tolist() == [
+            1516295399.0, 1516295414.0], "unexpected segment ends"
+        assert segments['count'].tolist() == [220, 400], "unexpected counts"
+        assert segments['rps'].tolist() == [20.0, 40.0], "unexpected RPS"
+
+        selected = phout.select_segments(data_frame, segments)
+        assert phout.size(selected) == 620, "unexpected rows count"
+        assert selected['time'].iloc[0] == 1516295388.0, \
+            "unexpected the first element value"
+
+    @pytest.mark.positive
+    def test_get_segments_rps_skips_gaps(self, remove_data_file):
+        """Check that gaps between segments are not counted as load time"""
+
+        rates = [5, 10, 15] + [20] * 15 + [40] * 15 + [5]
+        filename = remove_data_file()
+        self.set_phout_file(filename, self.set_load_data(rates))
+        data_frame = phout.parse_phout(filename)
+        segments = phout.get_steady_segments(
+            data_frame, window=3, min_duration=5)
+        selected = phout.select_segments(data_frame, segments)
+        first = phout.subset(selected, 0, 220)
+        assert phout.get_segments_rps(first, segments) == \
+            pytest.approx(20, rel=0.01), "unexpected the first segment RPS"
+        last = phout.subset(selected, 220, 400)
+        assert phout.get_segments_rps(last, segments) == \
+            pytest.approx(40, rel=0.01), "unexpected the last segment RPS"
+        both = phout.subset(selected, 200, 40)
+        assert phout.get_segments_rps(both, segments) == \
+            pytest.approx(40.0 / 1.5, rel=0.05), "gap is counted as load"
+
+    @pytest.mark.negative
+    def test_get_steady_segments_too_short_run(self, prepare_data_file):
+        """Check that segments shorter than min_duration are skipped"""
+
+        data_frame = phout.parse_phout(prepare_data_file)
+        segments = phout.get_steady_segments(data_frame)
+        assert segments.shape[0] == 0, "unexpected segments"
+        assert phout.size(phout.select_segments(data_frame, segments)) == 0
+
+    @pytest.mark.positive
+    def test_get_quantiles_keeps_data_frame(self, prepare_data_file):
+        """Check that get_quantiles doesn't modify caller's column"""
+
+        data_frame = phout.parse_phout(prepare_data_file)
+        data_frame['latency'] = data_frame['latency'].astype(float)
+        phout.get_quantiles(data_frame, 'latency')
+        assert data_frame['latency'].dtype == float, "column is modified"
+
+    @pytest.mark.positive
+    def test_phout_run_equals_module_functions(self, prepare_data_file):
+        """Check that PhoutRun returns the same statistics"""
+
+        data_frame = phout.parse_phout(prepare_data_file)
+        run = phout.PhoutRun(data_frame)
+        for field in ['latency', 'receive_time', 'interval_real']:
+            assert run.get_quantiles(field).values.tolist() == \
+                phout.get_quantiles(data_frame, field).values.tolist(), \
+                "unexpected quantiles"
+        assert run.get_rps() == phout.get_rps(data_frame), "unexpected RPS"
+        assert run.median('latency') == data_frame.latency.median(), \
+            "unexpected median"
+        assert run.count_uniq_by_field('proto_code').values.tolist() == \
+            phout.count_uniq_by_field(data_frame, 'proto_code') \
+            .values.tolist(), "unexpected counts"
+        assert run.get_medians_by_field('latency', 'proto_code')[200] == \
+            5135, "unexpected median by code"
+
+    @pytest.mark.positive
+    def test_phout_run_print_functions(self, capsys, prepare_data_file):
+        """Check that PhoutRun prints the same output"""
+
+        data_frame = phout.parse_phout(prepare_data_file)
+        run = phout.PhoutRun.from_file(prepare_data_file)
+        phout.print_quantiles(data_frame, 'latency')
+        phout.print_http_reponses(data_frame)
+        expected, _ = capsys.readouterr()
+        run.print_quantiles('latency')
+        run.print_http_reponses()
+        out, err = capsys.readouterr()
+        assert out == expected, "unexpected output text"
+        phout.print_http_reponses(data_frame)
+        expected, _ = capsys.readouterr()
+        run.print_http_reponses()
+        out, err = capsys.readouterr()
+        assert out == expected, "cached counts should not be modified"
+
+    @pytest.mark.positive
+    def test_phout_run_eviction_and_invalidation(self, prepare_data_file):
+        """Check that only max_cached_fields sorted arrays are kept
+        and invalidate drops cached values
+        """
+
+        run = phout.PhoutRun(phout.parse_phout(prepare_data_file), 2)
+        sorted_latency = run.sorted_values('latency')
+        assert run.sorted_values('latency') is sorted_latency, \
+            "values should be cached"
+        run.sorted_values('receive_time')
+        run.sorted_values('latency')
+        run.sorted_values('send_time')
+        assert list(run._sorted.keys()) == ['latency', 'send_time'], \
+            "the least recently used field should be evicted"
+
+        assert run.from_date == 1516295382.983, "unexpected from_date"
+        run.data_frame = phout.subset(run.data_frame, 5, 5)
+        run.invalidate('time')
+        assert run.from_date == 1516295383.316, "time bounds should be reset"
+        assert 'latency' in run._sorted, "other fields should be kept"
+        run.invalidate()
+        assert not run._sorted, "all values should be dropped"
+        assert run.size == 5, "unexpected size"
+
+    @pytest.mark.positive
+    def test_to_arrow_check_schema(self, prepare_data_file):
+        """Check that tag is dictionary-encoded
+        and other fields are fixed-width
+        """
+
+        pyarrow = pytest.importorskip('pyarrow')
+        table = phout.to_arrow(phout.parse_phout(prepare_data_file))
+        assert table.num_rows == 10, "unexpected rows count"
+        assert table.schema.names == phout.PHOUT_FIELDS, \
+            "unexpected columns"
+        assert pyarrow.types.is_dictionary(table.schema.field('tag').type), \
+            "tag should be dictionary-encoded"
+        assert table.column('latency').to_pylist()[0] == 5785, \
+            "unexpected the first element value"
+        assert table.column('proto_code').type == pyarrow.int32(), \
+            "unexpected proto_code type"
+
+    @pytest.mark.positive
+    def test_iter_arrow_batches_check_batch_size(self, prepare_data_file):
+        """Check that data is split into batches of specified size"""
+
+        pytest.importorskip('pyarrow')
+        batches = list(phout.iter_arrow_batches(
+            phout.parse_phout(prepare_data_file), 4))
+        assert [batch.num_rows for batch in batches] == [4, 4, 2], \
+            "unexpected batches"
+
+    @pytest.mark.positive
+    def test_write_arrow_read_arrow(self, prepare_data_file, remove_data_file):
+        """Check that Arrow stream is read back as it was written"""
+
+        pytest.importorskip('pyarrow')
+        data_frame = phout.parse_phout(prepare_data_file)
+        filename = remove_data_file()
+        phout.write_arrow(data_frame, filename, 3)
+        result = phout.read_arrow(filename)
+        assert result.dtypes.tolist() == data_frame.dtypes.tolist(), \
+            "unexpected types"
+        assert result.values.tolist() == data_frame.values.tolist(), \
+            "unexpected values"
+
+    @pytest.mark.positive
+    def test_parse_phout_polars_equals_pandas(self, prepare_data_file):
+        """Check that polars backend parses the same values"""
+
+        pytest.importorskip('polars')
+        data_frame = phout.parse_phout(prepare_data_file)
+        result = phout.parse_phout(prepare_data_file, backend='polars')
+        assert result.columns == phout.PHOUT_FIELDS, "unexpected columns"
+        assert result.to_pandas().values.tolist() == \
+            data_frame.values.tolist(), "unexpected values"
+
+    @pytest.mark.positive
+    def test_polars_backend_statistics(self, prepare_data_file):
+        """Check that statistics are the same for both backends"""
+
+        pytest.importorskip('polars')
+        data_frame = phout.parse_phout(prepare_data_file)
+        result = phout.parse_phout(prepare_data_file, backend='polars')
+        assert phout.get_quantiles(result, 'latency').equals(
+            phout.get_quantiles(data_frame, 'latency')), \
+            "unexpected quantiles"
+        assert phout.count_uniq_by_field(result, 'proto_code').equals(
+            phout.count_uniq_by_field(data_frame, 'proto_code')), \
+            "unexpected codes"
+        assert phout.get_rps(phout.subset(result, 2, 5)) == \
+            phout.get_rps(phout.subset(data_frame, 2, 5)), "unexpected rps"
+        run = phout.PhoutRun(result)
+        assert run.get_medians_by_field('latency', 'proto_code').to_dict() == \
+            data_frame.groupby('proto_code')['latency'].median().to_dict(), \
+            "unexpected medians"
+
+    @pytest.mark.negative
+    def test_parse_phout_unknown_backend(self, prepare_data_file):
+        """Check unknown backend"""
+
+        with pytest.raises(ValueError, match='Unknown backend'):
+            phout.parse_phout(prepare_data_file, backend='spark')
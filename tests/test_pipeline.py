@@ -0,0 +1,135 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2018 Alexander Grechin
+#
+# Licensed under the BSD 3-Clause license.
+# See LICENSE file in the project root for full license information.
+#
+
+import threading
+import time
+import pytest
+from tanktools import pipeline
+
+
+class TestPipeline(object):
+
+    def slow_square(self, value):
+        """Square value, odd values are transformed slower"""
+
+        if value % 2:
+            time.sleep(0.001)
+        return value * value
+
+    @pytest.mark.positive
+    def test_run_pipeline_keep_order(self):
+        """Check that results are written in items order"""
+
+        for workers in [0, 1, 4]:
+            results = []
+            written = pipeline.run_pipeline(
+                range(200), self.slow_square, results.append, workers,
+                queue_size=8)
+            assert written == 200, "unexpected written count"
+            assert results == [value * value for value in range(200)], \
+                "unexpected results"
+
+    @pytest.mark.positive
+    def test_run_pipeline_unordered(self):
+        """Check that unordered pipeline writes every result"""
+
+        results = []
+        pipeline.run_pipeline(
+            range(200), self.slow_square, results.append, 4,
+            queue_size=8, keep_order=False)
+        assert sorted(results) == [value * value for value in range(200)], \
+            "unexpected results"
+
+    @pytest.mark.positive
+    def test_run_pipeline_skip_none(self):
+        """Check that None results are not written"""
+
+        results = []
+        written = pipeline.run_pipeline(
+            range(10), lambda value: value if value % 3 else None,
+            results.append, 2)
+        assert written == 6, "unexpected written count"
+        assert results == [1, 2, 4, 5, 7, 8], "unexpected results"
+
+    @pytest.mark.positive
+    def test_run_pipeline_backpressure(self):
+        """Check that reader doesn't run ahead of bounded queues"""
+
+        read = []
+        blocked = threading.Event()
+
+        def items():
+            for value in range(1000):
+                read.append(value)
+                yield value
+
+        def write(result):
+            blocked.wait(1)
+
+        thread = threading.Thread(target=pipeline.run_pipeline, args=(
+            items(), self.slow_square, write, 2, 4))
+        thread.start()
+        time.sleep(0.2)
+        count = len(read)
+        blocked.set()
+        thread.join()
+        assert count < 20, "unexpected read ahead"
+        assert len(read) == 1000, "unexpected read count"
+
+    @pytest.mark.positive
+    def test_run_pipeline_slow_first_item(self):
+        """Check that results waiting for a slow item are bounded"""
+
+        read = []
+        released = threading.Event()
+
+        def items():
+            for value in range(1000):
+                read.append(value)
+                yield value
+
+        def transform(value):
+            if value == 0:
+                released.wait(1)
+            return value
+
+        results = []
+        thread = threading.Thread(target=pipeline.run_pipeline, args=(
+            items(), transform, results.append, 2, 4))
+        thread.start()
+        time.sleep(0.2)
+        count = len(read)
+        released.set()
+        thread.join()
+        assert count <= 5, "unexpected read ahead"
+        assert results == list(range(1000)), "unexpected results"
+
+    @pytest.mark.negative
+    def test_run_pipeline_transform_error(self):
+        """Check that transform error stops pipeline and is raised"""
+
+        def transform(value):
+            if value == 50:
+                raise ValueError("Wrong value")
+            return value
+
+        with pytest.raises(ValueError, match='Wrong value'):
+            pipeline.run_pipeline(range(10000), transform, [].append, 3, 4)
+
+    @pytest.mark.negative
+    def test_run_pipeline_reader_error(self):
+        """Check that reader error is raised"""
+
+        def items():
+            yield 1
+            raise ValueError("Broken input")
+
+        results = []
+        with pytest.raises(ValueError, match='Broken input'):
+            pipeline.run_pipeline(items(), abs, results.append, 2)
@@ -0,0 +1,167 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2018 Alexander Grechin
+#
+# Licensed under the BSD 3-Clause license.
+# See LICENSE file in the project root for full license information.
+#
+
+import os
+import mock
+import numpy as np
+import pandas as pd
+import pytest
+import tempfile
+from tanktools import phout
+from tanktools import report
+
+
+class TestReport(object):
+
+    def set_phout_data(self, count=3000):
+        """Prepare data in phout format, 100 requests per second"""
+
+        random = np.random.RandomState(0)
+        timings = random.lognormal(8, 0.4, count).astype(int)
+        template = "%.3f\t#0\t%d\t281\t94\t%d\t41\t5991\t26697\t391\t%d\t%d"
+        return [
+            template % (1516295382 + index * 0.01, timing + 400, timing,
+                        110 if index % 100 == 0 else 0,
+                        500 if index % 10 == 0 else 200)
+            for index, timing in enumerate(timings)
+        ]
+
+    @pytest.fixture()
+    def prepare_data_file(self):
+        """Prepare data file decorator"""
+
+        filename = tempfile.NamedTemporaryFile(delete=False).name
+        with open(filename, "w") as file_handler:
+            file_handler.write("\n".join(self.set_phout_data()))
+        yield filename
+        os.remove(filename)
+
+    @pytest.fixture()
+    def output_file(self):
+        """Prepare output file name and remove it after test"""
+
+        filename = tempfile.NamedTemporaryFile(delete=False).name
+        yield filename
+        os.remove(filename)
+
+    @pytest.mark.positive
+    def test_bucket_quantiles_nearest_rank(self, prepare_data_file):
+        """Check per bucket quantiles against nearest-rank ones"""
+
+        data = phout.parse_phout(prepare_data_file)
+        rollup = phout.make_rollup(data, 1)
+        result = report._bucket_quantiles(rollup, 'latency', [0.5, 0.99])
+        seconds = np.floor(data['time'].values).astype(int)
+        for index, second in enumerate(np.unique(seconds)):
+            values = np.sort(data['latency'].values[seconds == second])
+            for column, quantile in enumerate([0.5, 0.99]):
+                expected = values[int(np.ceil(quantile * len(values))) - 1]
+                assert expected <= result[index, column] <= \
+                    expected * 1.0625, "unexpected quantile"
+
+    @pytest.mark.positive
+    def test_downsample_keeps_points(self):
+        """Check that every column is downsampled separately"""
+
+        chart = pd.DataFrame({
+            'time': np.arange(100.0),
+            'first': np.sin(np.arange(100.0)),
+            'second': np.arange(100.0),
+        })
+        result = report._downsample(chart, 10)
+        assert result['first'].notnull().sum() == 10, \
+            "unexpected points count"
+        assert result['second'].notnull().sum() == 10, \
+            "unexpected points count"
+        assert result['time'].iloc[0] == 0 and \
+            result['time'].iloc[-1] == 99, "unexpected bounds"
+        assert report._downsample(chart, 100) is chart, \
+            "unexpected downsampling"
+
+    @pytest.mark.positive
+    def test_build_report_check_data(self, prepare_data_file):
+        """Check tables and charts of report"""
+
+        data = phout.parse_phout(prepare_data_file)
+        result = report.build_report(data, 'run', points=10)
+        assert result['count'] == 3000, "unexpected count"
+        assert result['quantiles']['latency'].tolist() == \
+            phout.get_quantiles(data, 'latency', report.REPORT_QUANTILES)[
+                'latency'].tolist(), "unexpected quantiles"
+        assert result['codes'].values.tolist() == \
+            [[200, 2700, 90.0], [500, 300, 10.0]], "unexpected codes"
+        assert result['net_codes']['count'].tolist() == [2970, 30], \
+            "unexpected net codes"
+        rps = result['charts']['RPS']
+        assert rps.shape[0] == 10, "unexpected points count"
+        assert (rps['rps'] == 100).all(), "unexpected RPS"
+        assert list(result['charts']['Response time (ms)'].columns) == [
+            'time', 'interval_real 50%', 'interval_real 95%',
+            'interval_real 99%', 'latency 50%', 'latency 95%',
+            'latency 99%'], "unexpected latency lines"
+
+    @pytest.mark.positive
+    def test_write_report_html(self, prepare_data_file, output_file):
+        """Check that report is a single page with inline charts"""
+
+        result = report.build_rollup_report(
+            phout.make_rollup(phout.parse_phout(prepare_data_file)),
+            '<run>')
+        report.write_report(result, output_file)
+        with open(output_file) as file_handler:
+            html = file_handler.read()
+        assert html.startswith('<!DOCTYPE html>'), "unexpected header"
+        assert '<h1>&lt;run&gt;</h1>' in html, "unexpected title"
+        assert html.count('<svg ') == 3, "unexpected charts count"
+        assert '<script' not in html and 'http://' not in \
+            html.replace('http://www.w3.org/2000/svg', ''), \
+            "unexpected external resource"
+        assert '<td>500</td><td>300</td><td>10.00</td>' in html, \
+            "unexpected codes table"
+
+    @pytest.mark.negative
+    def test_build_rollup_report_empty(self):
+        """Check report of run without requests"""
+
+        with pytest.raises(ValueError, match='Nothing to report'):
+            report.build_rollup_report(
+                phout.make_rollup(phout.parse_phout(os.devnull)))
+
+    @pytest.mark.positive
+    def test_report_main(self, prepare_data_file, output_file):
+        """Check report of phout and rollup files"""
+
+        with mock.patch.object(
+            report.sys, 'argv',
+            ['phout-report', '-o', output_file, prepare_data_file]
+        ):
+            report.main()
+        assert os.path.getsize(output_file) > 0, "unexpected report"
+        phout.write_rollup(
+            phout.make_rollup(phout.parse_phout(prepare_data_file)),
+            output_file)
+        with mock.patch.object(
+            report.sys, 'argv',
+            ['phout-report', '--rollup', '--title', 'rollup', '-o',
+             output_file, output_file]
+        ):
+            report.main()
+        with open(output_file) as file_handler:
+            assert '<h1>rollup</h1>' in file_handler.read(), \
+                "unexpected title"
+
+    @pytest.mark.positive
+    def test_report_init(self):
+        """Check init function works correctly"""
+
+        with mock.patch.object(report, "main", return_value=42):
+            with mock.patch.object(report, "__name__", "__main__"):
+                with mock.patch.object(report.sys, 'exit') as mock_exit:
+                    report.init()
+                    assert mock_exit.call_args[0][0] == 42
@@ -0,0 +1,114 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2018 Alexander Grechin
+#
+# Licensed under the BSD 3-Clause license.
+# See LICENSE file in the project root for full license information.
+#
+
+import os
+import pytest
+import tempfile
+from tanktools import routes
+
+
+class TestRoutes(object):
+
+    RULES = (
+        "# method  pattern  tag\n"
+        "\n"
+        "GET   /api/users/me       me\n"
+        "GET   /api/users          users\n"
+        "POST  ~/api/orders/\\d+$  order_update\n"
+        "*     ~/api/(orders|carts)  cart\n"
+        "*     /api                api\n"
+        "*     /                   other\n"
+    )
+
+    @pytest.fixture()
+    def prepare_rules_file(self):
+        """Prepare rules file"""
+
+        filename = tempfile.NamedTemporaryFile(delete=False).name
+
+        def _write(data):
+            with open(filename, 'w') as file_handler:
+                file_handler.write(data)
+            return filename
+
+        yield _write
+        os.remove(filename)
+
+    @pytest.mark.positive
+    def test_read_routes(self, prepare_rules_file):
+        """Check rules read from file"""
+
+        rules = routes.read_routes(prepare_rules_file(self.RULES))
+        assert len(rules) == 6, "unexpected rules count"
+        assert rules[2] == ('POST', '~/api/orders/\\d+$', 'order_update'), \
+            "unexpected regex rule"
+
+    @pytest.mark.positive
+    def test_classify_first_match(self, prepare_rules_file):
+        """Check that the first matching rule wins"""
+
+        classifier = routes.RouteClassifier(
+            routes.read_routes(prepare_rules_file(self.RULES)))
+        expected = [
+            ('GET', '/api/users/me', 'me'),
+            ('GET', '/api/users/5?full=1', 'users'),
+            ('GET', 'https://rambler.ru/api/users', 'users'),
+            ('GET', '/api/usersearch', 'api'),
+            ('POST', '/api/users', 'api'),
+            ('POST', '/api/orders/12', 'order_update'),
+            ('PUT', '/api/orders/12', 'cart'),
+            ('GET', '/api/carts', 'cart'),
+            ('GET', '/news', 'other'),
+        ]
+        for method, uri, tag in expected * 2:
+            assert classifier.classify(method, uri) == tag, \
+                "unexpected tag of %s %s" % (method, uri)
+
+    @pytest.mark.positive
+    def test_classify_default(self):
+        """Check tag of request without matching rule"""
+
+        classifier = routes.RouteClassifier(
+            [('GET', '/api', 'api')], default='unknown')
+        assert classifier.classify('GET', '/') == 'unknown', \
+            "unexpected default tag"
+        assert routes.RouteClassifier([]).classify('GET', '/') == '', \
+            "unexpected tag without rules"
+
+    @pytest.mark.positive
+    def test_classify_regex_groups(self):
+        """Check backreferences and repeated group names of regex rules"""
+
+        classifier = routes.RouteClassifier([
+            ('GET', '~/(?P<id>[0-9]+)/edit$', 'edit'),
+            ('*', '~/v[0-9]+/static', 'static'),
+            ('GET', '~/([a-z]+)/\\1$', 'twice'),
+            ('GET', '~/(?P<id>[a-z]+)/(?P=id)/x$', 'named_twice'),
+            ('*', '~/', 'other'),
+        ])
+        expected = [
+            ('GET', '/5/edit', 'edit'),
+            ('GET', '/v1/static/app.js', 'static'),
+            ('GET', '/abc/abc', 'twice'),
+            ('GET', '/abc/abd', 'other'),
+            ('GET', '/ab/ab/x', 'named_twice'),
+            ('POST', '/5/edit', 'other'),
+        ]
+        for method, uri, tag in expected:
+            assert classifier.classify(method, uri) == tag, \
+                "unexpected tag of %s %s" % (method, uri)
+
+    @pytest.mark.negative
+    def test_wrong_routes(self, prepare_rules_file):
+        """Check wrong rules"""
+
+        with pytest.raises(ValueError, match='Wrong route at line 2'):
+            routes.read_routes(prepare_rules_file("GET / root\nGET /api\n"))
+        with pytest.raises(ValueError, match='Wrong route regex'):
+            routes.RouteClassifier([('GET', '~/api/(', 'api')])
@@ -0,0 +1,116 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2018 Alexander Grechin
+#
+# Licensed under the BSD 3-Clause license.
+# See LICENSE file in the project root for full license information.
+#
+
+import random
+from collections import Counter
+import pytest
+from pcaper.HTTPRequest import HTTPRequest
+from tanktools import sampling
+
+
+class TestSampling(object):
+
+    def set_requests(self, count=1000):
+        """Prepare HTTP requests, every fifth one is POST"""
+
+        requests = []
+        for index in range(count):
+            method = 'POST' if index % 5 == 0 else 'GET'
+            uri = '/api/v%d/item?id=%d' % (index % 2, index)
+            requests.append(HTTPRequest({
+                'method': method, 'uri': uri,
+                'headers': {'host': 'host%d' % (index % 3)},
+                'origin': '%s %s HTTP/1.1\r\n\r\n' % (method, uri)
+            }))
+        return requests
+
+    @pytest.mark.positive
+    def test_hash_sample_stable(self):
+        """Check that hash sampling selects the same requests"""
+
+        requests = self.set_requests()
+        first = list(sampling.hash_sample(requests, 0.1))
+        second = list(sampling.hash_sample(reversed(requests), 0.1))
+        assert 70 < len(first) < 130, "unexpected selected count"
+        assert [request.uri for request in first] == \
+            [request.uri for request in reversed(second)], \
+            "unexpected selection"
+        other = list(sampling.hash_sample(requests, 0.1, seed=1))
+        assert [request.uri for request in first] != \
+            [request.uri for request in other], "unexpected seed effect"
+
+    @pytest.mark.positive
+    def test_reservoir_uniform(self):
+        """Check that every item gets into reservoir equally often"""
+
+        counts = Counter()
+        for seed in range(2000):
+            reservoir = sampling.Reservoir(10, random.Random(seed))
+            for item in range(100):
+                reservoir.offer(item)
+            assert len(reservoir.items) == 10, "unexpected reservoir size"
+            counts.update(reservoir.items)
+        # every item is expected 200 times
+        assert min(counts.values()) > 140 and max(counts.values()) < 260, \
+            "unexpected selection frequency"
+
+    @pytest.mark.positive
+    def test_reservoir_sample_order(self):
+        """Check that selected requests keep input order"""
+
+        requests = self.set_requests()
+        selected = sampling.reservoir_sample(requests, 50, seed=3)
+        positions = [requests.index(request) for request in selected]
+        assert len(selected) == 50, "unexpected selected count"
+        assert positions == sorted(positions), "unexpected order"
+        assert sampling.reservoir_sample(requests[:5], 50) == requests[:5], \
+            "unexpected short stream sample"
+
+    @pytest.mark.positive
+    def test_reservoir_sample_stratified(self):
+        """Check sample size per stratum"""
+
+        requests = self.set_requests()
+        requests.append(HTTPRequest({'method': 'PUT', 'uri': '/'}))
+        selected = sampling.sample_requests(
+            requests, size=30, stratify='method')
+        assert Counter(request.method for request in selected) == \
+            {'GET': 30, 'POST': 30, 'PUT': 1}, "unexpected strata sizes"
+        selected = sampling.sample_requests(
+            requests, rate=0.5, size=10, stratify='prefix', depth=2)
+        assert Counter(sampling.stratum_key(request, 'prefix', 2)
+                       for request in selected) == \
+            {'/api/v0': 10, '/api/v1': 10}, "unexpected prefix strata"
+
+    @pytest.mark.positive
+    def test_stratum_key(self):
+        """Check stratum of absolute and relative URIs"""
+
+        request = HTTPRequest({
+            'method': 'GET', 'uri': 'https://rambler.ru/news/today?a=1',
+            'headers': {'host': ['rambler.ru', 'other']}})
+        assert sampling.stratum_key(request, 'prefix') == '/news', \
+            "unexpected prefix"
+        assert sampling.stratum_key(request, 'prefix', 5) == '/news/today', \
+            "unexpected deep prefix"
+        assert sampling.stratum_key(request, 'host') == 'rambler.ru', \
+            "unexpected host"
+
+    @pytest.mark.negative
+    def test_sample_requests_wrong_args(self):
+        """Check wrong sampling parameters"""
+
+        with pytest.raises(ValueError, match='Sample rate'):
+            sampling.sample_requests([], rate=1.5)
+        with pytest.raises(ValueError, match='requires sample size'):
+            sampling.sample_requests([], stratify='host')
+        with pytest.raises(ValueError, match='Unknown stratify key'):
+            sampling.sample_requests([], size=1, stratify='path')
+        with pytest.raises(ValueError, match='should be positive'):
+            sampling.sample_requests([], size=0)
@@ -0,0 +1,102 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2018 Alexander Grechin
+#
+# Licensed under the BSD 3-Clause license.
+# See LICENSE file in the project root for full license information.
+#
+
+from array import array
+import numpy as np
+import pytest
+from tanktools import schedule
+
+
+class TestSchedule(object):
+
+    def set_timestamps(self, rps, start=1489136209.0):
+        """Prepare timestamps spread evenly inside every second"""
+
+        timestamps = array('d')
+        for second, count in enumerate(rps):
+            timestamps.extend(
+                start + second + np.arange(count) / float(count))
+        return timestamps
+
+    @pytest.mark.positive
+    def test_get_rps(self):
+        """Check requests count per period"""
+
+        timestamps = [10.0, 10.5, 11.2, 13.1, 13.9]
+        assert schedule.get_rps(timestamps).tolist() == [2, 1, 0, 2], \
+            "unexpected RPS"
+        assert schedule.get_rps(timestamps, 2).tolist() == [1.5, 1], \
+            "unexpected RPS of 2 seconds period"
+        assert schedule.get_rps([]).tolist() == [], "unexpected empty RPS"
+
+    @pytest.mark.positive
+    def test_make_schedule_line_const(self):
+        """Check ramp up followed by constant load"""
+
+        rps = list(range(2, 100, 2)) + [100] * 30
+        assert schedule.make_schedule(
+            self.set_timestamps(rps), tolerance=2, window=1) == \
+            "line(2, 100, 49s) const(100, 30s)", "unexpected schedule"
+
+    @pytest.mark.positive
+    def test_make_schedule_step(self):
+        """Check stairs of equal steps"""
+
+        rps = [10] * 5 + [20] * 5 + [30] * 5 + [40] * 5
+        assert schedule.make_schedule(
+            self.set_timestamps(rps), window=1) == \
+            "step(10, 40, 10, 5s)", "unexpected schedule"
+
+    @pytest.mark.positive
+    def test_make_schedule_noisy(self):
+        """Check that Poisson noise is smoothed out"""
+
+        generator = np.random.RandomState(1)
+        rps = generator.poisson(np.concatenate(
+            [np.linspace(1, 100, 60), np.full(120, 100.0)]))
+        segments = schedule.fit_schedule(
+            schedule.smooth_rps(rps), tolerance=10)
+        assert len(segments) <= 4, "unexpected segments count"
+        assert sum(segment[-1] for segment in segments) == len(rps), \
+            "unexpected schedule duration"
+        assert segments[-1][0] == 'const' and \
+            abs(segments[-1][1] - 100) <= 5, "unexpected constant load"
+
+    @pytest.mark.positive
+    def test_make_schedule_rps(self):
+        """Check schedule of every period RPS"""
+
+        rps = [3, 3, 1, 0, 2]
+        assert schedule.make_schedule(self.set_timestamps(rps), 'rps') == \
+            "const(3, 2s) const(1, 1s) const(0, 1s) const(2, 1s)", \
+            "unexpected schedule"
+        assert schedule.make_schedule(array('d'), 'rps') == '', \
+            "unexpected empty schedule"
+
+    @pytest.mark.positive
+    def test_format_schedule_long_duration(self):
+        """Check that long and fractional durations are not rounded"""
+
+        segments = [('line', 1, 100, 1000000.0), ('const', 100, 1234567.0),
+                    ('step', 10, 50, 10, 2.5), ('const', 5, 0.125)]
+        assert schedule.format_schedule(segments) == \
+            "line(1, 100, 1000000s) const(100, 1234567s) " \
+            "step(10, 50, 10, 2.5s) const(5, 0.125s)", \
+            "unexpected schedule"
+
+    @pytest.mark.negative
+    def test_make_schedule_wrong_args(self):
+        """Check wrong schedule parameters"""
+
+        with pytest.raises(ValueError, match='Unknown schedule mode'):
+            schedule.make_schedule([1.0], 'exact')
+        with pytest.raises(ValueError, match='period should be positive'):
+            schedule.make_schedule([1.0], period=0)
+        with pytest.raises(ValueError, match='window should be positive'):
+            schedule.make_schedule([1.0], window=0)
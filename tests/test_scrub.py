@@ -0,0 +1,117 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2018 Alexander Grechin
+#
+# Licensed under the BSD 3-Clause license.
+# See LICENSE file in the project root for full license information.
+#
+
+import pytest
+from tanktools import scrub
+
+AUTOMATON_MODES = [False] + ([True] if scrub.ahocorasick else [])
+
+
+class TestScrub(object):
+
+    def set_request(self):
+        """Prepare HTTP request of bytes with sensitive data"""
+
+        body = u'{"mail": "john.doe@rambler.ru", ' \
+               u'"card": "4111 1111 1111 1111", "id": "4111111111111112"}'
+        return (
+            u"POST /api?token=secret2&name=ёлка HTTP/1.1\r\n"
+            u"Authorization: Bearer abc.DEF-1\r\n"
+            u"Content-Length: %d\r\n\r\n%s" % (len(body), body)
+        ).encode('utf-8')
+
+    @pytest.mark.positive
+    @pytest.mark.parametrize('use_automaton', AUTOMATON_MODES)
+    def test_scrub_literals_longest(self, use_automaton):
+        """Check leftmost longest literals of automaton and regex"""
+
+        scrubber = scrub.Scrubber(
+            ['secret', 'secret2', 'ret2&n', 'ёлка'],
+            use_automaton=use_automaton)
+        assert scrubber.scrub(u'a=secret2&name=ёлка secret'.encode('utf-8')) \
+            == b'a=*******&name=******** ******', "unexpected masked text"
+
+    @pytest.mark.positive
+    @pytest.mark.parametrize('use_automaton', AUTOMATON_MODES)
+    def test_scrub_request_mask(self, use_automaton):
+        """Check that masked request keeps length in bytes"""
+
+        scrubber = scrub.Scrubber(
+            ['secret2'], builtins=['email', 'card', 'bearer'],
+            use_automaton=use_automaton)
+        request = self.set_request()
+        scrubbed = scrubber.scrub_request(request)
+        assert len(scrubbed) == len(request), "unexpected length"
+        for text in [b'secret2', b'john.doe', b'4111 1111', b'abc.DEF-1']:
+            assert text not in scrubbed, "unexpected unmasked %r" % text
+        assert b'4111111111111112' in scrubbed, \
+            "unexpected masked number with wrong checksum"
+        assert u'name=ёлка'.encode('utf-8') in scrubbed, \
+            "unexpected masked text"
+
+    @pytest.mark.positive
+    def test_scrub_request_redact(self):
+        """Check Content-Length of redacted request"""
+
+        scrubber = scrub.Scrubber(
+            regexes=[r'token=\w+'], builtins=['email', 'card'],
+            mode='redact')
+        head, _, body = scrubber.scrub_request(self.set_request()) \
+            .partition(b'\r\n\r\n')
+        assert body == b'{"mail": "REDACTED", "card": "REDACTED", ' \
+            b'"id": "4111111111111112"}', "unexpected body"
+        assert ('Content-Length: %d\r\n' % len(body)).encode('ascii') in \
+            head + b'\r\n', "unexpected Content-Length"
+        assert head.startswith(b'POST /api?REDACTED&name='), \
+            "unexpected request line"
+
+    @pytest.mark.positive
+    def test_luhn_valid(self):
+        """Check card number checksum"""
+
+        assert scrub.luhn_valid(b'4111-1111-1111-1111'), \
+            "unexpected invalid number"
+        assert not scrub.luhn_valid(b'4111111111111112'), \
+            "unexpected valid number"
+
+    @pytest.mark.negative
+    def test_card_skips_ids(self):
+        """Check that IDs passing checksum without card prefix are kept"""
+
+        assert scrub.luhn_valid(b'1234567890123456785'), \
+            "unexpected invalid checksum"
+        scrubber = scrub.Scrubber(builtins=['card'])
+        assert scrubber.scrub(b'id=1234567890123456785&ts=1516295383') == \
+            b'id=1234567890123456785&ts=1516295383', "unexpected masked ID"
+        assert scrubber.scrub(b'card=5555555555554444') == \
+            b'card=****************', "unexpected card number"
+
+    @pytest.mark.positive
+    def test_scrub_regex_groups(self):
+        """Check backreferences and repeated group names of regexes"""
+
+        scrubber = scrub.Scrubber(regexes=[
+            r'(?P<key>sid)=(?P=key)[0-9]+', r'(["\'])secret\1',
+            r'(?P<key>token)=[a-z]+'], builtins=['card'])
+        assert scrubber.scrub(
+            b'sid=sid42&"secret"&\'secret"&token=abc&'
+            b'card=4111111111111111') == \
+            b'*********&********&\'secret"&*********&' \
+            b'card=****************', "unexpected masked text"
+
+    @pytest.mark.negative
+    def test_scrubber_wrong_args(self):
+        """Check wrong scrubber parameters"""
+
+        with pytest.raises(ValueError, match='Unknown scrub mode'):
+            scrub.Scrubber(['a'], mode='hash')
+        with pytest.raises(ValueError, match='Unknown scrub pattern'):
+            scrub.Scrubber(builtins=['phone'])
+        with pytest.raises(ValueError, match='Wrong scrub regex'):
+            scrub.Scrubber(regexes=['(token'])
@@ -0,0 +1,126 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2018 Alexander Grechin
+#
+# Licensed under the BSD 3-Clause license.
+# See LICENSE file in the project root for full license information.
+#
+
+import os
+import pytest
+import tempfile
+from collections import Counter
+from pcaper.HTTPRequest import HTTPRequest
+from tanktools import ammo
+from tanktools import sharding
+
+
+class TestSharding(object):
+
+    @pytest.fixture()
+    def prepare_output(self):
+        """Prepare output file name, remove shards after test"""
+
+        directory = tempfile.mkdtemp()
+        yield os.path.join(directory, 'out.ammo')
+        for filename in os.listdir(directory):
+            os.remove(os.path.join(directory, filename))
+        os.rmdir(directory)
+
+    def read_shards(self, output, shards):
+        """Read shard files"""
+
+        data = []
+        for number in range(shards):
+            with open(sharding.shard_filename(output, number), 'rb') as shard:
+                data.append(shard.read())
+        return data
+
+    @pytest.mark.positive
+    def test_jump_hash_consistent(self):
+        """Check that adding a shard moves about 1/N of keys"""
+
+        keys = [sharding.hash_key('session%d' % index)
+                for index in range(10000)]
+        before = [sharding.jump_hash(key, 9) for key in keys]
+        after = [sharding.jump_hash(key, 10) for key in keys]
+        moved = [new for old, new in zip(before, after) if old != new]
+        assert 800 < len(moved) < 1200, "unexpected moved keys count"
+        assert set(moved) == {9}, "unexpected shard of moved keys"
+        counts = Counter(after)
+        assert min(counts.values()) > 900, "unexpected keys distribution"
+
+    @pytest.mark.positive
+    def test_shard_writer_balance(self, prepare_output):
+        """Check shards balanced by count and by bytes"""
+
+        entries = [b'%d\n' % length + b'x' * length
+                   for length in [100, 1, 1, 1, 1, 1]]
+        writer = sharding.ShardWriter(prepare_output, 2)
+        for entry in entries:
+            writer.write((None, entry))
+        writer.close()
+        assert writer.counts == [3, 3], "unexpected counts"
+        writer = sharding.ShardWriter(prepare_output, 2, 'bytes')
+        for entry in entries:
+            writer.write((None, entry))
+        writer.close()
+        assert writer.counts == [1, 5], "unexpected counts by bytes"
+        assert self.read_shards(prepare_output, 2) == \
+            [entries[0], b''.join(entries[1:])], "unexpected shards"
+
+    @pytest.mark.positive
+    def test_shard_writer_keys_and_index(self, prepare_output):
+        """Check that requests with the same key share shard and index"""
+
+        index_file = prepare_output + '.idx'
+        writer = sharding.ShardWriter(prepare_output, 3, index_file=index_file)
+        for index in range(30):
+            writer.write(('user%d' % (index % 4),
+                          b'6 user%d\nGET /\n' % (index % 4)))
+        writer.close()
+        shards = {}
+        for number in range(3):
+            with ammo.AmmoReader(
+                    sharding.shard_filename(prepare_output, number),
+                    sharding.shard_filename(index_file, number)) as reader:
+                assert len(reader) == writer.counts[number], \
+                    "unexpected indexed count"
+                for request in range(len(reader)):
+                    shards.setdefault(reader.get_case(request), set()) \
+                        .add(number)
+        assert sorted(shards) == ['user0', 'user1', 'user2', 'user3'], \
+            "unexpected keys"
+        assert all(len(numbers) == 1 for numbers in shards.values()), \
+            "unexpected key split"
+
+    @pytest.mark.positive
+    def test_shard_key(self):
+        """Check keys of client, cookie and header"""
+
+        request = HTTPRequest({
+            'method': 'GET', 'uri': '/', 'src': '10.0.0.1',
+            'headers': {'cookie': ['a=1; sid=xyz', 'b=2'],
+                        'x-user': 'alice'}})
+        assert sharding.shard_key(request, 'client') == '10.0.0.1', \
+            "unexpected client key"
+        assert sharding.shard_key(request, 'cookie') == 'a=1; sid=xyz; b=2', \
+            "unexpected cookie key"
+        assert sharding.shard_key(request, 'cookie:sid') == 'xyz', \
+            "unexpected cookie value key"
+        assert sharding.shard_key(request, 'cookie:none') is None, \
+            "unexpected missing cookie key"
+        assert sharding.shard_key(request, 'header:X-User') == 'alice', \
+            "unexpected header key"
+
+    @pytest.mark.negative
+    def test_shard_wrong_args(self, prepare_output):
+        """Check wrong sharding parameters"""
+
+        with pytest.raises(ValueError, match='Unknown shard key'):
+            sharding.keyed_transform(len, 'header')
+        with pytest.raises(ValueError, match='should be positive'):
+            sharding.ShardWriter(prepare_output, 0)
+        with pytest.raises(ValueError, match='Unknown shard balance'):
+            sharding.ShardWriter(prepare_output, 2, 'size')
@@ -0,0 +1,151 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2018 Alexander Grechin
+#
+# Licensed under the BSD 3-Clause license.
+# See LICENSE file in the project root for full license information.
+#
+
+import os
+import numpy as np
+import pytest
+import tempfile
+from collections import Counter
+from pcaper.HTTPRequest import HTTPRequest
+from tanktools import sketches
+
+
+class TestSketches(object):
+
+    def set_keys(self, count=20000):
+        """Prepare keys with Zipf distribution"""
+
+        random = np.random.RandomState(0)
+        return ['/uri/%d' % value for value in random.zipf(1.3, count)]
+
+    def set_requests(self, keys):
+        """Prepare HTTP requests"""
+
+        return [
+            HTTPRequest({
+                'uri': key, 'method': 'POST' if index % 4 else 'GET',
+                'headers': {'host': 'host%d' % (index % 3),
+                            'user-agent': ['agent', 'agent']},
+                'src': '10.0.0.%d' % (index % 50)
+            })
+            for index, key in enumerate(keys)
+        ]
+
+    @pytest.mark.positive
+    def test_count_min_overestimates(self):
+        """Check that Count-Min estimates are not below true counts"""
+
+        counts = Counter(self.set_keys())
+        keys = list(counts)
+        sketch = sketches.CountMinSketch(256, 4)
+        sketch.update(sketches.hash_keys(keys),
+                      np.array([counts[key] for key in keys]))
+        estimates = sketch.estimate(sketches.hash_keys(keys))
+        exact = np.array([counts[key] for key in keys])
+        assert (estimates >= exact).all(), "unexpected underestimation"
+        assert estimates[keys.index('/uri/1')] < exact.sum() * 0.6, \
+            "unexpected estimate"
+
+    @pytest.mark.positive
+    def test_space_saving_merge(self):
+        """Check that merged summaries keep heavy hitters"""
+
+        keys = self.set_keys()
+        first = sketches.SpaceSaving(20)
+        second = sketches.SpaceSaving(20)
+        for start in range(0, 10000, 1000):
+            first.merge_counts(Counter(keys[start:start + 1000]))
+            second.merge_counts(Counter(keys[10000 + start:11000 + start]))
+        first.merge(second)
+        expected = Counter(keys).most_common(5)
+        top = first.top(5)
+        assert [key for key, _, _ in top] == \
+            [key for key, _ in expected], "unexpected top keys"
+        for (key, count, error), (_, exact) in zip(top, expected):
+            assert count - error <= exact <= count, "unexpected bounds"
+
+    @pytest.mark.positive
+    def test_hyperloglog_estimate(self):
+        """Check distinct count error and merge"""
+
+        first = sketches.HyperLogLog(12)
+        second = sketches.HyperLogLog(12)
+        keys = ['key%d' % index for index in range(30000)]
+        first.update(sketches.hash_keys(keys[:20000]))
+        second.update(sketches.hash_keys(keys[10000:]))
+        first.merge(second)
+        assert abs(first.estimate() / 30000 - 1) < 0.05, \
+            "unexpected estimate"
+        small = sketches.HyperLogLog(12)
+        small.update(sketches.hash_keys(keys[:100] * 3))
+        assert abs(small.estimate() - 100) < 3, "unexpected small estimate"
+
+    @pytest.mark.negative
+    def test_hyperloglog_wrong_precision(self):
+        """Check that precision out of exact rank range is rejected"""
+
+        for precision in [4, 10, 19]:
+            with pytest.raises(ValueError, match="precision should be"):
+                sketches.HyperLogLog(precision)
+
+    @pytest.mark.negative
+    def test_merge_different_sketches(self):
+        """Check that sketches of different size can't be merged"""
+
+        with pytest.raises(ValueError, match="can't be merged"):
+            sketches.HyperLogLog(11).merge(sketches.HyperLogLog(12))
+        with pytest.raises(ValueError, match="can't be merged"):
+            sketches.CountMinSketch(16).merge(sketches.CountMinSketch(32))
+
+    @pytest.mark.positive
+    def test_traffic_profile_merge_and_save(self):
+        """Check profile of two parts saved to file and merged"""
+
+        keys = self.set_keys()
+        requests = self.set_requests(keys)
+        whole = sketches.TrafficProfile(capacity=50, batch_size=1000)
+        first = sketches.TrafficProfile(capacity=50, batch_size=1000)
+        second = sketches.TrafficProfile(capacity=50, batch_size=1000)
+        for index, request in enumerate(requests):
+            whole.add(request)
+            (first if index % 2 else second).add(request)
+        filename = tempfile.NamedTemporaryFile(delete=False).name
+        try:
+            sketches.write_profile(second, filename)
+            first.merge(sketches.read_profile(filename))
+        finally:
+            os.remove(filename)
+        assert first.requests == 20000, "unexpected requests count"
+        assert first.top('uri', 3) == Counter(keys).most_common(3), \
+            "unexpected top URIs"
+        assert first.top('uri', 3) == whole.top('uri', 3), \
+            "unexpected merged top"
+        assert first.top('method') == [('POST', 15000), ('GET', 5000)], \
+            "unexpected methods"
+        assert first.top('user_agent') == [('agent', 20000)], \
+            "unexpected user agents"
+        assert first.count_distinct('client') == 50, \
+            "unexpected clients count"
+        assert abs(first.count_distinct('uri') / float(len(set(keys))) - 1) \
+            < 0.05, "unexpected URIs count"
+
+    @pytest.mark.positive
+    def test_print_profile(self, capsys):
+        """Check profile output"""
+
+        profile = sketches.TrafficProfile()
+        for request in self.set_requests(['/a', '/b', '/a']):
+            profile.add(request)
+        sketches.print_profile(profile, 1)
+        captured = capsys.readouterr()
+        assert captured.out == (
+            "Profile:\n\trequests: 3\n\tdistinct client: 3\n"
+            "\tdistinct uri: 2\n\ttop uri:\n\t\t2\t/a\n"
+            "\ttop host:\n\t\t1\thost0\n\ttop method:\n\t\t2\tPOST\n"
+            "\ttop user_agent:\n\t\t3\tagent\n"), "unexpected output"
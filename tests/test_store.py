@@ -0,0 +1,149 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2018 Alexander Grechin
+#
+# Licensed under the BSD 3-Clause license.
+# See LICENSE file in the project root for full license information.
+#
+
+import os
+import pytest
+import tempfile
+from tanktools import phout
+from tanktools import store
+
+
+class TestStore(object):
+
+    def set_phout_data(self, start=1516295382):
+        """Prepare data in phout format with two tags"""
+
+        template = "%.3f\t%s\t%d\t281\t94\t%d\t41\t5991\t26697\t391\t0\t%d"
+        data = []
+        for index in range(20):
+            tag = 'index' if index % 2 else 'search'
+            code = 500 if index % 5 == 0 else 200
+            data.append(template % (
+                start + index * 0.25, tag, 1000 + index * 100,
+                900 + index * 100, code))
+        return data
+
+    @pytest.fixture()
+    def prepare_data_file(self):
+        """Prepare data file decorator"""
+
+        def make_file(start=1516295382):
+            filename = tempfile.NamedTemporaryFile(delete=False).name
+            with open(filename, "w") as file_handler:
+                file_handler.write("\n".join(self.set_phout_data(start)))
+            filenames.append(filename)
+            return filename
+
+        filenames = []
+        yield make_file
+
+        for filename in filenames:
+            os.remove(filename)
+
+    @pytest.fixture()
+    def connection(self):
+        """Open temporary store"""
+
+        connection = store.open_store(':memory:')
+        yield connection
+        connection.close()
+
+    @pytest.mark.positive
+    def test_ingest_phout_check_runs(self, connection, prepare_data_file):
+        """Check stored run metadata"""
+
+        filename = prepare_data_file()
+        run_id = store.ingest_phout(connection, filename, 'first')
+        runs = store.get_runs(connection)
+        assert runs['run_id'].tolist() == [run_id], "unexpected runs"
+        assert runs['name'][0] == 'first', "unexpected name"
+        assert runs['source'][0] == filename, "unexpected source"
+        assert runs['count'][0] == 20, "unexpected count"
+        assert runs['from_date'][0] == 1516295382.0, "unexpected from_date"
+        assert runs['to_date'][0] == 1516295386.75, "unexpected to_date"
+        assert store.get_tags(connection) == ['index', 'search'], \
+            "unexpected tags"
+
+    @pytest.mark.positive
+    def test_get_trend_equals_rollup_quantiles(
+            self, connection, prepare_data_file):
+        """Check that trend quantiles are equal to rollup ones"""
+
+        filename = prepare_data_file()
+        store.ingest_phout(connection, filename)
+        data_frame = phout.parse_phout(filename)
+        quantile_list = [0.5, 0.99]
+        trend = store.get_trend(connection, 'latency', quantile_list)
+        expected = phout.get_rollup_quantiles(
+            phout.make_rollup(data_frame), 'latency', quantile_list)
+        assert trend[quantile_list].values.tolist() == \
+            [expected['latency'].tolist()], "unexpected quantiles"
+        assert trend['rps'][0] == phout.get_rps(data_frame), \
+            "unexpected rps"
+
+        tag_trend = store.get_trend(
+            connection, 'latency', quantile_list, 'index')
+        tag_data = data_frame[data_frame['tag'] == 'index']
+        expected = phout.get_rollup_quantiles(
+            phout.make_rollup(tag_data), 'latency', quantile_list)
+        assert tag_trend['count'].tolist() == [10], "unexpected count"
+        assert tag_trend[quantile_list].values.tolist() == \
+            [expected['latency'].tolist()], "unexpected tag quantiles"
+
+    @pytest.mark.positive
+    def test_get_trend_last_runs(self, connection, prepare_data_file):
+        """Check that only the latest runs are returned in time order"""
+
+        for start in [1516295500, 1516295300, 1516295400]:
+            store.ingest_phout(
+                connection, prepare_data_file(start), str(start))
+        trend = store.get_trend(connection, 'interval_real', [0.5], last=2)
+        assert trend['name'].tolist() == ['1516295400', '1516295500'], \
+            "unexpected runs"
+        assert store.get_runs(connection, 1)['name'].tolist() == \
+            ['1516295500'], "unexpected last run"
+
+    @pytest.mark.positive
+    def test_get_timeline_check_seconds(self, connection, prepare_data_file):
+        """Check per-second statistics"""
+
+        run_id = store.ingest_phout(connection, prepare_data_file())
+        timeline = store.get_timeline(connection, run_id)
+        assert timeline['time'].tolist() == \
+            [1516295382.0 + second for second in range(5)], \
+            "unexpected time"
+        assert timeline['count'].tolist() == [4] * 5, "unexpected count"
+        assert timeline['errors'].tolist() == [1, 1, 1, 1, 0], \
+            "unexpected errors"
+        assert timeline['mean_latency'].tolist()[0] == 1050, \
+            "unexpected mean latency"
+        assert timeline['max_interval_real'].tolist()[-1] == 2900, \
+            "unexpected max interval_real"
+        tag_timeline = store.get_timeline(connection, run_id, 'index')
+        assert tag_timeline['count'].tolist() == [2] * 5, \
+            "unexpected tag count"
+
+    @pytest.mark.positive
+    def test_delete_run(self, connection, prepare_data_file):
+        """Check that deleted run leaves no rows"""
+
+        run_id = store.ingest_phout(connection, prepare_data_file())
+        store.delete_run(connection, run_id)
+        assert store.get_runs(connection).shape[0] == 0, "unexpected runs"
+        assert store.get_timeline(connection, run_id).shape[0] == 0, \
+            "unexpected seconds"
+        assert store.get_tags(connection) == [], "unexpected tags"
+
+    @pytest.mark.negative
+    def test_get_trend_unknown_field(self, connection, prepare_data_file):
+        """Check field without histograms"""
+
+        store.ingest_phout(connection, prepare_data_file())
+        with pytest.raises(ValueError, match='is not kept in store'):
+            store.get_trend(connection, 'size_in')